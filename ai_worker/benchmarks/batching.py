@@ -0,0 +1,65 @@
+"""
+Бенчмарк пропускной способности и задержки микробатчинга.
+
+Запуск из корня репозитория:
+    python -m ai_worker.benchmarks.batching --requests 64 --max-wait-ms 20
+"""
+import argparse
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List
+
+from ai_worker.worker.core.batching import BatchingEngine
+from ai_worker.worker.core.config import MODEL_NAME
+from ai_worker.worker.core.model_registry import model_registry
+
+PROMPTS = [
+    "Привет! Как дела?",
+    "Расскажи короткую историю про кота.",
+    "What is the capital of France?",
+    "Explain recursion in one sentence.",
+]
+
+
+def run_case(model_name: str, batch_size: int, total: int, max_wait_ms: float) -> Dict[str, float]:
+    """Отправляет total запросов из batch_size потоков через движок с батчем batch_size."""
+    engine = BatchingEngine(model_name, max_batch_size=batch_size, max_wait_ms=max_wait_ms)
+    latencies: List[float] = []
+
+    def one(index: int) -> None:
+        started = time.perf_counter()
+        engine.generate(PROMPTS[index % len(PROMPTS)])
+        latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=batch_size) as pool:
+        list(pool.map(one, range(total)))
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    return {
+        "batch_size": batch_size,
+        "throughput_rps": total / elapsed,
+        "latency_p50_ms": statistics.median(latencies) * 1000,
+        "latency_p95_ms": latencies[int(len(latencies) * 0.95) - 1] * 1000,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", default=MODEL_NAME)
+    parser.add_argument("--requests", type=int, default=64)
+    parser.add_argument("--max-wait-ms", type=float, default=20)
+    parser.add_argument("--batch-sizes", default="1,2,4,8,16,32")
+    args = parser.parse_args()
+
+    model_registry.get(args.model)  # загрузка модели не входит в замер
+    print(f"{'batch':>5} {'req/s':>8} {'p50, ms':>9} {'p95, ms':>9}")
+    for batch_size in (int(size) for size in args.batch_sizes.split(",")):
+        row = run_case(args.model, batch_size, args.requests, args.max_wait_ms)
+        print(f"{row['batch_size']:>5} {row['throughput_rps']:>8.2f} "
+              f"{row['latency_p50_ms']:>9.1f} {row['latency_p95_ms']:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
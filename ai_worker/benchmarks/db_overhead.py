@@ -0,0 +1,74 @@
+"""
+Бенчмарк накладных расходов на работу с БД в одной задаче воркера.
+
+Сравнивает прежнюю схему (asyncio.run и новое подключение на каждую задачу)
+с постоянным event loop воркера и его пулом соединений. Нужен доступный
+PostgreSQL из DATABASE_URL. Запуск из корня репозитория:
+    python -m ai_worker.benchmarks.db_overhead --iterations 200
+"""
+import argparse
+import asyncio
+import statistics
+import time
+from typing import Callable, Dict, List
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.pool import NullPool
+
+from ai_worker.worker.core.config import DATABASE_URL
+from ai_worker.worker.core.runtime import AsyncRuntime
+from fastapi_api.app.db.models import Task
+
+
+async def _task_round_trip(session_maker: async_sessionmaker) -> None:
+    # Та же форма запросов, что и при завершении задачи: выборка + коммит
+    async with session_maker() as db:
+        await db.execute(select(Task).filter_by(task_id="benchmark"))
+        await db.commit()
+
+
+def measure(call: Callable[[], None], iterations: int) -> Dict[str, float]:
+    """Возвращает медиану и p95 времени одного вызова в миллисекундах."""
+    timings: List[float] = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        call()
+        timings.append((time.perf_counter() - started) * 1000)
+    timings.sort()
+    return {
+        "p50_ms": statistics.median(timings),
+        "p95_ms": timings[int(len(timings) * 0.95) - 1],
+    }
+
+
+def per_task_loop() -> None:
+    """Прежняя схема: новый event loop и новое соединение на каждую задачу."""
+    async def run() -> None:
+        engine = create_async_engine(DATABASE_URL, poolclass=NullPool)
+        try:
+            await _task_round_trip(async_sessionmaker(engine, class_=AsyncSession))
+        finally:
+            await engine.dispose()
+    asyncio.run(run())
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=200)
+    args = parser.parse_args()
+
+    before = measure(per_task_loop, args.iterations)
+    runtime = AsyncRuntime()
+    runtime.start()
+    try:
+        after = measure(lambda: runtime.run(_task_round_trip(runtime.session_maker)), args.iterations)
+    finally:
+        runtime.stop()
+    print(f"{'схема':<28} {'p50, ms':>9} {'p95, ms':>9}")
+    print(f"{'asyncio.run на задачу':<28} {before['p50_ms']:>9.2f} {before['p95_ms']:>9.2f}")
+    print(f"{'постоянный loop + пул':<28} {after['p50_ms']:>9.2f} {after['p95_ms']:>9.2f}")
+
+
+if __name__ == "__main__":
+    main()
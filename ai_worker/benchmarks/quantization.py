@@ -0,0 +1,109 @@
+"""
+Бенчмарк режимов инференса модели: скорость генерации, память и отклонение от fp32.
+
+Каждый режим загружается в отдельном процессе, чтобы RSS не зависел от
+предыдущих замеров. Генерация жадная, поэтому отклонение от fp32 видно
+по совпадению токенов и по разнице логитов следующего токена.
+Для int8 сначала стоит выполнить конвертацию весов (иначе замер загрузки
+включает квантование). Запуск из корня репозитория:
+    python -m ai_worker.benchmarks.quantization --backends fp32,bf16,int8
+"""
+import argparse
+import multiprocessing
+import time
+from typing import Dict, List
+
+from ai_worker.worker.core.config import MODEL_NAME
+
+PROMPTS = [
+    "User: Привет! Как дела?\nAssistant:",
+    "User: Расскажи короткую историю про кота.\nAssistant:",
+    "User: What is the capital of France?\nAssistant:",
+    "User: Explain recursion in one sentence.\nAssistant:",
+]
+
+
+def measure(model_name: str, backend: str, max_new_tokens: int, repeats: int) -> Dict:
+    """Загружает модель в режиме backend и замеряет генерацию (выполняется в дочернем процессе)."""
+    import torch
+    from transformers import AutoTokenizer
+
+    from ai_worker.worker.core.quantization import load_model
+    from ai_worker.worker.utils.memory import get_rss_bytes
+
+    rss_before = get_rss_bytes()
+    started = time.perf_counter()
+    tokenizer = AutoTokenizer.from_pretrained(model_name)
+    model = load_model(model_name, backend)
+    load_seconds = time.perf_counter() - started
+
+    sequences: List[List[int]] = []
+    logits = []
+    generated = 0
+    elapsed = 0.0
+    with torch.inference_mode():
+        for prompt in PROMPTS:
+            input_ids = tokenizer(prompt, return_tensors="pt")["input_ids"]
+            logits.append(model(input_ids).logits[0, -1].float())
+            for _ in range(repeats):
+                started = time.perf_counter()
+                output = model.generate(input_ids, attention_mask=torch.ones_like(input_ids),
+                                        do_sample=False, max_new_tokens=max_new_tokens,
+                                        min_new_tokens=max_new_tokens,
+                                        pad_token_id=tokenizer.eos_token_id)
+                elapsed += time.perf_counter() - started
+                generated += output.shape[1] - input_ids.shape[1]
+            sequences.append(output[0, input_ids.shape[1]:].tolist())
+    return {
+        "backend": backend,
+        "load_seconds": load_seconds,
+        "rss_bytes": get_rss_bytes() - rss_before,
+        "tokens_per_second": generated / elapsed,
+        "sequences": sequences,
+        "logits": torch.stack(logits),
+    }
+
+
+def drift(reference: Dict, row: Dict) -> Dict[str, float]:
+    """Отклонение от эталона: доля совпавших токенов, совпадение top-1 и разница логитов."""
+    matched = total = 0
+    for expected, actual in zip(reference["sequences"], row["sequences"]):
+        for expected_token, actual_token in zip(expected, actual):
+            if expected_token != actual_token:
+                break
+            matched += 1
+        total += len(expected)
+    top1 = (reference["logits"].argmax(-1) == row["logits"].argmax(-1)).float().mean().item()
+    diff = (reference["logits"] - row["logits"]).abs().max().item()
+    return {"token_match": matched / total, "top1_match": top1, "max_logit_diff": diff}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", default=MODEL_NAME)
+    parser.add_argument("--backends", default="fp32,bf16,int8")
+    parser.add_argument("--max-new-tokens", type=int, default=64)
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    backends = args.backends.split(",")
+    if "fp32" not in backends:
+        backends.insert(0, "fp32")  # эталон для оценки отклонения
+    context = multiprocessing.get_context("spawn")
+    rows = []
+    for backend in backends:
+        with context.Pool(1) as pool:
+            rows.append(pool.apply(measure, (args.model, backend, args.max_new_tokens, args.repeats)))
+    reference = rows[0]
+
+    print(f"{'backend':>7} {'load, s':>8} {'RSS, MB':>8} {'tok/s':>8} "
+          f"{'tokens=':>8} {'top1=':>6} {'max |dlogit|':>12}")
+    for row in rows:
+        row_drift = drift(reference, row)
+        print(f"{row['backend']:>7} {row['load_seconds']:>8.2f} {row['rss_bytes'] / 2 ** 20:>8.1f} "
+              f"{row['tokens_per_second']:>8.1f} {row_drift['token_match']:>8.1%} "
+              f"{row_drift['top1_match']:>6.0%} {row_drift['max_logit_diff']:>12.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""
+Бенчмарк спекулятивной генерации: скорость и принятие токенов черновой модели.
+
+Основная модель генерирует ответы на одни и те же промпты сначала сама,
+затем с каждой из черновых моделей --drafts. Генерация жадная (если не
+указан --sample), поэтому ответы со спекуляцией должны совпадать с
+ответами основной модели; доля совпавших токенов выводится рядом со
+скоростью и долей принятых токенов черновика. Запуск из корня репозитория:
+    python -m ai_worker.benchmarks.speculative --model gpt2 --drafts distilgpt2 --num-tokens 5
+"""
+import argparse
+import time
+from typing import Dict, List, Optional
+
+from ai_worker.worker.core.config import MODEL_NAME, MODEL_BACKEND, SPECULATIVE_NUM_TOKENS
+
+PROMPTS = [
+    "User: Привет! Как дела?\nAssistant:",
+    "User: Расскажи короткую историю про кота.\nAssistant:",
+    "User: What is the capital of France?\nAssistant:",
+    "User: Explain recursion in one sentence.\nAssistant:",
+]
+
+
+def measure(model, tokenizer, draft, max_new_tokens: int, repeats: int, sample: bool) -> Dict:
+    """Генерирует ответы на PROMPTS (с черновой моделью, если draft задан)."""
+    import torch
+
+    sequences: List[List[int]] = []
+    generated = draft_tokens = accepted = 0
+    elapsed = 0.0
+    assisted = {"assistant_model": draft.model} if draft is not None else {}
+    with torch.inference_mode():
+        for prompt in PROMPTS:
+            input_ids = tokenizer(prompt, return_tensors="pt")["input_ids"].to(model.device)
+            for _ in range(repeats):
+                if draft is not None:
+                    draft.start()
+                started = time.perf_counter()
+                output = model.generate(input_ids, attention_mask=torch.ones_like(input_ids),
+                                        do_sample=sample, max_new_tokens=max_new_tokens,
+                                        min_new_tokens=max_new_tokens,
+                                        pad_token_id=tokenizer.eos_token_id, **assisted)
+                elapsed += time.perf_counter() - started
+                new_tokens = output.shape[1] - input_ids.shape[1]
+                generated += new_tokens
+                if draft is not None:
+                    stats = draft.finish(new_tokens)
+                    draft_tokens += stats.draft_tokens
+                    accepted += stats.accepted_tokens
+            sequences.append(output[0, input_ids.shape[1]:].tolist())
+    return {
+        "tokens_per_second": generated / elapsed,
+        "acceptance_rate": accepted / draft_tokens if draft_tokens else None,
+        "sequences": sequences,
+    }
+
+
+def token_match(reference: Dict, row: Dict) -> float:
+    """Доля токенов ответа, совпавших с ответом основной модели до первого расхождения."""
+    matched = total = 0
+    for expected, actual in zip(reference["sequences"], row["sequences"]):
+        for expected_token, actual_token in zip(expected, actual):
+            if expected_token != actual_token:
+                break
+            matched += 1
+        total += len(expected)
+    return matched / total
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", default=MODEL_NAME)
+    parser.add_argument("--drafts", required=True, help="черновые модели через запятую")
+    parser.add_argument("--backend", default=MODEL_BACKEND)
+    parser.add_argument("--num-tokens", type=int, default=SPECULATIVE_NUM_TOKENS,
+                        help="стартовое число токенов, предлагаемых черновиком за шаг")
+    parser.add_argument("--max-new-tokens", type=int, default=64)
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--sample", action="store_true", help="сэмплирование вместо жадной генерации")
+    args = parser.parse_args()
+
+    import torch
+    from transformers import AutoTokenizer
+
+    from ai_worker.worker.core.quantization import load_model
+    from ai_worker.worker.core.speculative import DraftModel
+
+    device = "cuda" if torch.cuda.is_available() and args.backend != "int8" else "cpu"
+    tokenizer = AutoTokenizer.from_pretrained(args.model)
+    model = load_model(args.model, args.backend).to(device)
+
+    rows = [("-", measure(model, tokenizer, None, args.max_new_tokens, args.repeats, args.sample))]
+    for name in args.drafts.split(","):
+        draft: Optional[DraftModel] = DraftModel(name, model, args.backend, device, args.num_tokens)
+        rows.append((name, measure(model, tokenizer, draft, args.max_new_tokens, args.repeats, args.sample)))
+        draft.cleanup()
+    reference = rows[0][1]
+
+    print(f"{'draft':>24} {'tok/s':>8} {'speedup':>8} {'accepted':>9} {'tokens=':>8}")
+    for name, row in rows:
+        acceptance = f"{row['acceptance_rate']:.1%}" if row["acceptance_rate"] is not None else "-"
+        print(f"{name[-24:]:>24} {row['tokens_per_second']:>8.1f} "
+              f"{row['tokens_per_second'] / reference['tokens_per_second']:>7.2f}x "
+              f"{acceptance:>9} {token_match(reference, row):>8.1%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""
+Бенчмарк раскладки воркера по процессам и потокам torch.
+
+Для каждой пары (процессы × потоки) запускается пул процессов, как в
+prefork-режиме Celery: модель загружается после fork, каждый процесс
+настраивает свои потоки (и при --pin привязку к ядрам). Затем все промпты
+отдаются пулу сразу, и замеряются пропускная способность и задержки.
+Промпты берутся из JSONL-файла (поле --field, по умолчанию message).
+Запуск из корня репозитория:
+    python -m ai_worker.benchmarks.worker_layout --matrix 1x4,2x2,4x1 --prompts prompts.jsonl
+"""
+import argparse
+import json
+import multiprocessing
+import statistics
+import time
+from typing import Dict, List, Tuple
+
+from ai_worker.worker.core.config import MODEL_NAME
+from ai_worker.worker.core.cpu_budget import available_cores
+
+PROMPTS = [
+    "Привет! Как дела?",
+    "Расскажи короткую историю про кота.",
+    "What is the capital of France?",
+    "Explain recursion in one sentence.",
+]
+
+
+def load_prompts(path: str, field: str) -> List[str]:
+    """Читает промпты из JSONL-файла, пропуская строки без поля field."""
+    prompts = []
+    with open(path, "r", encoding="utf-8") as file:
+        for line in file:
+            if line.strip():
+                value = json.loads(line).get(field)
+                if value:
+                    prompts.append(value)
+    return prompts
+
+
+def child(index: int, processes: int, threads: int, pin: bool, model_name: str,
+          ready, tasks, results) -> None:
+    """Процесс пула: настройка потоков, загрузка модели, обработка промптов из очереди."""
+    from ai_worker.worker.core.cpu_budget import configure_process
+    from ai_worker.worker.core.huggingai_client import HuggingFaceClient
+
+    configure_process(index, processes, pin=pin, threads=threads)
+    client = HuggingFaceClient(model_name)
+    client.generate_text(PROMPTS[0])  # прогрев
+    ready.wait()
+    while True:
+        prompt = tasks.get()
+        if prompt is None:
+            return
+        started = time.perf_counter()
+        client.generate_text(prompt)
+        results.put(time.perf_counter() - started)
+
+
+def run_case(processes: int, threads: int, prompts: List[str], pin: bool, model_name: str) -> Dict:
+    """Прогоняет все промпты через пул processes процессов по threads потоков."""
+    context = multiprocessing.get_context("fork")
+    ready = context.Barrier(processes + 1)
+    tasks, results = context.Queue(), context.Queue()
+    workers = [
+        context.Process(target=child, args=(index, processes, threads, pin, model_name,
+                                            ready, tasks, results))
+        for index in range(processes)
+    ]
+    for worker in workers:
+        worker.start()
+    ready.wait()
+    started = time.perf_counter()
+    for prompt in prompts:
+        tasks.put(prompt)
+    for _ in workers:
+        tasks.put(None)
+    latencies = sorted(results.get() for _ in prompts)
+    elapsed = time.perf_counter() - started
+    for worker in workers:
+        worker.join()
+    return {
+        "processes": processes,
+        "threads": threads,
+        "throughput_rps": len(prompts) / elapsed,
+        "latency_p50_ms": statistics.median(latencies) * 1000,
+        "latency_p95_ms": latencies[max(0, int(len(latencies) * 0.95) - 1)] * 1000,
+    }
+
+
+def parse_matrix(value: str) -> List[Tuple[int, int]]:
+    return [tuple(int(part) for part in cell.split("x")) for cell in value.split(",")]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", default=MODEL_NAME)
+    parser.add_argument("--matrix", default=None,
+                        help="пары процессы x потоки через запятую (по умолчанию — все делители числа ядер)")
+    parser.add_argument("--prompts", default=None, help="JSONL-файл с промптами")
+    parser.add_argument("--field", default="message")
+    parser.add_argument("--requests", type=int, default=32)
+    parser.add_argument("--pin", action="store_true", help="привязывать процессы к ядрам")
+    args = parser.parse_args()
+
+    cores = len(available_cores())
+    matrix = parse_matrix(args.matrix) if args.matrix else [
+        (processes, cores // processes) for processes in range(1, cores + 1) if cores % processes == 0
+    ]
+    prompts = load_prompts(args.prompts, args.field) if args.prompts else PROMPTS
+    prompts = (prompts * (args.requests // len(prompts) + 1))[:args.requests]
+
+    print(f"Ядер: {cores}, запросов: {len(prompts)}, привязка: {'да' if args.pin else 'нет'}")
+    print(f"{'proc':>4} {'threads':>7} {'req/s':>8} {'p50, ms':>9} {'p95, ms':>9}")
+    for processes, threads in matrix:
+        row = run_case(processes, threads, prompts, args.pin, args.model)
+        print(f"{row['processes']:>4} {row['threads']:>7} {row['throughput_rps']:>8.2f} "
+              f"{row['latency_p50_ms']:>9.1f} {row['latency_p95_ms']:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""Микробатчинг: отмена строк батча и передача ответов в поток задачи"""
+import json
+import threading
+from contextlib import contextmanager
+
+import fakeredis
+import pytest
+import torch
+
+from ai_worker.worker.core import batching, streaming
+from ai_worker.worker.core.batching import BatchingEngine
+from ai_worker.worker.core.stopping import BatchCallbackCriteria
+from ai_worker.worker.core.stub_client import StubClient
+
+
+class Registry:
+    """model_registry с одним клиентом-заглушкой."""
+
+    def __init__(self, client):
+        self.client = client
+
+    @contextmanager
+    def use(self, model_name=None):
+        yield self.client
+
+
+@pytest.fixture
+def redis(monkeypatch):
+    client = fakeredis.FakeRedis(decode_responses=True)
+    monkeypatch.setattr(streaming, "get_redis", lambda: client)
+    return client
+
+
+@pytest.fixture
+def engine(monkeypatch):
+    monkeypatch.setattr(batching, "model_registry", Registry(StubClient(token_ms=1, new_tokens=10)))
+    return BatchingEngine("model", max_batch_size=3, max_wait_ms=200)
+
+
+def streamed(redis, task_id: str):
+    events = redis.xrange(streaming.stream_key(task_id))
+    return "".join(json.loads(fields["data"])["text"] for _, fields in events)
+
+
+def test_rows_stop_independently():
+    calls = {"stop": 0}
+
+    def stop_after_two():
+        calls["stop"] += 1
+        return calls["stop"] >= 2
+
+    criteria = BatchCallbackCriteria([stop_after_two, None])
+    input_ids = torch.zeros((2, 3), dtype=torch.long)
+
+    assert criteria(input_ids, None).tolist() == [False, False]
+    assert criteria(input_ids, None).tolist() == [True, False]
+
+
+def test_stopped_row_does_not_hold_back_the_batch(engine):
+    # Первая проверка — перед сборкой батча, затем по одной после каждого токена
+    checks = iter(range(100))
+    futures = [engine.submit("a b c d e f g h i j", should_stop=lambda: next(checks) >= 2),
+               engine.submit("k l m n o p q r s t")]
+
+    short, full = (future.result(timeout=5) for future in futures)
+
+    assert short == "a b"
+    assert full == "k l m n o p q r s t"
+
+
+def test_stopped_prompt_is_not_generated(engine):
+    assert engine.generate("a b c", should_stop=lambda: True) == ""
+
+
+def test_batched_answers_reach_task_streams(engine, redis):
+    streamers = {task_id: streaming.RedisTokenStreamer(None, task_id) for task_id in ("one", "two")}
+    results = {}
+
+    def run(task_id, prompt):
+        results[task_id] = engine.generate(prompt, streamer=streamers[task_id])
+
+    threads = [threading.Thread(target=run, args=("one", "x y")), threading.Thread(target=run, args=("two", "z"))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(timeout=5)
+
+    assert streamed(redis, "one") == results["one"]
+    assert streamed(redis, "two") == results["two"]
+    assert results["two"].split()[0] == "z"
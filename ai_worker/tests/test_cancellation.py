@@ -0,0 +1,178 @@
+"""Отмена задач и мягкий лимит времени в воркере"""
+import asyncio
+import time
+from functools import partial
+
+import fakeredis
+import pytest
+import torch
+
+from ai_worker.worker.core import cancellation
+from ai_worker.worker.core.cancellation import TaskCancelled, TaskControl, TaskTimeLimitExceeded
+from ai_worker.worker.core.stopping import CallbackCriteria, GenerationOptions, generation_params
+from ai_worker.worker.core.stub_client import StubClient, StubTokenizer
+from ai_worker.worker.tasks import ai_tasks
+from fastapi_api.app.utils.cancellation import cancel_key
+
+
+@pytest.fixture
+def redis(monkeypatch):
+    client = fakeredis.FakeRedis(decode_responses=True)
+    monkeypatch.setattr(cancellation, "get_redis", lambda: client)
+    return client
+
+
+class Worker:
+    """Окружение _process_ai_task без БД и Redis: события и вызовы записываются."""
+
+    def __init__(self):
+        self.events = []
+        self.completed = []
+        self.failed = []
+        self.generate = lambda input_data, control: "answer"
+
+    def generate_text(self, input_data, task_id=None, history=None, options=None, control=None):
+        return self.generate(input_data, control)
+
+    async def complete(self, task_id, result):
+        self.completed.append((task_id, result))
+
+    async def fail_task(self, task_id, error):
+        self.failed.append((task_id, error))
+        return True
+
+
+@pytest.fixture
+def worker(redis, monkeypatch):
+    state = Worker()
+    monkeypatch.setattr(ai_tasks, "CONTEXT_MAX_TURNS", 0)
+    monkeypatch.setattr(ai_tasks, "generate_text", state.generate_text)
+    monkeypatch.setattr(ai_tasks.task_finalizer, "complete", state.complete)
+    monkeypatch.setattr(ai_tasks, "_fail_task", state.fail_task)
+    monkeypatch.setattr(ai_tasks.runtime, "run", asyncio.run)
+    monkeypatch.setattr(ai_tasks, "publish_event", lambda task_id, event, data: state.events.append(event))
+    monkeypatch.setattr(ai_tasks, "publish_task_completed", lambda *args: None)
+    monkeypatch.setattr(ai_tasks, "store_response", lambda *args: None)
+    return state
+
+
+def test_cancel_flag_is_polled_at_most_once_per_interval(redis):
+    control = TaskControl("task", soft_time_limit=0, check_interval_ms=60_000)
+    assert not control.cancelled()
+
+    redis.set(cancel_key("task"), 1)
+    assert not control.cancelled()
+    assert control.cancelled(force=True)
+
+    # Отмена необратима, даже если флаг уже истёк
+    redis.delete(cancel_key("task"))
+    assert control.should_stop()
+    with pytest.raises(TaskCancelled):
+        control.check()
+
+
+def test_soft_time_limit(redis):
+    assert TaskControl("task", soft_time_limit=0).deadline is None
+
+    control = TaskControl("task", soft_time_limit=0.01)
+    assert not control.should_stop()
+    time.sleep(0.02)
+
+    assert control.should_stop()
+    with pytest.raises(TaskTimeLimitExceeded):
+        control.check()
+
+
+def test_unreachable_redis_does_not_cancel(monkeypatch):
+    def unavailable():
+        raise ConnectionError("redis down")
+
+    monkeypatch.setattr(cancellation, "get_redis", unavailable)
+
+    control = TaskControl("task", soft_time_limit=0)
+    assert not control.cancelled(force=True)
+    control.check()
+
+
+def test_should_stop_becomes_a_stopping_criterion():
+    stop = [False]
+    params = generation_params(GenerationOptions(), StubTokenizer(), 3, should_stop=lambda: stop[0])
+    criteria = params["stopping_criteria"]
+    input_ids = torch.zeros((2, 5), dtype=torch.long)
+
+    assert [type(item) for item in criteria] == [CallbackCriteria]
+    assert not criteria[0](input_ids, None).any()
+    stop[0] = True
+    assert criteria[0](input_ids, None).all()
+    assert "stopping_criteria" not in generation_params(GenerationOptions(), StubTokenizer(), 3)
+
+
+def test_stub_stops_when_asked():
+    calls = []
+
+    def should_stop():
+        calls.append(1)
+        return len(calls) >= 3
+
+    result = StubClient(token_ms=0, new_tokens=50).generate_text("one two three four five",
+                                                                 should_stop=should_stop)
+
+    assert len(result.split()) == 3
+
+
+def test_task_cancelled_in_queue_is_dropped_before_start(worker, redis):
+    redis.set(cancel_key("task"), 1)
+    worker.generate = lambda input_data, control: pytest.fail("отменённая задача не генерируется")
+
+    assert ai_tasks._process_ai_task("task", "hi") is None
+    assert worker.events == []
+
+
+def test_cancel_during_generation_discards_result(worker, redis):
+    def generate(input_data, control):
+        redis.set(cancel_key("task"), 1)
+        return "partial"
+
+    worker.generate = generate
+
+    assert ai_tasks._process_ai_task("task", "hi") is None
+    assert worker.events == ["start"]
+    assert worker.completed == []
+    assert worker.failed == []
+
+
+def test_soft_time_limit_marks_task_failed(worker, monkeypatch):
+    monkeypatch.setattr(ai_tasks, "TaskControl", partial(TaskControl, soft_time_limit=0.01))
+
+    def generate(input_data, control):
+        time.sleep(0.02)
+        return "late"
+
+    worker.generate = generate
+
+    with pytest.raises(TaskTimeLimitExceeded):
+        ai_tasks._process_ai_task("task", "hi")
+    assert worker.completed == []
+    assert [task_id for task_id, _ in worker.failed] == ["task"]
+    assert worker.events == ["start", "error"]
+
+
+def test_completed_task_is_finalized(worker):
+    assert ai_tasks._process_ai_task("task", "hi") == "answer"
+    assert worker.completed == [("task", "answer")]
+    assert worker.events == ["start", "done"]
+
+
+def test_failure_to_mark_failed_keeps_original_error(worker, monkeypatch):
+    async def database_down(task_id, error):
+        raise ConnectionError("database down")
+
+    def generate(input_data, control):
+        raise RuntimeError("generation failed")
+
+    monkeypatch.setattr(ai_tasks, "_fail_task", database_down)
+    worker.generate = generate
+
+    with pytest.raises(RuntimeError, match="generation failed"):
+        ai_tasks._process_ai_task("task", "hi")
+    assert worker.events == ["start", "error"]
@@ -0,0 +1,169 @@
+"""Контекст диалога: выбор предыдущих реплик и укладка промпта в бюджет токенов"""
+from datetime import datetime, timedelta
+
+import pytest
+
+from ai_worker.worker.core import context
+from ai_worker.worker.core.config import GENERATION_MAX_NEW_TOKENS
+from ai_worker.worker.core.context import MIN_TRUNCATED_TURN, ContextBuilder, History, Turn
+from fastapi_api.app.db.models import Message, SenderType, Task, TaskStatus, User
+
+
+class CharTokenizer:
+    """Токен — символ: длины промптов легко считать в тестах."""
+
+    def __init__(self, model_max_length: int = 100_000):
+        self.model_max_length = model_max_length
+
+    def encode(self, text: str):
+        return [ord(char) for char in text]
+
+    def decode(self, tokens):
+        return "".join(chr(token) for token in tokens)
+
+
+def prompt_text(message: str) -> str:
+    return f"User: {message}\nAssistant:"
+
+
+def turn_text(turn: Turn) -> str:
+    return f"{context.SPEAKERS[turn.sender]}: {turn.content}\n"
+
+
+def history(*contents: str) -> History:
+    """История из реплик от старых к новым (History хранит их от новых к старым)."""
+    senders = [SenderType.USER, SenderType.ASSISTANT]
+    turns = [Turn(index, senders[index % 2], content) for index, content in enumerate(contents)]
+    return History(user_id=1, turns=list(reversed(turns)))
+
+
+def build(builder: ContextBuilder, tokenizer, dialog: History, message: str) -> str:
+    return tokenizer.decode(builder.build("model", tokenizer, dialog, message))
+
+
+def test_whole_history_fits():
+    builder = ContextBuilder(token_budget=1000, system_prompt="")
+    dialog = history("hi", "hello", "how are you?", "fine")
+
+    text = build(builder, CharTokenizer(), dialog, "and you?")
+
+    assert text == "".join(turn_text(turn) for turn in reversed(dialog.turns)) + prompt_text("and you?")
+
+
+def test_oldest_turns_are_dropped_first():
+    dialog = history("a" * 50, "b" * 50, "c" * 50)
+    prompt = prompt_text("q")
+    newest = turn_text(dialog.turns[0])
+    # Места хватает на промпт, новейшую реплику и меньше MIN_TRUNCATED_TURN токенов следующей
+    builder = ContextBuilder(token_budget=len(prompt) + len(newest) + MIN_TRUNCATED_TURN - 1,
+                             system_prompt="")
+
+    assert build(builder, CharTokenizer(), dialog, "q") == newest + prompt
+
+
+def test_turn_that_does_not_fit_keeps_its_tail():
+    dialog = history("a" * 50, "b" * 50)
+    prompt = prompt_text("q")
+    newest = turn_text(dialog.turns[0])
+    builder = ContextBuilder(token_budget=len(prompt) + len(newest) + 20, system_prompt="")
+
+    text = build(builder, CharTokenizer(), dialog, "q")
+
+    assert text == turn_text(dialog.turns[1])[-20:] + newest + prompt
+
+
+def test_long_prompt_keeps_its_end():
+    builder = ContextBuilder(token_budget=30, system_prompt="")
+
+    text = build(builder, CharTokenizer(), history("old"), "x" * 100 + "end")
+
+    assert len(text) == 30
+    assert text.endswith("end\nAssistant:")
+
+
+def test_system_prompt_always_leads():
+    builder = ContextBuilder(token_budget=60, system_prompt="Be brief.")
+    dialog = history("a" * 100)
+
+    text = build(builder, CharTokenizer(), dialog, "q")
+
+    assert text.startswith("Be brief.\n")
+    assert len(text) <= 60
+
+
+def test_budget_never_exceeds_model_window():
+    builder = ContextBuilder(token_budget=10_000, system_prompt="")
+    tokenizer = CharTokenizer(model_max_length=GENERATION_MAX_NEW_TOKENS + 40)
+
+    text = build(builder, tokenizer, history("a" * 100, "b" * 100), "q" * 100)
+
+    assert len(text) == 40
+
+
+def test_exhausted_budget_keeps_one_token_instead_of_whole_prompt():
+    system = "S" * 50
+    builder = ContextBuilder(token_budget=10_000, system_prompt=system)
+    # Системный промпт и ответ занимают всё окно модели
+    tokenizer = CharTokenizer(model_max_length=GENERATION_MAX_NEW_TOKENS + 20)
+
+    text = build(builder, tokenizer, history("old"), "q" * 100)
+
+    assert text == f"{system}\n:"
+
+
+def test_turn_tokens_are_reused_and_refreshed_on_edit():
+    builder = ContextBuilder(token_budget=1000, system_prompt="")
+
+    class CountingTokenizer(CharTokenizer):
+        calls = 0
+
+        def encode(self, text):
+            self.calls += 1
+            return super().encode(text)
+
+    tokenizer = CountingTokenizer()
+    builder.build("model", tokenizer, history("hi", "hello"), "q")
+    tokenizer.calls = 0
+    builder.build("model", tokenizer, history("hi", "hello"), "q")
+    # Токенизируется только новая реплика
+    assert tokenizer.calls == 1
+
+    edited = history("hi", "hello!")
+    assert build(builder, tokenizer, edited, "q").startswith("User: hi\nAssistant: hello!\n")
+
+
+@pytest.mark.anyio
+async def test_history_holds_only_messages_sent_before_the_task(session_maker, monkeypatch):
+    monkeypatch.setattr(context.runtime, "session_maker", session_maker)
+    start = datetime(2026, 1, 1, 12, 0)
+
+    def at(seconds: float) -> datetime:
+        return start + timedelta(seconds=seconds)
+
+    async with session_maker() as db:
+        user = User(telegram_id="1", username="user")
+        db.add(user)
+        await db.flush()
+        tasks = []
+        for index in range(3):
+            task = Task(task_id=f"task-{index}", user_id=user.id, input_data=f"q{index}",
+                        status=TaskStatus.PENDING, created_at=at(index), updated_at=at(index))
+            db.add(task)
+            await db.flush()
+            tasks.append(task)
+            db.add(Message(user_id=user.id, task_id=task.id, sender=SenderType.USER,
+                           content=f"q{index}", created_at=at(index)))
+        # Ответ на последнюю задачу пришёл раньше, чем обработаны предыдущие
+        db.add(Message(user_id=user.id, task_id=tasks[2].id, sender=SenderType.ASSISTANT,
+                       content="a2", created_at=at(5)))
+        db.add(Message(user_id=user.id, task_id=tasks[0].id, sender=SenderType.ASSISTANT,
+                       content="a0", created_at=at(0.5)))
+        await db.commit()
+
+    contents = {}
+    for index in range(3):
+        loaded = await context.load_history(f"task-{index}")
+        contents[index] = [turn.content for turn in loaded.turns]
+
+    assert contents == {0: [], 1: ["a0", "q0"], 2: ["q1", "a0", "q0"]}
+    assert (await context.load_history("task-2", max_turns=2)).turns[-1].content == "a0"
@@ -0,0 +1,57 @@
+"""Пакетная запись результатов: UPDATE ... FROM (VALUES) и INSERT ... SELECT на PostgreSQL"""
+import asyncio
+
+import pytest
+from sqlalchemy import select
+
+from ai_worker.worker.core.finalizer import TaskFinalizer
+from ai_worker.worker.core.runtime import runtime
+from fastapi_api.app.db.models import Message, SenderType, Task, TaskStatus, User
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+async def db(pg_session_maker, monkeypatch):
+    monkeypatch.setattr(runtime, "session_maker", pg_session_maker)
+    async with pg_session_maker() as session:
+        session.add(User(id=1, telegram_id="1"))
+        session.add_all([
+            Task(task_id="pending", user_id=1, input_data="a", status=TaskStatus.PENDING),
+            Task(task_id="processing", user_id=1, input_data="b", status=TaskStatus.PROCESSING),
+            Task(task_id="cancelled", user_id=1, input_data="c", status=TaskStatus.CANCELLED),
+        ])
+        await session.commit()
+        yield session
+
+
+async def messages(db):
+    rows = await db.execute(select(Task.task_id, Message.sender, Message.content)
+                            .join(Task, Message.task_id == Task.id).order_by(Task.task_id))
+    return rows.all()
+
+
+async def test_batch_completes_tasks_and_adds_answers(db):
+    finalizer = TaskFinalizer(max_batch=3, max_delay_ms=1000)
+
+    # Пакет пишется одним запросом, когда набирается max_batch результатов
+    await asyncio.gather(finalizer.complete("pending", "first"),
+                         finalizer.complete("processing", "second"),
+                         finalizer.complete("cancelled", "late"))
+
+    tasks = dict((await db.execute(select(Task.task_id, Task.status))).all())
+    assert tasks == {"pending": TaskStatus.COMPLETED, "processing": TaskStatus.COMPLETED,
+                     "cancelled": TaskStatus.CANCELLED}
+    assert (await db.scalar(select(Task.result).where(Task.task_id == "processing"))) == "second"
+    assert await messages(db) == [("pending", SenderType.ASSISTANT, "first"),
+                                  ("processing", SenderType.ASSISTANT, "second")]
+
+
+async def test_redelivered_result_is_written_once(db):
+    finalizer = TaskFinalizer(max_batch=1)
+
+    await finalizer.complete("pending", "answer")
+    await finalizer.complete("pending", "again")
+
+    assert await messages(db) == [("pending", SenderType.ASSISTANT, "answer")]
+    assert (await db.scalar(select(Task.result).where(Task.task_id == "pending"))) == "answer"
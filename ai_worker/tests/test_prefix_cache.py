@@ -0,0 +1,87 @@
+"""Кэш past_key_values общих префиксов промптов"""
+import torch
+
+from ai_worker.worker.core.prefix_cache import PrefixCache, cache_nbytes, crop
+
+LAYERS, HEADS, DIM = 2, 1, 4
+
+
+def past(length: int, fill: float = 1.0):
+    """past_key_values наследуемого формата на length позиций."""
+    return tuple(
+        (torch.full((1, HEADS, length, DIM), fill), torch.full((1, HEADS, length, DIM), fill))
+        for _ in range(LAYERS)
+    )
+
+
+def size_of(length: int) -> int:
+    return cache_nbytes(past(length))
+
+
+def test_longest_stored_prefix_wins():
+    cache = PrefixCache(max_mb=1)
+    cache.store([1, 2], past(2, fill=2))
+    cache.store([1, 2, 3, 4], past(4, fill=4))
+
+    state, length = cache.lookup([1, 2, 3, 4, 5])
+
+    assert length == 4
+    assert state[0][0].shape[2] == 4
+    assert state[0][0][0, 0, 0, 0] == 4
+
+
+def test_at_least_one_token_is_left_for_the_forward_pass():
+    cache = PrefixCache(max_mb=1)
+    cache.store([1, 2, 3], past(3))
+
+    assert cache.lookup([1, 2, 3]) == (None, 0)
+
+
+def test_different_prefix_misses():
+    cache = PrefixCache(max_mb=1)
+    cache.store([1, 2], past(2))
+
+    assert cache.lookup([9, 2, 3]) == (None, 0)
+
+
+def test_stored_state_is_cropped_copy():
+    cache = PrefixCache(max_mb=1)
+    source = past(6)
+    cache.store([1, 2, 3], source)
+    source[0][0].fill_(0)
+
+    state, length = cache.lookup([1, 2, 3, 4])
+
+    assert length == 3
+    assert state[0][0].shape[2] == 3
+    assert bool((state[0][0] == 1).all())
+
+
+def test_least_recently_used_prefix_is_evicted():
+    cache = PrefixCache(max_mb=(2 * size_of(2)) / (1024 * 1024))
+    cache.store([1, 1], past(2))
+    cache.store([2, 2], past(2))
+    # Обращение делает [1, 1] самым свежим, вытесняется [2, 2]
+    assert cache.lookup([1, 1, 0])[1] == 2
+    cache.store([3, 3], past(2))
+
+    assert cache.lookup([1, 1, 0])[1] == 2
+    assert cache.lookup([2, 2, 0]) == (None, 0)
+    assert cache.lookup([3, 3, 0])[1] == 2
+
+
+def test_entry_larger_than_cache_is_skipped():
+    cache = PrefixCache(max_mb=size_of(2) / (1024 * 1024))
+    cache.store([1, 2, 3, 4], past(4))
+
+    assert cache.lookup([1, 2, 3, 4, 5]) == (None, 0)
+
+
+def test_disabled_cache():
+    assert not PrefixCache(max_mb=0).enabled
+
+
+def test_crop():
+    cropped = crop(past(5), 2)
+
+    assert all(key.shape[2] == 2 and value.shape[2] == 2 for key, value in cropped)
@@ -0,0 +1,94 @@
+"""Спекулятивная генерация на крошечных моделях GPT-2 с общим словарём"""
+import re
+
+import pytest
+import torch
+from tokenizers import ByteLevelBPETokenizer
+from transformers import GPT2Config, GPT2LMHeadModel, PreTrainedTokenizerFast
+
+from ai_worker.worker.core import huggingai_client, speculative
+from ai_worker.worker.core.huggingai_client import HuggingFaceClient
+from ai_worker.worker.core.speculative import load_draft_model
+from ai_worker.worker.core.stopping import GenerationOptions, trim_stop
+from ai_worker.worker.utils.metrics import metrics
+
+CORPUS = ["hello world how are you today", "the quick brown fox jumps over the lazy dog",
+          "what is the capital of france", "thanks a lot see you tomorrow"] * 10
+
+
+def save_model(path, tokenizer, layers: int, extra_tokens: int = 0) -> str:
+    torch.manual_seed(layers)
+    model = GPT2LMHeadModel(GPT2Config(vocab_size=len(tokenizer) + extra_tokens, n_positions=128, n_embd=16,
+                                       n_layer=layers, n_head=2, bos_token_id=tokenizer.eos_token_id,
+                                       eos_token_id=tokenizer.eos_token_id))
+    model.save_pretrained(path)
+    tokenizer.save_pretrained(path)
+    return str(path)
+
+
+@pytest.fixture(scope="module")
+def models(tmp_path_factory):
+    """Основная модель (2 слоя), черновая (1 слой) и черновая с чужим словарём."""
+    root = tmp_path_factory.mktemp("models")
+    bpe = ByteLevelBPETokenizer()
+    bpe.train_from_iterator(CORPUS, vocab_size=300, special_tokens=["<|endoftext|>"])
+    tokenizer = PreTrainedTokenizerFast(tokenizer_object=bpe, eos_token="<|endoftext|>")
+    return (save_model(root / "target", tokenizer, layers=2), save_model(root / "draft", tokenizer, layers=1),
+            save_model(root / "foreign", tokenizer, layers=1, extra_tokens=10))
+
+
+@pytest.fixture
+def client(models, monkeypatch):
+    target, draft, _ = models
+    monkeypatch.setattr(speculative, "SPECULATIVE_DRAFT_MODELS", {target: draft})
+    # Жадный выбор: ответ со стоп-строкой должен быть префиксом ответа без неё
+    monkeypatch.setitem(huggingai_client.SAMPLING_PARAMS, "do_sample", False)
+    client = HuggingFaceClient(target, "fp32")
+    assert client.draft is not None
+    yield client
+    client.cleanup()
+
+
+def test_stop_strings_work_with_draft_model(client):
+    prompt = client.tokenizer.encode("hello world how are")
+    full = client.generate_text("", input_ids=prompt, options=GenerationOptions(max_new_tokens=30))
+    # Стоп-строка — буквенный фрагмент из середины ответа
+    words = re.findall("[a-z]{2,}", full)
+    assert words, full
+    stop = [words[len(words) // 2]]
+
+    result = client.generate_text("", input_ids=prompt, options=GenerationOptions(max_new_tokens=30, stop=stop))
+
+    assert result == trim_stop(full, stop)
+
+
+def test_greedy_answer_matches_target_model(client, models, monkeypatch):
+    prompt = client.tokenizer.encode("what is the capital")
+    assisted = client.generate_text("", input_ids=prompt, options=GenerationOptions(max_new_tokens=20))
+    monkeypatch.setattr(speculative, "SPECULATIVE_DRAFT_MODELS", {})
+    plain = HuggingFaceClient(models[0], "fp32")
+
+    assert plain.draft is None
+    assert plain.generate_text("", input_ids=prompt, options=GenerationOptions(max_new_tokens=20)) == assisted
+
+
+def test_generation_reports_draft_acceptance(client):
+    before = metrics.snapshot()
+    client.generate_text("", input_ids=client.tokenizer.encode("thanks a lot"),
+                         options=GenerationOptions(max_new_tokens=20))
+    after = metrics.snapshot()
+
+    proposed = after["speculative.draft_tokens"] - before.get("speculative.draft_tokens", 0)
+    accepted = after["speculative.accepted_tokens"] - before.get("speculative.accepted_tokens", 0)
+    assert after["speculative.generations"] == before.get("speculative.generations", 0) + 1
+    assert proposed > 0 and 0 <= accepted <= proposed
+    assert 0 <= after["speculative.acceptance_rate"] <= 1
+
+
+def test_draft_with_other_vocabulary_is_not_used(models, monkeypatch):
+    target, _, foreign = models
+    monkeypatch.setattr(speculative, "SPECULATIVE_DRAFT_MODELS", {target: foreign})
+    model = GPT2LMHeadModel.from_pretrained(target)
+
+    assert load_draft_model(target, model, "fp32", "cpu") is None
+    assert load_draft_model("other", model, "fp32", "cpu") is None
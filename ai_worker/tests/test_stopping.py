@@ -0,0 +1,87 @@
+"""Ограничения генерации из запроса"""
+import torch
+
+from ai_worker.worker.core.config import GENERATION_MAX_NEW_TOKENS
+from ai_worker.worker.core.stopping import (
+    GenerationOptions,
+    SentenceBoundaryCriteria,
+    StopStringCriteria,
+    generation_params,
+    trim_stop,
+)
+
+
+class WordTokenizer:
+    """Токен — индекс слова в словаре."""
+
+    vocabulary = ["Hello", " world", ".", " again", "!", " ok. "]
+
+    def decode(self, tokens):
+        return "".join(self.vocabulary[token] for token in tokens)
+
+
+def test_options_are_capped_by_worker_limit():
+    options = GenerationOptions.from_dict({"max_new_tokens": GENERATION_MAX_NEW_TOKENS * 2,
+                                           "stop": ("\n",), "stop_at_sentence": 1})
+
+    assert options.max_new_tokens == GENERATION_MAX_NEW_TOKENS
+    assert options.stop == ["\n"]
+    assert options.stop_at_sentence is True
+    assert GenerationOptions.from_dict(None) == GenerationOptions()
+
+
+def test_trim_stop_cuts_before_earliest_stop_string():
+    assert trim_stop("one END two\nthree", ["\n", "END"]) == "one "
+    assert trim_stop("no stops here", ["###"]) == "no stops here"
+    assert trim_stop("text", []) == "text"
+
+
+def test_sentence_boundary_checks_only_last_token_of_each_row():
+    criteria = SentenceBoundaryCriteria(WordTokenizer(), prompt_length=1)
+    input_ids = torch.tensor([[0, 1, 2], [0, 2, 3], [0, 3, 5]])
+
+    assert criteria(input_ids, None).tolist() == [True, False, True]
+
+
+def test_sentence_boundary_ignores_prompt():
+    criteria = SentenceBoundaryCriteria(WordTokenizer(), prompt_length=2)
+
+    assert not criteria(torch.tensor([[0, 2]]), None).any()
+
+
+def test_generation_params():
+    options = GenerationOptions(max_new_tokens=50, stop=["\n"], time_budget_ms=1500,
+                                stop_at_sentence=True)
+    tokenizer = WordTokenizer()
+
+    params = generation_params(options, tokenizer, prompt_length=90, max_positions=100)
+
+    assert params["max_new_tokens"] == 10
+    assert params["stop_strings"] == ["\n"] and params["tokenizer"] is tokenizer
+    assert params["max_time"] == 1.5
+    assert [type(item) for item in params["stopping_criteria"]] == [SentenceBoundaryCriteria]
+    assert generation_params(GenerationOptions(), tokenizer, 10) == {
+        "max_new_tokens": GENERATION_MAX_NEW_TOKENS}
+
+
+def test_stop_string_spanning_tokens_is_found():
+    criteria = StopStringCriteria(WordTokenizer(), prompt_length=1, stop=["d."])
+
+    assert not criteria(torch.tensor([[3, 0, 0, 0, 1]]), None).any()
+    # Стоп-строка начинается в уже проверенном токене и заканчивается в новом
+    assert criteria(torch.tensor([[3, 0, 0, 0, 1, 2]]), None).all()
+
+
+def test_assisted_generation_checks_stop_strings_itself():
+    tokenizer = WordTokenizer()
+
+    params = generation_params(GenerationOptions(stop=["\n"]), tokenizer, prompt_length=5, assisted=True)
+
+    assert "stop_strings" not in params and "tokenizer" not in params
+    assert [type(item) for item in params["stopping_criteria"]] == [StopStringCriteria]
+
+
+def test_full_window_still_allows_one_token():
+    params = generation_params(GenerationOptions(), WordTokenizer(), prompt_length=100, max_positions=100)
+
+    assert params["max_new_tokens"] == 1
@@ -0,0 +1,93 @@
+"""Потоковая передача токенов: буферизация записей в Redis Stream"""
+import json
+
+import fakeredis
+import pytest
+
+from ai_worker.worker.core import streaming
+from ai_worker.worker.core.stopping import GenerationOptions
+from ai_worker.worker.core.stub_client import StubClient, StubTokenizer
+
+
+@pytest.fixture
+def redis(monkeypatch):
+    client = fakeredis.FakeRedis(decode_responses=True)
+    monkeypatch.setattr(streaming, "get_redis", lambda: client)
+    return client
+
+
+def token_texts(redis, task_id: str):
+    return [json.loads(fields["data"])["text"] for _, fields in redis.xrange(streaming.stream_key(task_id))]
+
+
+def test_fragments_are_sent_in_batches(redis):
+    streamer = streaming.RedisTokenStreamer(StubTokenizer(), "task", flush_tokens=3, flush_ms=60_000)
+
+    for index in range(7):
+        streamer.on_finalized_text(f"t{index} ")
+    assert token_texts(redis, "task") == ["t0 t1 t2 ", "t3 t4 t5 "]
+
+    streamer.on_finalized_text("", stream_end=True)
+    assert token_texts(redis, "task") == ["t0 t1 t2 ", "t3 t4 t5 ", "t6 "]
+
+
+def test_interval_flushes_partial_batch(redis):
+    streamer = streaming.RedisTokenStreamer(StubTokenizer(), "task", flush_tokens=100, flush_ms=0)
+
+    streamer.on_finalized_text("a")
+    streamer.on_finalized_text("b")
+
+    assert token_texts(redis, "task") == ["a", "b"]
+
+
+def test_ttl_is_set_once(redis):
+    streamer = streaming.RedisTokenStreamer(StubTokenizer(), "task", flush_tokens=1)
+    key = streaming.stream_key("task")
+
+    streamer.on_finalized_text("a")
+    assert redis.ttl(key) > 0
+    # Последующие записи TTL не трогают
+    redis.persist(key)
+    streamer.on_finalized_text("b")
+
+    assert token_texts(redis, "task") == ["a", "b"]
+    assert redis.ttl(key) == -1
+
+
+def test_empty_end_writes_nothing(redis):
+    streamer = streaming.RedisTokenStreamer(StubTokenizer(), "task")
+
+    streamer.on_finalized_text("", stream_end=True)
+
+    assert not redis.exists(streaming.stream_key("task"))
+
+
+def test_stop_string_never_reaches_the_stream(redis):
+    streamer = streaming.RedisTokenStreamer(StubTokenizer(), "task", flush_tokens=1, stop=["END", "\n\n"])
+
+    for text in ("Hello E", "N", "d world", " and E", "ND tail"):
+        streamer.on_finalized_text(text)
+    streamer.on_finalized_text("", stream_end=True)
+
+    assert "".join(token_texts(redis, "task")) == "Hello ENd world and "
+
+
+def test_held_back_tail_is_released_at_the_end(redis):
+    streamer = streaming.RedisTokenStreamer(StubTokenizer(), "task", flush_tokens=1, stop=["###"])
+
+    streamer.on_finalized_text("answer #")
+    assert token_texts(redis, "task") == ["answer "]
+    streamer.on_finalized_text("#", stream_end=True)
+
+    assert "".join(token_texts(redis, "task")) == "answer ##"
+
+
+def test_streamed_text_matches_stub_answer(redis):
+    options = GenerationOptions(stop=["three"])
+    streamer = streaming.RedisTokenStreamer(StubTokenizer(), "task", stop=options.stop)
+
+    result = StubClient(token_ms=0, new_tokens=5).generate_text("one two three four five", streamer=streamer,
+                                                               options=options)
+
+    assert result == "one two "
+    assert "".join(token_texts(redis, "task")) == result
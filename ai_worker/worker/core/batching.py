@@ -0,0 +1,160 @@
+"""Динамический микробатчинг запросов к модели"""
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional
+
+from transformers import TextStreamer
+
+from ai_worker.worker.core.cancellation import TaskControl
+from ai_worker.worker.core.config import MODEL_NAME, BATCH_MAX_SIZE, BATCH_MAX_WAIT_MS
+from ai_worker.worker.core.context import History, context_builder
+from ai_worker.worker.core.huggingai_client import Prompt
+from ai_worker.worker.core.model_registry import model_registry
+from ai_worker.worker.core.stopping import GenerationOptions
+from ai_worker.worker.core.streaming import RedisTokenStreamer
+from ai_worker.worker.utils.logger import logger
+from ai_worker.worker.utils.metrics import metrics
+from fastapi_api.app.utils.tracing import span
+
+
+@dataclass
+class BatchItem:
+    """Промпт в очереди батча: условие остановки, стример задачи и Future с результатом."""
+    prompt: Prompt
+    should_stop: Optional[Callable[[], bool]] = None
+    streamer: Optional[TextStreamer] = None
+    future: Future = field(default_factory=Future)
+
+
+class BatchingEngine:
+    """
+    Собирает одновременно пришедшие промпты в батч (не более max_batch_size
+    элементов или max_wait_ms миллисекунд ожидания), выполняет один батчевый
+    generate и возвращает каждому ожидающему потоку его результат.
+    Промпты, для которых should_stop уже вернул True (задача отменена или
+    вышло время), в батч не попадают; остальные останавливаются по нему
+    между шагами декодирования, не прерывая соседей по батчу.
+    """
+
+    def __init__(self, model_name: str = MODEL_NAME,
+                 max_batch_size: int = BATCH_MAX_SIZE,
+                 max_wait_ms: float = BATCH_MAX_WAIT_MS):
+        self.model_name = model_name
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max_wait_ms / 1000
+        self._queue: "queue.Queue[BatchItem]" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def generate(self, prompt: Prompt, should_stop: Optional[Callable[[], bool]] = None,
+                 streamer: Optional[TextStreamer] = None) -> str:
+        """Ставит промпт в очередь и блокируется до получения результата."""
+        return self.submit(prompt, should_stop, streamer).result()
+
+    def submit(self, prompt: Prompt, should_stop: Optional[Callable[[], bool]] = None,
+               streamer: Optional[TextStreamer] = None) -> Future:
+        """Ставит промпт в очередь и возвращает Future с результатом."""
+        item = BatchItem(prompt, should_stop, streamer)
+        self._ensure_started()
+        self._queue.put(item)
+        return item.future
+
+    def _ensure_started(self) -> None:
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(
+                    target=self._run, name=f"batching-{self.model_name}", daemon=True
+                )
+                self._thread.start()
+
+    def _collect(self) -> List[BatchItem]:
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=timeout))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self) -> None:
+        while True:
+            batch = []
+            for item in self._collect():
+                if item.should_stop is not None and item.should_stop():
+                    # Пустой ответ: задача сама узнает об отмене или лимите через TaskControl.check
+                    metrics.inc("batching.dropped")
+                    item.future.set_result("")
+                else:
+                    batch.append(item)
+            if not batch:
+                continue
+            metrics.inc("batching.batches")
+            metrics.inc("batching.items", len(batch))
+            metrics.set("batching.last_batch_size", len(batch))
+            try:
+                with model_registry.use(self.model_name) as client:
+                    results = client.generate_batch([item.prompt for item in batch],
+                                                    should_stop=[item.should_stop for item in batch],
+                                                    streamers=[item.streamer for item in batch])
+                for item, result in zip(batch, results):
+                    item.future.set_result(result)
+            except Exception as e:
+                logger.error("Ошибка батчевой генерации (%d промптов): %s", len(batch), e)
+                for item in batch:
+                    if not item.future.done():
+                        item.future.set_exception(e)
+
+
+_engines: Dict[str, BatchingEngine] = {}
+_engines_lock = threading.Lock()
+
+
+def get_batching_engine(model_name: str = MODEL_NAME) -> BatchingEngine:
+    """Возвращает общий для процесса движок батчинга для модели model_name."""
+    with _engines_lock:
+        engine = _engines.get(model_name)
+        if engine is None:
+            engine = BatchingEngine(model_name)
+            _engines[model_name] = engine
+        return engine
+
+
+def generate_text(input_data: str, model_name: str = MODEL_NAME,
+                  task_id: Optional[str] = None, history: Optional[History] = None,
+                  options: Optional[GenerationOptions] = None,
+                  control: Optional[TaskControl] = None) -> str:
+    """
+    Генерирует ответ модели: через движок батчинга, если BATCH_MAX_SIZE > 1,
+    иначе напрямую, без накладных расходов на ожидание батча. Ответ задачи
+    task_id транслируется в её Redis Stream: при прямой генерации по мере
+    декодирования, в батче — одним событием по завершении строки.
+    Если передана история диалога, промпт собирается из неё в пределах бюджета токенов.
+    Запросы с собственными ограничениями генерации options идут мимо батча:
+    батч генерируется одним вызовом с общими ограничениями.
+    control останавливает генерацию при отмене задачи или по мягкому лимиту
+    времени, в том числе строку батча.
+    """
+    with model_registry.use(model_name) as client:
+        input_ids = None
+        if history is not None:
+            with span("context.build", turns=len(history.turns)):
+                input_ids = context_builder.build(model_name, client.tokenizer, history, input_data)
+        streamer = RedisTokenStreamer(client.tokenizer, task_id,
+                                      stop=options.stop if options else None) if task_id else None
+        should_stop = control.should_stop if control is not None else None
+        if BATCH_MAX_SIZE > 1 and options is None:
+            # Токенизация и генерация идут в потоке батчинга: этап виден целиком
+            with span("batch.generate"):
+                return get_batching_engine(model_name).generate(
+                    input_ids if input_ids is not None else input_data, should_stop, streamer)
+        prefix_lengths = (len(context_builder.system_tokens(model_name, client.tokenizer)),)
+        return client.generate_text(input_data, streamer=streamer, input_ids=input_ids,
+                                    prefix_lengths=prefix_lengths, options=options,
+                                    should_stop=should_stop)
@@ -0,0 +1,65 @@
+"""
+Отмена и ограничение времени обработки задачи в воркере.
+
+Флаг отмены ставит API (DELETE /api/chat/{task_id}). Во время генерации он
+проверяется критерием остановки не чаще раза в CANCEL_CHECK_INTERVAL_MS,
+поэтому шаг декодирования не ждёт Redis. Мягкий лимит TASK_SOFT_TIME_LIMIT
+проверяется там же и работает в любом пуле, в отличие от лимитов Celery,
+которые в пулах solo и threads не применяются.
+"""
+import time
+from typing import Optional
+
+from ai_worker.worker.core.config import TASK_SOFT_TIME_LIMIT, CANCEL_CHECK_INTERVAL_MS
+from ai_worker.worker.core.redis_client import get_redis
+from ai_worker.worker.utils.logger import logger
+from fastapi_api.app.utils.cancellation import cancel_key
+
+
+class TaskCancelled(Exception):
+    """Задача отменена пользователем."""
+
+
+class TaskTimeLimitExceeded(Exception):
+    """Обработка задачи превысила мягкий лимит времени."""
+
+
+class TaskControl:
+    """Состояние отмены и срок обработки одной задачи."""
+
+    def __init__(self, task_id: str, soft_time_limit: float = TASK_SOFT_TIME_LIMIT,
+                 check_interval_ms: float = CANCEL_CHECK_INTERVAL_MS):
+        self.task_id = task_id
+        self.soft_time_limit = soft_time_limit
+        self.deadline: Optional[float] = time.monotonic() + soft_time_limit if soft_time_limit > 0 else None
+        self.check_interval = check_interval_ms / 1000
+        self._cancelled = False
+        self._checked_at = float("-inf")
+
+    def cancelled(self, force: bool = False) -> bool:
+        """Отменена ли задача; Redis опрашивается не чаще check_interval (или сразу при force)."""
+        if self._cancelled:
+            return True
+        now = time.monotonic()
+        if force or now - self._checked_at >= self.check_interval:
+            self._checked_at = now
+            try:
+                self._cancelled = bool(get_redis().exists(cancel_key(self.task_id)))
+            except Exception as e:
+                # Без Redis отмену не узнать: задача продолжается, статус в БД защищён финализатором
+                logger.warning(f"Не удалось проверить отмену задачи {self.task_id}: {str(e)}")
+        return self._cancelled
+
+    def expired(self) -> bool:
+        return self.deadline is not None and time.monotonic() >= self.deadline
+
+    def should_stop(self) -> bool:
+        """Критерий остановки генерации: задача отменена или вышло время."""
+        return self.expired() or self.cancelled()
+
+    def check(self) -> None:
+        """Прерывает обработку, если задача отменена или вышло время."""
+        if self.cancelled(force=True):
+            raise TaskCancelled(f"Задача {self.task_id} отменена")
+        if self.expired():
+            raise TaskTimeLimitExceeded(f"Превышено время обработки задачи ({self.soft_time_limit:g} с)")
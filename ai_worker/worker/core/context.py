@@ -0,0 +1,141 @@
+"""Сборка контекста диалога с учётом бюджета токенов"""
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import and_, select
+
+from ai_worker.worker.core.config import (CONTEXT_MAX_TURNS, CONTEXT_TOKEN_BUDGET,
+                                          CONTEXT_CACHE_USERS, GENERATION_MAX_NEW_TOKENS,
+                                          SYSTEM_PROMPT)
+from ai_worker.worker.core.runtime import runtime
+from ai_worker.worker.utils.metrics import metrics
+from fastapi_api.app.db.models import Message, SenderType, Task
+
+SPEAKERS = {SenderType.USER: "User", SenderType.ASSISTANT: "Assistant"}
+# Обрезанная сверху реплика короче этого числа токенов только мешает модели
+MIN_TRUNCATED_TURN = 16
+
+
+@dataclass
+class Turn:
+    message_id: int
+    sender: SenderType
+    content: str
+
+
+@dataclass
+class History:
+    """Предыдущие реплики пользователя, от новых к старым."""
+    user_id: Optional[int] = None
+    turns: List[Turn] = field(default_factory=list)
+
+
+async def load_history(task_id: str, max_turns: int = CONTEXT_MAX_TURNS) -> History:
+    """
+    Загружает последние max_turns сообщений пользователя, отправленных до
+    задачи. Задачи выполняются не по порядку (справедливое планирование,
+    отмена), поэтому более поздние сообщения и ответы в историю не попадают.
+    """
+    query = (
+        select(Message.id, Message.sender, Message.content, Task.user_id)
+        .select_from(Task)
+        .join(Message, and_(Message.user_id == Task.user_id,
+                            Message.created_at < Task.created_at))
+        .where(Task.task_id == task_id)
+        .order_by(Message.created_at.desc(), Message.id.desc())
+        .limit(max_turns)
+    )
+    async with runtime.session_maker() as db:
+        rows = (await db.execute(query)).all()
+    if not rows:
+        return History()
+    return History(
+        user_id=rows[0].user_id,
+        turns=[Turn(row.id, row.sender, row.content) for row in rows]
+    )
+
+
+class ContextBuilder:
+    """
+    Собирает промпт из истории диалога и новой реплики в виде token ids.
+    Токены реплик кэшируются по пользователю и id сообщения, поэтому на каждом
+    шаге токенизируется только новая реплика. Запись кэша сбрасывается, если
+    сообщение исчезло из истории или его текст изменился.
+    Системный промпт, если задан, всегда стоит в начале контекста.
+    """
+
+    def __init__(self, token_budget: int = CONTEXT_TOKEN_BUDGET,
+                 max_users: int = CONTEXT_CACHE_USERS, system_prompt: str = SYSTEM_PROMPT):
+        self.token_budget = token_budget
+        self.max_users = max_users
+        self.system_prompt = system_prompt
+        self._system_tokens: Dict[str, List[int]] = {}
+        self._cache: "OrderedDict[Tuple[str, int], Dict[int, Tuple[int, List[int]]]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def build(self, model_name: str, tokenizer, history: History, input_data: str) -> List[int]:
+        """Возвращает token ids промпта, укладывающиеся в бюджет токенов модели."""
+        system = self.system_tokens(model_name, tokenizer)
+        budget = min(self.token_budget, tokenizer.model_max_length - GENERATION_MAX_NEW_TOKENS) - len(system)
+        if budget < 1:
+            # Системный промпт и ответ занимают всё окно модели: от реплики остаётся хвост
+            metrics.inc("context.budget_exhausted")
+            budget = 1
+        prompt = tokenizer.encode(f"{SPEAKERS[SenderType.USER]}: {input_data}\n"
+                                  f"{SPEAKERS[SenderType.ASSISTANT]}:")
+        if len(prompt) >= budget:
+            return system + prompt[-budget:]
+        context: List[List[int]] = []
+        remaining = budget - len(prompt)
+        for tokens in self._turn_tokens(model_name, tokenizer, history):
+            if len(tokens) <= remaining:
+                context.append(tokens)
+                remaining -= len(tokens)
+                continue
+            if remaining >= MIN_TRUNCATED_TURN:
+                context.append(tokens[-remaining:])
+                metrics.inc("context.truncated_turns")
+            break
+        metrics.inc("context.builds")
+        metrics.inc("context.turns_used", len(context))
+        return system + [token for tokens in reversed(context) for token in tokens] + prompt
+
+    def system_tokens(self, model_name: str, tokenizer) -> List[int]:
+        """Token ids системного промпта — общий префикс всех промптов модели."""
+        if not self.system_prompt:
+            return []
+        tokens = self._system_tokens.get(model_name)
+        if tokens is None:
+            tokens = tokenizer.encode(f"{self.system_prompt}\n")
+            self._system_tokens[model_name] = tokens
+        return tokens
+
+    def _turn_tokens(self, model_name: str, tokenizer, history: History) -> List[List[int]]:
+        if history.user_id is None:
+            return []
+        key = (model_name, history.user_id)
+        with self._lock:
+            cached = self._cache.pop(key, {})
+        fresh: Dict[int, Tuple[int, List[int]]] = {}
+        turns = []
+        for turn in history.turns:
+            content_hash = hash(turn.content)
+            entry = cached.get(turn.message_id)
+            if entry is None or entry[0] != content_hash:
+                entry = (content_hash, tokenizer.encode(f"{SPEAKERS[turn.sender]}: {turn.content}\n"))
+                metrics.inc("context.tokenized_turns")
+            else:
+                metrics.inc("context.cached_turns")
+            fresh[turn.message_id] = entry
+            turns.append(entry[1])
+        with self._lock:
+            # Сообщения, выпавшие из истории, в кэш не возвращаются
+            self._cache[key] = fresh
+            while len(self._cache) > self.max_users:
+                self._cache.popitem(last=False)
+        return turns
+
+
+context_builder = ContextBuilder()
@@ -0,0 +1,59 @@
+"""Распределение ядер хоста между процессами пула воркера"""
+import os
+from typing import List, Optional, Tuple
+
+import torch
+
+from ai_worker.worker.core.config import (TORCH_CORE_BUDGET, TORCH_THREADS, TORCH_INTEROP_THREADS,
+                                          WORKER_CPU_PINNING)
+from ai_worker.worker.utils.logger import logger
+from ai_worker.worker.utils.metrics import metrics
+
+
+def available_cores() -> List[int]:
+    """Ядра, на которых процессу разрешено выполняться."""
+    try:
+        return sorted(os.sched_getaffinity(0))
+    except AttributeError:
+        return list(range(os.cpu_count() or 1))
+
+
+def plan(index: int, processes: int, cores: List[int], budget: int = TORCH_CORE_BUDGET,
+         threads: int = TORCH_THREADS) -> Tuple[int, List[int]]:
+    """
+    Возвращает число потоков и набор ядер процесса index из processes.
+    Бюджет (по умолчанию все доступные ядра) делится между процессами поровну,
+    набор ядер процесса — его непересекающийся срез бюджета.
+    """
+    budget = min(budget or len(cores), len(cores))
+    share = max(1, budget // processes)
+    first = (index % processes) * share % len(cores)
+    cpus = (cores * 2)[first:first + share]
+    return threads or share, cpus
+
+
+def configure_process(index: int = 0, processes: int = 1, pin: bool = WORKER_CPU_PINNING,
+                      interop_threads: int = TORCH_INTEROP_THREADS,
+                      threads: Optional[int] = None) -> None:
+    """
+    Настраивает потоки torch и (при pin) привязку к ядрам для текущего процесса.
+    Вызывается в дочернем процессе до загрузки модели и первых вычислений.
+    """
+    cores = available_cores()
+    planned_threads, cpus = plan(index, processes, cores)
+    threads = threads or planned_threads
+    if pin:
+        os.sched_setaffinity(0, cpus)
+    torch.set_num_threads(threads)
+    try:
+        torch.set_num_interop_threads(interop_threads)
+    except RuntimeError as e:
+        # Пул inter-op потоков уже создан (например, до fork) и не меняется
+        logger.warning(f"Не удалось задать число inter-op потоков torch: {e}")
+    metrics.set("process.torch_threads", threads)
+    metrics.set("process.torch_interop_threads", torch.get_num_interop_threads())
+    logger.info(
+        f"Процесс {index + 1}/{processes}: потоков torch {threads}, "
+        f"inter-op {torch.get_num_interop_threads()}, "
+        f"ядра {','.join(map(str, cpus)) if pin else 'без привязки'}"
+    )
@@ -0,0 +1,28 @@
+"""Публикация событий о завершении задач"""
+import json
+import time
+from typing import Optional
+
+from ai_worker.worker.core.config import TASK_EVENTS_CHANNEL
+from ai_worker.worker.core.redis_client import get_redis
+from ai_worker.worker.utils.logger import logger
+from fastapi_api.app.utils.scheduler import COMPLETED_KEY_PREFIX, COMPLETED_TTL
+
+
+def publish_task_completed(task_id: str, status: str, result: Optional[str]) -> None:
+    """
+    Сообщает API о том, что задача task_id перешла в конечный статус,
+    и учитывает её в посекундном счётчике завершённых задач.
+    """
+    payload = json.dumps({"task_id": task_id, "status": status, "result": result},
+                         ensure_ascii=False)
+    bucket = f"{COMPLETED_KEY_PREFIX}{int(time.time())}"
+    try:
+        pipe = get_redis().pipeline(transaction=False)
+        pipe.publish(TASK_EVENTS_CHANNEL, payload)
+        pipe.incr(bucket)
+        pipe.expire(bucket, COMPLETED_TTL)
+        pipe.execute()
+    except Exception as e:
+        # Клиенты, не дождавшиеся события, получат статус из БД
+        logger.warning(f"Не удалось опубликовать завершение задачи {task_id}: {str(e)}")
@@ -0,0 +1,105 @@
+"""Пакетная запись результатов завершённых задач в БД"""
+import asyncio
+from datetime import datetime
+from typing import List, Optional, Tuple
+
+from sqlalchemy import String, column, insert, literal, select, update, values
+
+from ai_worker.worker.core.config import WORKER_FINALIZE_BATCH, WORKER_FINALIZE_DELAY_MS
+from ai_worker.worker.core.runtime import runtime
+from ai_worker.worker.utils.logger import logger
+from ai_worker.worker.utils.metrics import metrics
+from fastapi_api.app.db.models import Task, TaskStatus, Message, SenderType
+
+Completion = Tuple[str, str, asyncio.Future]
+
+
+class TaskFinalizer:
+    """
+    Буфер завершённых задач (write-behind). Результаты копятся до
+    max_delay_ms миллисекунд или max_batch записей и сохраняются одним
+    запросом: UPDATE tasks ... FROM (VALUES ...) и многострочный INSERT
+    в messages в одной транзакции. Вызывающий получает ответ только после
+    коммита пакета, поэтому задача подтверждается брокеру (acks_late)
+    лишь когда результат уже в БД. Повторная доставка безопасна: обновляются
+    только ещё не завершённые задачи.
+
+    Все методы, кроме конструктора, выполняются в event loop воркера (runtime).
+    """
+
+    def __init__(self, max_batch: int = WORKER_FINALIZE_BATCH,
+                 max_delay_ms: float = WORKER_FINALIZE_DELAY_MS):
+        self.max_batch = max(1, max_batch)
+        self.max_delay = max_delay_ms / 1000
+        self._pending: List[Completion] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+
+    async def complete(self, task_id: str, result: str) -> None:
+        """Ставит результат задачи в пакет и ждёт его записи в БД."""
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((task_id, result, future))
+        if len(self._pending) >= self.max_batch or self.max_delay <= 0:
+            await self.flush()
+        elif self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(
+                self.max_delay, lambda: asyncio.ensure_future(self.flush())
+            )
+        await future
+
+    async def flush(self) -> None:
+        """Немедленно записывает накопленный пакет."""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if not batch:
+            return
+        try:
+            written = await self._write(batch)
+            metrics.inc("finalizer.flushes")
+            metrics.inc("finalizer.completions", len(batch))
+            metrics.set("finalizer.last_batch_size", len(batch))
+            if written != len(batch):
+                logger.warning(f"Из {len(batch)} задач пакета обновлено {written}: "
+                               f"остальные не найдены или уже завершены")
+            for _, _, future in batch:
+                if not future.done():
+                    future.set_result(None)
+        except Exception as e:
+            logger.error(f"Ошибка записи пакета из {len(batch)} задач: {str(e)}")
+            for _, _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+
+    async def _write(self, batch: List[Completion]) -> int:
+        now = datetime.now()
+        results = values(column("task_id", String), column("result", String),
+                         name="results").data([(task_id, result) for task_id, result, _ in batch])
+        completed = (
+            update(Task)
+            .where(Task.task_id == results.c.task_id,
+                   Task.status.notin_((TaskStatus.COMPLETED, TaskStatus.CANCELLED)))
+            .values(status=TaskStatus.COMPLETED, result=results.c.result, updated_at=now)
+            .returning(Task.id, Task.user_id, Task.result)
+            .cte("completed")
+        )
+        sender = literal(SenderType.ASSISTANT, type_=Message.__table__.c.sender.type)
+        statement = (
+            insert(Message)
+            .from_select(
+                ["user_id", "task_id", "sender", "content", "created_at"],
+                select(completed.c.user_id, completed.c.id, sender, completed.c.result,
+                       literal(now)),
+                include_defaults=False
+            )
+            .add_cte(completed)
+            .returning(Message.id)
+        )
+        async with runtime.session_maker() as db:
+            inserted = await db.execute(statement)
+            written = len(inserted.all())
+            await db.commit()
+        return written
+
+
+task_finalizer = TaskFinalizer()
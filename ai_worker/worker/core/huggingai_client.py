@@ -1,55 +1,204 @@
 """Клиент для взаимодействия с локальной моделью Hugging Face"""
+import time
+from typing import Callable, List, Optional, Sequence, Union
+
 import torch
-from transformers import AutoModelForCausalLM, AutoTokenizer
+from transformers import AutoTokenizer, StoppingCriteriaList, TextStreamer
 
-from ai_worker.worker.core.config import MODEL_NAME
+from ai_worker.worker.core.config import MODEL_NAME, MODEL_BACKEND, SAMPLING_PARAMS
+from ai_worker.worker.core.prefix_cache import PrefixCache, to_legacy
+from ai_worker.worker.core.quantization import load_model
+from ai_worker.worker.core.speculative import load_draft_model
+from ai_worker.worker.core.stopping import (BatchCallbackCriteria, GenerationOptions, generation_params,
+                                            trim_stop)
 from ai_worker.worker.utils.logger import logger
+from ai_worker.worker.utils.metrics import metrics
+from fastapi_api.app.utils.tracing import span
+
+# Промпт: текст либо уже собранные token ids (контекст диалога)
+Prompt = Union[str, List[int]]
 
 
 class HuggingFaceClient:
-    def __init__(self):
-        self.model_name = MODEL_NAME
+    def __init__(self, model_name: str = MODEL_NAME, backend: str = MODEL_BACKEND):
+        self.model_name = model_name
+        self.backend = backend
         try:
             logger.info(f"Загрузка токенизатора для модели {self.model_name}")
             self.tokenizer = AutoTokenizer.from_pretrained(self.model_name)
-            logger.info(f"Загрузка модели {self.model_name}")
-            self.model = AutoModelForCausalLM.from_pretrained(self.model_name)
-            self.device = "cuda" if torch.cuda.is_available() else "cpu"
+            # Для батчей промпты дополняются слева, чтобы генерация шла с общего конца
+            self.tokenizer.padding_side = "left"
+            if self.tokenizer.pad_token is None:
+                self.tokenizer.pad_token = self.tokenizer.eos_token
+            logger.info(f"Загрузка модели {self.model_name} в режиме {self.backend}")
+            self.model = load_model(self.model_name, self.backend)
+            # Динамически квантованные слои работают только на CPU
+            self.device = "cuda" if torch.cuda.is_available() and self.backend != "int8" else "cpu"
             self.model.to(self.device)
+            # Предел позиций модели: промпт и новые токены вместе не могут его превысить
+            self.max_positions = (getattr(self.model.config, "n_positions", None)
+                                  or getattr(self.model.config, "max_position_embeddings", None))
             logger.info(f"Модель {self.model_name} загружена на устройство {self.device}")
+            self.prefix_cache = PrefixCache()
+            # Черновая модель для спекулятивной генерации (если задана для этой модели)
+            self.draft = load_draft_model(self.model_name, self.model, self.backend, self.device)
         except Exception as e:
             logger.error(f"Ошибка загрузки модели {self.model_name}: {str(e)}")
             raise RuntimeError(f"Ошибка инициализации модели: {str(e)}")
 
-    def generate_text(self, input_data: str) -> str:
-        """Генерирует текст с использованием локальной модели."""
+    def generate_text(self, input_data: str, streamer: Optional[TextStreamer] = None,
+                      input_ids: Optional[List[int]] = None,
+                      prefix_lengths: Sequence[int] = (),
+                      options: Optional[GenerationOptions] = None,
+                      should_stop: Optional[Callable[[], bool]] = None) -> str:
+        """
+        Генерирует текст с использованием локальной модели.
+        Если переданы input_ids (контекст диалога), генерация идёт по ним,
+        и возвращаются только новые токены. Prefill продолжается с самого
+        длинного префикса из кэша; после генерации в кэш сохраняется весь
+        промпт и префиксы длин prefix_lengths (например, системный промпт).
+        Если передан streamer, токены отдаются ему по мере генерации.
+        При заданной черновой модели генерация спекулятивная.
+        options ограничивают число новых токенов, время генерации и задают
+        стоп-строки и остановку на границе предложения; should_stop
+        проверяется между шагами декодирования (отмена, лимит времени задачи).
+        """
+        options = options or GenerationOptions()
         try:
-            logger.info(f"Токенизация входных данных: {input_data}")
-            inputs = self.tokenizer(input_data, return_tensors="pt").to(self.device)
-            logger.info("Генерация текста моделью")
-            outputs = self.model.generate(
-                inputs["input_ids"],
-                max_length=100,  # Увеличено для тестов
-                num_return_sequences=1,
-                no_repeat_ngram_size=2,
-                do_sample=True,
-                top_k=50,
-                top_p=0.95,
-                temperature=0.7
-            )
-            result = self.tokenizer.decode(outputs[0], skip_special_tokens=True)
+            past_key_values = None
+            with span("tokenize") as attrs:
+                if input_ids is None:
+                    logger.debug("Токенизация входных данных: %s", input_data)
+                    prompt_ids = self.tokenizer(input_data, return_tensors="pt")["input_ids"]
+                else:
+                    prompt_ids = torch.tensor([input_ids])
+                prompt_ids = prompt_ids.to(self.device)
+                attrs["prompt_tokens"] = prompt_ids.shape[1]
+            if input_ids is not None and self.prefix_cache.enabled:
+                with span("prefix_cache.lookup") as attrs:
+                    past_key_values, cached = self.prefix_cache.lookup(input_ids)
+                    attrs["cached_tokens"] = cached
+                if cached:
+                    logger.info("Префикс из кэша: %d из %d токенов промпта", cached, len(input_ids))
+            logger.debug("Генерация текста моделью")
+            assisted = {}
+            if self.draft is not None:
+                self.draft.start()
+                assisted["assistant_model"] = self.draft.model
+            started = time.perf_counter()
+            limits = generation_params(options, self.tokenizer, prompt_ids.shape[1], self.max_positions,
+                                       should_stop, assisted=self.draft is not None)
+            with span("generate", backend=self.backend, device=self.device,
+                      max_new_tokens=limits["max_new_tokens"]) as attrs, torch.inference_mode():
+                outputs = self.model.generate(
+                    prompt_ids,
+                    attention_mask=torch.ones_like(prompt_ids),
+                    pad_token_id=self.tokenizer.pad_token_id,
+                    streamer=streamer,
+                    past_key_values=past_key_values,
+                    return_dict_in_generate=True,
+                    **limits,
+                    **SAMPLING_PARAMS,
+                    **assisted
+                )
+                new_tokens = outputs.sequences.shape[1] - prompt_ids.shape[1]
+                attrs["new_tokens"] = new_tokens
+                if new_tokens < limits["max_new_tokens"]:
+                    metrics.inc("generation.stopped_early")
+                if self.draft is not None:
+                    stats = self.draft.finish(new_tokens)
+                    attrs["draft_tokens"] = stats.draft_tokens
+                    attrs["accepted_tokens"] = stats.accepted_tokens
+            self._record_throughput(new_tokens, time.perf_counter() - started)
+            sequence = outputs.sequences[0]
+            if input_ids is not None and self.prefix_cache.enabled and outputs.past_key_values is not None:
+                with span("prefix_cache.store"):
+                    state = to_legacy(outputs.past_key_values)
+                    for length in (*prefix_lengths, len(input_ids)):
+                        if length:
+                            self.prefix_cache.store(input_ids[:length], state)
+            with span("decode"):
+                output_ids = sequence if input_ids is None else sequence[prompt_ids.shape[1]:]
+                result = self.tokenizer.decode(output_ids, skip_special_tokens=True)
+                if options.stop:
+                    # Текстовый промпт входит в ответ, стоп-строки ищутся только после него
+                    start = 0 if input_ids is not None else len(
+                        self.tokenizer.decode(prompt_ids[0], skip_special_tokens=True))
+                    result = result[:start] + trim_stop(result[start:], options.stop)
             if not isinstance(result, str):
                 raise RuntimeError(f"Ожидалась строка, получен {type(result)}")
-            logger.info(f"Текст успешно сгенерирован: {result}")
+            logger.debug("Текст успешно сгенерирован: %s", result)
             return result
         except Exception as e:
-            logger.error(f"Ошибка генерации текста: {str(e)}")
+            logger.error("Ошибка генерации текста: %s", e)
             raise RuntimeError(f"Ошибка обработки AI: {str(e)}")
 
+    def generate_batch(self, prompts: List[Prompt],
+                       should_stop: Sequence[Optional[Callable[[], bool]]] = (),
+                       streamers: Sequence[Optional[TextStreamer]] = ()) -> List[str]:
+        """
+        Генерирует ответы на несколько промптов одним вызовом generate.
+        Для промптов в виде token ids возвращаются только новые токены.
+        Спекулятивная генерация в transformers работает только для одного
+        промпта, поэтому батч генерируется основной моделью.
+        should_stop[i] останавливает строку i между шагами декодирования
+        (отмена задачи, лимит времени), остальные строки продолжаются.
+        TextStreamer не поддерживает батчи, поэтому streamers[i] получает
+        новый текст строки i целиком после генерации.
+        """
+        try:
+            logger.debug("Токенизация батча из %d промптов", len(prompts))
+            encoded = [prompt if isinstance(prompt, list) else self.tokenizer.encode(prompt)
+                       for prompt in prompts]
+            inputs = self.tokenizer.pad({"input_ids": encoded}, return_tensors="pt").to(self.device)
+            prompt_length = inputs["input_ids"].shape[1]
+            limits = generation_params(GenerationOptions(), self.tokenizer, prompt_length, self.max_positions)
+            if any(check is not None for check in should_stop):
+                limits["stopping_criteria"] = StoppingCriteriaList([BatchCallbackCriteria(should_stop)])
+            logger.debug("Генерация текста моделью для батча")
+            with torch.inference_mode():
+                outputs = self.model.generate(
+                    inputs["input_ids"],
+                    attention_mask=inputs["attention_mask"],
+                    pad_token_id=self.tokenizer.pad_token_id,
+                    **limits,
+                    **SAMPLING_PARAMS
+                )
+            results = [
+                self.tokenizer.decode(
+                    output if isinstance(prompt, str) else output[prompt_length:],
+                    skip_special_tokens=True
+                )
+                for prompt, output in zip(prompts, outputs)
+            ]
+            for streamer, output in zip(streamers, outputs):
+                if streamer is not None:
+                    streamer.on_finalized_text(
+                        self.tokenizer.decode(output[prompt_length:], skip_special_tokens=True),
+                        stream_end=True)
+            logger.info("Батч из %d ответов успешно сгенерирован", len(results))
+            return results
+        except Exception as e:
+            logger.error("Ошибка генерации батча: %s", e)
+            raise RuntimeError(f"Ошибка обработки AI: {str(e)}")
+
+    @staticmethod
+    def _record_throughput(new_tokens: int, seconds: float) -> None:
+        """Накопленная скорость генерации, токенов в секунду (с учётом спекуляции)."""
+        metrics.inc("generation.new_tokens", new_tokens)
+        metrics.inc("generation.seconds", seconds)
+        snapshot = metrics.snapshot()
+        if snapshot["generation.seconds"]:
+            metrics.set("generation.tokens_per_second",
+                        round(snapshot["generation.new_tokens"] / snapshot["generation.seconds"], 2))
+
     def cleanup(self):
         """Очищает ресурсы модели."""
         if hasattr(self, "model"):
             logger.info("Очистка ресурсов модели")
+            self.prefix_cache.clear()
+            if self.draft is not None:
+                self.draft.cleanup()
             del self.model
             del self.tokenizer
             if torch.cuda.is_available():
@@ -0,0 +1,71 @@
+"""Периодическая публикация метрик процесса воркера в Redis"""
+import json
+import os
+import socket
+import threading
+import time
+from typing import Optional
+
+from ai_worker.worker.core.config import METRICS_KEY_PREFIX, METRICS_REPORT_INTERVAL
+from ai_worker.worker.core.redis_client import get_redis
+from ai_worker.worker.utils.logger import logger
+from ai_worker.worker.utils.memory import get_memory_info
+from ai_worker.worker.utils.metrics import metrics
+
+
+class MetricsReporter:
+    """
+    Раз в interval секунд записывает снимок метрик и памяти процесса в ключ
+    METRICS_KEY_PREFIX<хост>:<pid>. Ключ живёт три интервала, поэтому
+    остановившиеся процессы сами пропадают из списка.
+    """
+
+    def __init__(self, interval: float = METRICS_REPORT_INTERVAL):
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._key = ""
+
+    def start(self) -> None:
+        """Запускает публикацию в текущем процессе (вызывается после fork)."""
+        if self.interval <= 0 or self._thread is not None:
+            return
+        self._key = f"{METRICS_KEY_PREFIX}{socket.gethostname()}:{os.getpid()}"
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="metrics-reporter", daemon=True)
+        self._thread.start()
+
+    def report(self) -> None:
+        """Публикует текущий снимок метрик."""
+        for name, size in get_memory_info().items():
+            metrics.set(f"process.{name}_bytes", size)
+        payload = {
+            "worker": self._key[len(METRICS_KEY_PREFIX):],
+            "updated_at": time.time(),
+            "metrics": metrics.snapshot(),
+        }
+        get_redis().set(self._key, json.dumps(payload), ex=max(1, int(self.interval * 3)))
+
+    def stop(self) -> None:
+        """Останавливает публикацию и удаляет метрики процесса из Redis."""
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+        try:
+            get_redis().delete(self._key)
+        except Exception as e:
+            logger.warning(f"Не удалось удалить метрики процесса {self._key}: {e}")
+
+    def _run(self) -> None:
+        while True:
+            try:
+                self.report()
+            except Exception as e:
+                logger.warning(f"Не удалось опубликовать метрики процесса: {e}")
+            if self._stop.wait(self.interval):
+                return
+
+
+metrics_reporter = MetricsReporter()
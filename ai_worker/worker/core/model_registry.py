@@ -0,0 +1,133 @@
+"""Реестр моделей, резидентных в процессе воркера"""
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterable, Iterator, Optional
+
+from ai_worker.worker.core.config import MODEL_NAME, MODEL_BACKEND, MODEL_IDLE_TIMEOUT, PRELOAD_MODELS
+from ai_worker.worker.core.huggingai_client import HuggingFaceClient
+from ai_worker.worker.core.stub_client import StubClient
+from ai_worker.worker.utils.logger import logger
+from ai_worker.worker.utils.memory import get_rss_bytes, get_memory_info, format_bytes, format_memory
+from ai_worker.worker.utils.metrics import metrics
+from fastapi_api.app.utils.tracing import span
+
+
+class ModelRegistry:
+    """
+    Хранит загруженные модели на всё время жизни процесса воркера.
+    Модель загружается один раз (при старте процесса или при первом обращении)
+    и переиспользуется всеми задачами. Если задан idle_timeout, модели,
+    к которым не обращались дольше этого времени, выгружаются.
+    """
+
+    def __init__(self, idle_timeout: float = MODEL_IDLE_TIMEOUT):
+        self.idle_timeout = idle_timeout
+        self._clients: Dict[str, HuggingFaceClient] = {}
+        self._last_used: Dict[str, float] = {}
+        self._in_use: Dict[str, int] = {}
+        self._lock = threading.RLock()
+        self._reaper: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    def get(self, model_name: str = MODEL_NAME) -> HuggingFaceClient:
+        """Возвращает клиент модели, загружая её при первом обращении."""
+        with self._lock:
+            client = self._clients.get(model_name)
+            if client is None:
+                client = self._load(model_name)
+            self._last_used[model_name] = time.monotonic()
+            return client
+
+    @contextmanager
+    def use(self, model_name: str = MODEL_NAME) -> Iterator[HuggingFaceClient]:
+        """Выдаёт клиент модели и защищает его от выгрузки на время использования."""
+        with self._lock:
+            client = self.get(model_name)
+            self._in_use[model_name] = self._in_use.get(model_name, 0) + 1
+        try:
+            yield client
+        finally:
+            with self._lock:
+                self._in_use[model_name] -= 1
+                self._last_used[model_name] = time.monotonic()
+
+    def preload(self, model_names: Iterable[str] = PRELOAD_MODELS) -> None:
+        """Загружает перечисленные модели заранее, при старте процесса."""
+        for model_name in model_names:
+            self.get(model_name)
+
+    def unload(self, model_name: str) -> None:
+        """Выгружает модель model_name из памяти процесса."""
+        with self._lock:
+            client = self._clients.pop(model_name, None)
+            self._last_used.pop(model_name, None)
+            if client is None:
+                return
+            client.cleanup()
+            metrics.remove(f"model.{model_name}.load_seconds")
+            metrics.set("models.loaded", len(self._clients))
+            metrics.set("process.rss_bytes", get_rss_bytes())
+            logger.info(f"Модель {model_name} выгружена, RSS процесса: {format_bytes(get_rss_bytes())}")
+
+    def unload_idle(self) -> None:
+        """Выгружает модели, простаивающие дольше idle_timeout."""
+        if self.idle_timeout <= 0:
+            return
+        now = time.monotonic()
+        with self._lock:
+            idle = [name for name, last_used in self._last_used.items()
+                    if now - last_used > self.idle_timeout and not self._in_use.get(name)]
+            for model_name in idle:
+                logger.info(f"Модель {model_name} простаивает дольше {self.idle_timeout} с")
+                self.unload(model_name)
+
+    def loaded_models(self) -> Dict[str, float]:
+        """Возвращает загруженные модели и время последнего обращения к ним."""
+        with self._lock:
+            return dict(self._last_used)
+
+    def close(self) -> None:
+        """Останавливает фоновую выгрузку и освобождает все модели."""
+        self._stop.set()
+        with self._lock:
+            for model_name in list(self._clients):
+                self.unload(model_name)
+
+    def _load(self, model_name: str) -> HuggingFaceClient:
+        rss_before = get_rss_bytes()
+        started = time.perf_counter()
+        with span("model.load", model=model_name):
+            client = StubClient(model_name) if MODEL_BACKEND == "stub" else HuggingFaceClient(model_name)
+        load_seconds = time.perf_counter() - started
+        memory = get_memory_info()
+        self._clients[model_name] = client
+        self._start_reaper()
+        metrics.set(f"model.{model_name}.load_seconds", round(load_seconds, 3))
+        metrics.set("models.loaded", len(self._clients))
+        for name, size in memory.items():
+            metrics.set(f"process.{name}_bytes", size)
+        logger.info(
+            f"Модель {model_name} загружена за {load_seconds:.2f} с, "
+            f"прирост памяти: {format_bytes(memory['rss'] - rss_before)}, "
+            f"память процесса: {format_memory(memory)}"
+        )
+        return client
+
+    def _start_reaper(self) -> None:
+        if self.idle_timeout <= 0 or self._reaper is not None:
+            return
+        self._stop.clear()
+        self._reaper = threading.Thread(target=self._reap, name="model-reaper", daemon=True)
+        self._reaper.start()
+
+    def _reap(self) -> None:
+        interval = max(1.0, self.idle_timeout / 4)
+        while not self._stop.wait(interval):
+            try:
+                self.unload_idle()
+            except Exception as e:
+                logger.error(f"Ошибка выгрузки простаивающих моделей: {str(e)}")
+
+
+model_registry = ModelRegistry()
@@ -0,0 +1,104 @@
+"""Кэш past_key_values для общих префиксов промптов"""
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+from ai_worker.worker.core.config import PREFIX_CACHE_MAX_MB
+from ai_worker.worker.utils.metrics import metrics
+
+# past_key_values в «наследуемом» формате: по паре (key, value) на слой
+LegacyCache = Tuple[Tuple["torch.Tensor", "torch.Tensor"], ...]
+
+
+def to_legacy(past_key_values) -> LegacyCache:
+    """Приводит кэш модели (Cache или кортежи) к наследуемому формату."""
+    if hasattr(past_key_values, "to_legacy_cache"):
+        return past_key_values.to_legacy_cache()
+    return tuple(past_key_values)
+
+
+def crop(past_key_values: LegacyCache, length: int) -> LegacyCache:
+    """Оставляет первые length позиций кэша (копия, не ссылающаяся на исходные тензоры)."""
+    return tuple(
+        (key[:, :, :length, :].clone(), value[:, :, :length, :].clone())
+        for key, value in past_key_values
+    )
+
+
+def cache_nbytes(past_key_values: LegacyCache) -> int:
+    """Размер кэша в байтах."""
+    return sum(key.nbytes + value.nbytes for key, value in past_key_values)
+
+
+class PrefixCache:
+    """
+    LRU-кэш past_key_values, ограниченный по памяти, с ключом по хэшу префикса
+    token ids. Для нового промпта находится самый длинный сохранённый префикс,
+    и генерация продолжается с него, пропуская повторный prefill.
+    """
+
+    def __init__(self, max_mb: float = PREFIX_CACHE_MAX_MB):
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self._entries: "OrderedDict[Tuple[int, int], Tuple[LegacyCache, int]]" = OrderedDict()
+        self._lengths: Dict[int, int] = {}
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    def lookup(self, input_ids: List[int]) -> Tuple[Optional[LegacyCache], int]:
+        """
+        Возвращает (past_key_values, длина) самого длинного сохранённого
+        префикса input_ids. Хотя бы один токен остаётся для прямого прохода.
+        """
+        metrics.inc("prefix_cache.lookups")
+        metrics.inc("prefix_cache.prompt_tokens", len(input_ids))
+        with self._lock:
+            for length in sorted(self._lengths, reverse=True):
+                if length >= len(input_ids):
+                    continue
+                key = (length, hash(tuple(input_ids[:length])))
+                entry = self._entries.get(key)
+                if entry is not None:
+                    self._entries.move_to_end(key)
+                    metrics.inc("prefix_cache.hits")
+                    metrics.inc("prefix_cache.prefill_tokens_saved", length)
+                    return entry[0], length
+        return None, 0
+
+    def store(self, input_ids: List[int], past_key_values: LegacyCache) -> None:
+        """Сохраняет кэш префикса input_ids (past_key_values обрезается до его длины)."""
+        length = len(input_ids)
+        key = (length, hash(tuple(input_ids)))
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                return
+        cropped = crop(past_key_values, length)
+        size = cache_nbytes(cropped)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            self._entries[key] = (cropped, size)
+            self._lengths[length] = self._lengths.get(length, 0) + 1
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                (old_length, _), (_, old_size) = self._entries.popitem(last=False)
+                self._bytes -= old_size
+                self._lengths[old_length] -= 1
+                if not self._lengths[old_length]:
+                    del self._lengths[old_length]
+                metrics.inc("prefix_cache.evictions")
+            metrics.set("prefix_cache.entries", len(self._entries))
+            metrics.set("prefix_cache.bytes", self._bytes)
+
+    def clear(self) -> None:
+        """Освобождает все сохранённые префиксы."""
+        with self._lock:
+            self._entries.clear()
+            self._lengths.clear()
+            self._bytes = 0
+        metrics.set("prefix_cache.entries", 0)
+        metrics.set("prefix_cache.bytes", 0)
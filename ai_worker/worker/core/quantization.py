@@ -0,0 +1,103 @@
+"""
+Загрузка модели в выбранном режиме инференса (fp32, bf16, int8).
+
+Для int8 веса линейных слоёв квантуются динамически (torch.ao.quantization).
+Конвертация выполняется один раз, после чего воркеры загружают готовые веса:
+    python -m ai_worker.worker.core.quantization --model gpt2
+"""
+import argparse
+import os
+import time
+
+import torch
+from torch import nn
+from transformers import AutoConfig, AutoModelForCausalLM
+from transformers.pytorch_utils import Conv1D
+
+from ai_worker.worker.core.config import MODEL_NAME, MODEL_BACKEND, MODEL_MMAP, QUANTIZED_MODELS_DIR
+from ai_worker.worker.core.weights import load_mmap_model
+from ai_worker.worker.utils.logger import logger
+
+BACKENDS = ("fp32", "bf16", "int8")
+INT8_WEIGHTS = "int8.pt"
+
+
+def converted_dir(model_name: str) -> str:
+    """Каталог сконвертированных весов модели."""
+    return os.path.join(QUANTIZED_MODELS_DIR, model_name.replace("/", "--"))
+
+
+def _linearize(model: nn.Module) -> nn.Module:
+    """
+    Заменяет слои Conv1D (GPT-2 и родственные модели) эквивалентными nn.Linear,
+    иначе динамическое квантование их пропускает.
+    """
+    for module in list(model.modules()):
+        for child_name, child in list(module.named_children()):
+            if not isinstance(child, Conv1D):
+                continue
+            in_features, out_features = child.weight.shape
+            linear = nn.Linear(in_features, out_features)
+            linear.weight.data = child.weight.data.t().contiguous()
+            linear.bias.data = child.bias.data
+            setattr(module, child_name, linear)
+    return model
+
+
+def quantize_int8(model: nn.Module) -> nn.Module:
+    """Динамически квантует линейные слои модели в int8."""
+    model = _linearize(model).eval()
+    return torch.ao.quantization.quantize_dynamic(model, {nn.Linear}, dtype=torch.qint8)
+
+
+def load_model(model_name: str = MODEL_NAME, backend: str = MODEL_BACKEND,
+               mmap: bool = MODEL_MMAP) -> nn.Module:
+    """
+    Загружает модель для инференса. Для int8 используются сконвертированные
+    веса, если они есть, иначе модель квантуется при загрузке.
+    С mmap веса fp32 и bf16 отображаются из safetensors без копирования.
+    """
+    if backend not in BACKENDS:
+        raise ValueError(f"Неизвестный режим инференса {backend}, допустимые: {', '.join(BACKENDS)}")
+    if mmap and backend != "int8":
+        return load_mmap_model(model_name, torch.bfloat16 if backend == "bf16" else None)
+    if mmap:
+        logger.warning("Квантованные веса не отображаются в память, MODEL_MMAP игнорируется")
+    if backend == "bf16":
+        return AutoModelForCausalLM.from_pretrained(model_name, torch_dtype=torch.bfloat16).eval()
+    if backend == "fp32":
+        return AutoModelForCausalLM.from_pretrained(model_name).eval()
+    weights = os.path.join(converted_dir(model_name), INT8_WEIGHTS)
+    if not os.path.exists(weights):
+        logger.warning(f"Сконвертированные веса {weights} не найдены, модель {model_name} "
+                       f"квантуется при загрузке")
+        return quantize_int8(AutoModelForCausalLM.from_pretrained(model_name))
+    config = AutoConfig.from_pretrained(converted_dir(model_name))
+    model = quantize_int8(AutoModelForCausalLM.from_config(config))
+    model.load_state_dict(torch.load(weights))
+    logger.info(f"Загружены int8-веса модели {model_name} из {weights}")
+    return model
+
+
+def convert(model_name: str) -> str:
+    """Квантует модель в int8 и сохраняет веса и конфигурацию. Возвращает путь к весам."""
+    started = time.perf_counter()
+    model = quantize_int8(AutoModelForCausalLM.from_pretrained(model_name))
+    output_dir = converted_dir(model_name)
+    os.makedirs(output_dir, exist_ok=True)
+    model.config.save_pretrained(output_dir)
+    weights = os.path.join(output_dir, INT8_WEIGHTS)
+    torch.save(model.state_dict(), weights)
+    logger.info(f"Модель {model_name} сконвертирована в int8 за {time.perf_counter() - started:.1f} с: {weights}")
+    return weights
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", default=MODEL_NAME)
+    args = parser.parse_args()
+    print(convert(args.model))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,24 @@
+"""Подключение воркера к Redis"""
+from typing import Optional
+
+import redis
+
+from ai_worker.worker.core.config import REDIS_URL
+
+_client: Optional[redis.Redis] = None
+
+
+def get_redis() -> redis.Redis:
+    """Возвращает общий для процесса клиент Redis (создаётся при первом обращении)."""
+    global _client
+    if _client is None:
+        _client = redis.Redis.from_url(REDIS_URL, decode_responses=True)
+    return _client
+
+
+def close_redis() -> None:
+    """Закрывает пул соединений с Redis."""
+    global _client
+    if _client is not None:
+        _client.close()
+        _client = None
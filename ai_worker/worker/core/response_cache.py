@@ -0,0 +1,44 @@
+"""Запись сгенерированных ответов в кэш"""
+import time
+from typing import Optional
+
+from ai_worker.worker.core.config import RESPONSE_CACHE_TTL, RESPONSE_CACHE_MAX_ENTRIES
+from ai_worker.worker.core.redis_client import get_redis
+from ai_worker.worker.utils.logger import logger
+from ai_worker.worker.utils.metrics import metrics
+from fastapi_api.app.utils.response_cache import (ENTRY_PREFIX, LRU_KEY, VECTORS_KEY,
+                                                  embed_prompt, pack_vector)
+
+
+def store_response(cache: Optional[dict], prompt: str, result: str) -> None:
+    """
+    Сохраняет ответ под ключом, вычисленным API (cache["key"]).
+    Записи живут RESPONSE_CACHE_TTL секунд; сверх RESPONSE_CACHE_MAX_ENTRIES
+    вытесняются записи, к которым дольше всего не обращались.
+    """
+    if not cache:
+        return
+    key = cache["key"]
+    now = time.time()
+    try:
+        redis = get_redis()
+        pipe = redis.pipeline(transaction=False)
+        pipe.set(f"{ENTRY_PREFIX}{key}", result, ex=RESPONSE_CACHE_TTL)
+        pipe.zadd(LRU_KEY, {key: now})
+        if cache.get("semantic"):
+            pipe.hset(VECTORS_KEY, key, pack_vector(embed_prompt(prompt)))
+        # Ключи записей с истёкшим TTL и вытесняемые по размеру
+        pipe.zrangebyscore(LRU_KEY, "-inf", now - RESPONSE_CACHE_TTL)
+        pipe.zrange(LRU_KEY, 0, -RESPONSE_CACHE_MAX_ENTRIES - 1)
+        *_, expired, overflow = pipe.execute()
+        evicted = set(expired) | set(overflow)
+        if evicted:
+            pipe = redis.pipeline(transaction=False)
+            pipe.zrem(LRU_KEY, *evicted)
+            pipe.hdel(VECTORS_KEY, *evicted)
+            pipe.delete(*(f"{ENTRY_PREFIX}{name}" for name in evicted))
+            pipe.execute()
+            metrics.inc("response_cache.evictions", len(evicted))
+        metrics.inc("response_cache.stores")
+    except Exception as e:
+        logger.warning(f"Не удалось сохранить ответ в кэш: {str(e)}")
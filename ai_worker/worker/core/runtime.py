@@ -0,0 +1,101 @@
+"""Постоянный event loop и пул соединений с БД процесса воркера"""
+import asyncio
+import threading
+from concurrent.futures import Future
+from contextlib import AsyncExitStack
+from typing import Any, Coroutine, Optional, TypeVar
+
+from sqlalchemy.ext.asyncio import (AsyncEngine, AsyncSession, async_sessionmaker,
+                                    create_async_engine)
+
+from ai_worker.worker.core.config import DATABASE_URL, WORKER_DB_POOL_SIZE, WORKER_DB_MAX_OVERFLOW
+from ai_worker.worker.utils.logger import logger
+
+T = TypeVar("T")
+
+
+class AsyncRuntime:
+    """
+    Event loop, работающий в отдельном потоке всё время жизни процесса воркера,
+    и привязанный к нему пул asyncpg-соединений. Задачи Celery отправляют
+    в него корутины через run(), вместо того чтобы создавать loop на каждую задачу.
+    """
+
+    def __init__(self, database_url: str = DATABASE_URL,
+                 pool_size: int = WORKER_DB_POOL_SIZE,
+                 max_overflow: int = WORKER_DB_MAX_OVERFLOW):
+        self.database_url = database_url
+        self.pool_size = pool_size
+        self.max_overflow = max_overflow
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.engine: Optional[AsyncEngine] = None
+        self.session_maker: Optional[async_sessionmaker[AsyncSession]] = None
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def start(self) -> None:
+        """Запускает event loop и открывает пул соединений."""
+        with self._lock:
+            if self._thread is not None:
+                return
+            self.loop = asyncio.new_event_loop()
+            self._thread = threading.Thread(target=self._run_loop, name="worker-event-loop",
+                                            daemon=True)
+            self._thread.start()
+            self.engine = create_async_engine(
+                self.database_url,
+                pool_size=self.pool_size,
+                max_overflow=self.max_overflow,
+                pool_pre_ping=True,
+            )
+            self.session_maker = async_sessionmaker(
+                self.engine, expire_on_commit=False, class_=AsyncSession
+            )
+            self._submit(self._warm_up()).result()
+            logger.info(f"Event loop воркера запущен, пул соединений с БД: {self.pool_size}")
+
+    def run(self, coro: Coroutine[Any, Any, T], timeout: Optional[float] = None) -> T:
+        """Выполняет корутину в event loop воркера и возвращает её результат."""
+        return self.submit(coro).result(timeout)
+
+    def submit(self, coro: Coroutine[Any, Any, T]) -> "Future[T]":
+        """Отправляет корутину в event loop воркера, не дожидаясь результата."""
+        if self.session_maker is None:
+            self.start()
+        return self._submit(coro)
+
+    def stop(self) -> None:
+        """Закрывает пул соединений и останавливает event loop."""
+        with self._lock:
+            if self._thread is None:
+                return
+            try:
+                self._submit(self.engine.dispose()).result()
+            finally:
+                self.loop.call_soon_threadsafe(self.loop.stop)
+                self._thread.join()
+                self.loop.close()
+                self._thread = None
+                self.loop = None
+                self.engine = None
+                self.session_maker = None
+                logger.info("Event loop воркера остановлен, соединения с БД закрыты")
+
+    def _submit(self, coro):
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def _run_loop(self) -> None:
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+
+    async def _warm_up(self) -> None:
+        # Открываем соединения пула заранее, чтобы задачи не платили за подключение
+        try:
+            async with AsyncExitStack() as stack:
+                for _ in range(self.pool_size):
+                    await stack.enter_async_context(self.engine.connect())
+        except Exception as e:
+            logger.error(f"Не удалось подключиться к базе данных: {str(e)}")
+
+
+runtime = AsyncRuntime()
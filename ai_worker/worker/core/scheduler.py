@@ -0,0 +1,37 @@
+"""Выбор следующей задачи чата из полосы приоритета"""
+import json
+from typing import Optional
+
+from ai_worker.worker.core.config import SCHEDULER_QUANTUM, SCHEDULER_WAIT_SAMPLES
+from ai_worker.worker.core.redis_client import get_redis
+from ai_worker.worker.utils.metrics import metrics
+from fastapi_api.app.utils.scheduler import CLAIM_SCRIPT, claim_keys, lane_key
+
+_claim_script = None
+
+
+def claim_task(lane: str, tick_id: str) -> Optional[dict]:
+    """
+    Забирает следующую задачу полосы по DRR и закрепляет её за тиком tick_id.
+    Возвращает None, если полоса пуста.
+    """
+    global _claim_script
+    if _claim_script is None:
+        _claim_script = get_redis().register_script(CLAIM_SCRIPT)
+    task = _claim_script(keys=claim_keys(lane), args=[SCHEDULER_QUANTUM, tick_id, SCHEDULER_WAIT_SAMPLES])
+    if task is None:
+        metrics.inc(f"scheduler.{lane}.empty_ticks")
+        return None
+    metrics.inc(f"scheduler.{lane}.claimed")
+    return json.loads(task)
+
+
+def claimed_task(lane: str, tick_id: str) -> Optional[dict]:
+    """Задача, закреплённая за тиком tick_id полосы lane, или None."""
+    task = get_redis().hget(lane_key(lane, "claimed"), tick_id)
+    return json.loads(task) if task else None
+
+
+def release_task(lane: str, tick_id: str) -> None:
+    """Снимает закрепление задачи за тиком после её обработки."""
+    get_redis().hdel(lane_key(lane, "claimed"), tick_id)
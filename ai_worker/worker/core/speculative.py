@@ -0,0 +1,123 @@
+"""
+Спекулятивная (assisted) генерация с малой черновой моделью.
+
+Черновая модель (например, distilgpt2 для gpt2) предлагает несколько
+токенов, а основная проверяет их одним прямым проходом и принимает
+совпавший префикс. При сэмплировании transformers применяет speculative
+sampling, поэтому распределение ответа остаётся распределением основной
+модели. Пары задаются в SPECULATIVE_DRAFT_MODELS="gpt2=distilgpt2";
+у черновой модели должен быть тот же словарь, что и у основной.
+
+Число принятых токенов transformers не возвращает, поэтому оно
+оценивается по числу прямых проходов моделей в потоке генерации: каждый
+проход основной модели даёт принятые токены и ещё один свой, каждый
+проход черновой — один предложенный токен.
+"""
+import threading
+from dataclasses import dataclass
+from typing import Optional
+
+from torch import nn
+
+from ai_worker.worker.core.config import SPECULATIVE_DRAFT_MODELS, SPECULATIVE_NUM_TOKENS
+from ai_worker.worker.core.quantization import load_model
+from ai_worker.worker.utils.logger import logger
+from ai_worker.worker.utils.metrics import metrics
+
+
+def draft_model_name(model_name: str) -> Optional[str]:
+    """Черновая модель, заданная для model_name, или None."""
+    return SPECULATIVE_DRAFT_MODELS.get(model_name)
+
+
+@dataclass
+class SpeculativeStats:
+    """Итог одной генерации: новые токены, предложенные и принятые черновиком."""
+    new_tokens: int
+    draft_tokens: int
+    accepted_tokens: int
+
+    @property
+    def acceptance_rate(self) -> float:
+        return self.accepted_tokens / self.draft_tokens if self.draft_tokens else 0.0
+
+
+class ForwardCounter:
+    """Считает прямые проходы модели отдельно в каждом потоке генерации."""
+
+    def __init__(self, model: nn.Module):
+        self._local = threading.local()
+        self._handle = model.register_forward_hook(self._hook)
+
+    def _hook(self, module, inputs, output) -> None:
+        self._local.calls = getattr(self._local, "calls", 0) + 1
+
+    def reset(self) -> None:
+        self._local.calls = 0
+
+    @property
+    def calls(self) -> int:
+        return getattr(self._local, "calls", 0)
+
+    def remove(self) -> None:
+        self._handle.remove()
+
+
+class DraftModel:
+    """Черновая модель для основной и счётчики проходов обеих моделей."""
+
+    def __init__(self, name: str, target: nn.Module, backend: str, device: str,
+                 num_tokens: int = SPECULATIVE_NUM_TOKENS):
+        self.name = name
+        self.model = load_model(name, backend).to(device)
+        if self.model.config.vocab_size != target.config.vocab_size:
+            raise ValueError(f"Словарь черновой модели {name} ({self.model.config.vocab_size}) "
+                             f"не совпадает со словарём основной ({target.config.vocab_size})")
+        # Стартовое число предлагаемых токенов; transformers подстраивает его по принятым
+        self.model.generation_config.num_assistant_tokens = num_tokens
+        self._target_calls = ForwardCounter(target)
+        self._draft_calls = ForwardCounter(self.model)
+
+    def start(self) -> None:
+        """Обнуляет счётчики перед генерацией в текущем потоке."""
+        self._target_calls.reset()
+        self._draft_calls.reset()
+
+    def finish(self, new_tokens: int) -> SpeculativeStats:
+        """Оценивает принятие черновика за генерацию в текущем потоке и публикует метрики."""
+        draft_tokens = self._draft_calls.calls
+        # Каждый проход основной модели добавляет принятые токены черновика и один свой
+        accepted = min(draft_tokens, max(0, new_tokens - self._target_calls.calls))
+        metrics.inc("speculative.generations")
+        metrics.inc("speculative.draft_tokens", draft_tokens)
+        metrics.inc("speculative.accepted_tokens", accepted)
+        snapshot = metrics.snapshot()
+        if snapshot["speculative.draft_tokens"]:
+            metrics.set("speculative.acceptance_rate", round(
+                snapshot["speculative.accepted_tokens"] / snapshot["speculative.draft_tokens"], 4))
+        return SpeculativeStats(new_tokens, draft_tokens, accepted)
+
+    def cleanup(self) -> None:
+        self._target_calls.remove()
+        self._draft_calls.remove()
+        del self.model
+
+
+def load_draft_model(model_name: str, target: nn.Module, backend: str,
+                     device: str) -> Optional[DraftModel]:
+    """
+    Загружает черновую модель, заданную для model_name. Если загрузить её
+    не удалось, генерация продолжается без спекуляции.
+    """
+    name = draft_model_name(model_name)
+    if name is None:
+        return None
+    try:
+        draft = DraftModel(name, target, backend, device)
+    except Exception as e:
+        logger.error(f"Черновая модель {name} для {model_name} не загружена, "
+                     f"спекулятивная генерация отключена: {str(e)}")
+        return None
+    logger.info(f"Спекулятивная генерация для {model_name}: черновая модель {name}, "
+                f"{SPECULATIVE_NUM_TOKENS} токенов за шаг")
+    return draft
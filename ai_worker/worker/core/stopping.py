@@ -0,0 +1,144 @@
+"""
+Ограничения генерации из запроса: число новых токенов, стоп-строки, бюджет
+времени и остановка на границе предложения, а также остановка по внешнему
+условию (отмена задачи, лимит времени задачи).
+
+Все ограничения проверяются внутри цикла generate (критерии остановки
+transformers), поэтому воркер не тратит время на токены, которые
+пользователь не увидит.
+"""
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+import torch
+from transformers import StoppingCriteria, StoppingCriteriaList
+
+from ai_worker.worker.core.config import GENERATION_MAX_NEW_TOKENS
+
+# Символы, которыми заканчивается предложение
+SENTENCE_END = (".", "!", "?", "…")
+
+
+@dataclass
+class GenerationOptions:
+    """Ограничения генерации одного ответа (поля ChatRequest.generation)."""
+    max_new_tokens: int = GENERATION_MAX_NEW_TOKENS
+    stop: List[str] = field(default_factory=list)
+    time_budget_ms: Optional[float] = None
+    stop_at_sentence: bool = False
+
+    @classmethod
+    def from_dict(cls, data: Optional[Dict[str, Any]]) -> "GenerationOptions":
+        """Ограничения из задачи; больше GENERATION_MAX_NEW_TOKENS токенов не генерируется."""
+        data = data or {}
+        return cls(
+            max_new_tokens=min(data.get("max_new_tokens") or GENERATION_MAX_NEW_TOKENS,
+                               GENERATION_MAX_NEW_TOKENS),
+            stop=list(data.get("stop") or ()),
+            time_budget_ms=data.get("time_budget_ms"),
+            stop_at_sentence=bool(data.get("stop_at_sentence")),
+        )
+
+
+class SentenceBoundaryCriteria(StoppingCriteria):
+    """Останавливает генерацию, когда новый токен заканчивает предложение."""
+
+    def __init__(self, tokenizer, prompt_length: int):
+        self.tokenizer = tokenizer
+        self.prompt_length = prompt_length
+
+    def __call__(self, input_ids: torch.LongTensor, scores: torch.FloatTensor, **kwargs) -> torch.BoolTensor:
+        done = torch.zeros(input_ids.shape[0], dtype=torch.bool, device=input_ids.device)
+        if input_ids.shape[1] <= self.prompt_length:
+            return done
+        # Декодируется только последний токен: проверка не растёт с длиной ответа
+        for row, token_id in enumerate(input_ids[:, -1].tolist()):
+            done[row] = self.tokenizer.decode([token_id]).rstrip().endswith(SENTENCE_END)
+        return done
+
+
+class StopStringCriteria(StoppingCriteria):
+    """
+    Останавливает генерацию, когда в ответе появляется одна из стоп-строк.
+    Нужна для спекулятивной генерации: transformers передаёт stop_strings
+    черновой модели без токенизатора, и generate падает. Декодируются только
+    токены, добавленные с прошлой проверки, и хвост длиной в самую длинную
+    стоп-строку (за шаг черновая модель может добавить несколько токенов).
+    """
+
+    def __init__(self, tokenizer, prompt_length: int, stop: Sequence[str]):
+        self.tokenizer = tokenizer
+        self.stop = list(stop)
+        self.overlap = max(len(item) for item in self.stop)
+        self.checked = prompt_length
+        self.prompt_length = prompt_length
+
+    def __call__(self, input_ids: torch.LongTensor, scores: torch.FloatTensor, **kwargs) -> torch.BoolTensor:
+        start = max(self.prompt_length, self.checked - self.overlap)
+        self.checked = input_ids.shape[1]
+        done = torch.zeros(input_ids.shape[0], dtype=torch.bool, device=input_ids.device)
+        for row, tokens in enumerate(input_ids[:, start:].tolist()):
+            text = self.tokenizer.decode(tokens)
+            done[row] = any(item in text for item in self.stop)
+        return done
+
+
+class CallbackCriteria(StoppingCriteria):
+    """Останавливает генерацию, как только should_stop() вернёт True."""
+
+    def __init__(self, should_stop: Callable[[], bool]):
+        self.should_stop = should_stop
+
+    def __call__(self, input_ids: torch.LongTensor, scores: torch.FloatTensor, **kwargs) -> torch.BoolTensor:
+        return torch.full((input_ids.shape[0],), self.should_stop(), dtype=torch.bool, device=input_ids.device)
+
+
+class BatchCallbackCriteria(StoppingCriteria):
+    """
+    Останавливает строки батча по отдельности: строка row завершается, как
+    только should_stop[row]() вернёт True (None — строка не останавливается).
+    """
+
+    def __init__(self, should_stop: Sequence[Optional[Callable[[], bool]]]):
+        self.should_stop = list(should_stop)
+
+    def __call__(self, input_ids: torch.LongTensor, scores: torch.FloatTensor, **kwargs) -> torch.BoolTensor:
+        return torch.tensor([check is not None and check() for check in self.should_stop],
+                            dtype=torch.bool, device=input_ids.device)
+
+
+def generation_params(options: GenerationOptions, tokenizer, prompt_length: int,
+                      max_positions: Optional[int] = None,
+                      should_stop: Optional[Callable[[], bool]] = None,
+                      assisted: bool = False) -> Dict[str, Any]:
+    """
+    Аргументы generate для ограничений options. Число новых токенов не
+    выходит за max_positions модели вместе с промптом. should_stop
+    проверяется после каждого шага декодирования. При спекулятивной
+    генерации (assisted) стоп-строки проверяются своим критерием.
+    """
+    max_new_tokens = options.max_new_tokens
+    if max_positions:
+        max_new_tokens = max(1, min(max_new_tokens, max_positions - prompt_length))
+    params: Dict[str, Any] = {"max_new_tokens": max_new_tokens}
+    criteria = StoppingCriteriaList()
+    if options.stop and assisted:
+        criteria.append(StopStringCriteria(tokenizer, prompt_length, options.stop))
+    elif options.stop:
+        params["stop_strings"] = options.stop
+        params["tokenizer"] = tokenizer
+    if options.time_budget_ms:
+        params["max_time"] = options.time_budget_ms / 1000
+    if options.stop_at_sentence:
+        criteria.append(SentenceBoundaryCriteria(tokenizer, prompt_length))
+    if should_stop is not None:
+        criteria.append(CallbackCriteria(should_stop))
+    if criteria:
+        params["stopping_criteria"] = criteria
+    return params
+
+
+def trim_stop(text: str, stop: List[str]) -> str:
+    """Обрезает ответ перед первой стоп-строкой (generate оставляет её в выходе)."""
+    positions = [text.find(item) for item in stop if item in text]
+    return text[:min(positions)] if positions else text
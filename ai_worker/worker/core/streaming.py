@@ -0,0 +1,105 @@
+"""Потоковая передача сгенерированных токенов в Redis Streams"""
+import json
+import time
+from typing import List, Optional, Sequence
+
+from transformers import TextStreamer
+
+from ai_worker.worker.core.config import (STREAM_KEY_PREFIX, STREAM_TTL, STREAM_FLUSH_TOKENS,
+                                          STREAM_FLUSH_MS)
+from ai_worker.worker.core.redis_client import get_redis
+from ai_worker.worker.core.stopping import trim_stop
+from ai_worker.worker.utils.logger import logger
+
+
+def stream_key(task_id: str) -> str:
+    """Ключ Redis Stream с событиями задачи task_id."""
+    return f"{STREAM_KEY_PREFIX}{task_id}"
+
+
+def publish_event(task_id: str, event: str, data: dict) -> None:
+    """Добавляет событие (start, token, done или error) в поток задачи."""
+    key = stream_key(task_id)
+    try:
+        pipe = get_redis().pipeline(transaction=False)
+        pipe.xadd(key, {"event": event, "data": json.dumps(data, ensure_ascii=False)})
+        pipe.expire(key, STREAM_TTL)
+        pipe.execute()
+    except Exception as e:
+        # Поток — вспомогательный канал: его недоступность не должна ронять задачу
+        logger.warning(f"Не удалось записать событие {event} в поток {key}: {str(e)}")
+
+
+def held_back(text: str, stop: Sequence[str]) -> int:
+    """Длина самого длинного хвоста text, с которого начинается одна из стоп-строк."""
+    for length in range(min(len(text), max(map(len, stop)) - 1), 0, -1):
+        tail = text[-length:]
+        if any(item.startswith(tail) for item in stop):
+            return length
+    return 0
+
+
+class RedisTokenStreamer(TextStreamer):
+    """
+    Стример для model.generate: по мере декодирования отправляет готовые
+    фрагменты текста в Redis Stream задачи.
+    Стример вызывается в потоке генерации, поэтому фрагменты копятся и
+    уходят одним XADD раз в flush_tokens фрагментов или flush_ms
+    миллисекунд (и в конце генерации): задержка Redis не умножается на
+    число токенов. TTL потока продлевается один раз, при первой записи.
+    Стоп-строки stop в поток не попадают: хвост текста, который может
+    оказаться началом стоп-строки, придерживается до следующего фрагмента,
+    а текст после стоп-строки отбрасывается, как и в итоговом ответе.
+    """
+
+    def __init__(self, tokenizer, task_id: str, flush_tokens: int = STREAM_FLUSH_TOKENS,
+                 flush_ms: float = STREAM_FLUSH_MS, stop: Optional[Sequence[str]] = None):
+        super().__init__(tokenizer, skip_prompt=True, skip_special_tokens=True)
+        self.task_id = task_id
+        self.key = stream_key(task_id)
+        self.flush_tokens = flush_tokens
+        self.flush_interval = flush_ms / 1000
+        self.stop = [item for item in stop or () if item]
+        self._buffer: List[str] = []
+        self._held = ""
+        self._stopped = False
+        self._flushed_at = time.monotonic()
+        self._expire_set = False
+
+    def _release(self, text: str, stream_end: bool) -> str:
+        """Часть текста, которую можно отдать клиенту, не раскрыв стоп-строку."""
+        if self._stopped:
+            return ""
+        text = self._held + text
+        trimmed = trim_stop(text, self.stop)
+        if len(trimmed) < len(text):
+            self._stopped = True
+            self._held = ""
+            return trimmed
+        held = 0 if stream_end else held_back(text, self.stop)
+        self._held = text[len(text) - held:] if held else ""
+        return text[:len(text) - held]
+
+    def on_finalized_text(self, text: str, stream_end: bool = False):
+        if self.stop:
+            text = self._release(text, stream_end)
+        if text:
+            self._buffer.append(text)
+        if self._buffer and (stream_end or len(self._buffer) >= self.flush_tokens
+                             or time.monotonic() - self._flushed_at >= self.flush_interval):
+            self.flush()
+
+    def flush(self) -> None:
+        """Записывает накопленные фрагменты в поток одним событием token."""
+        text = "".join(self._buffer)
+        self._buffer.clear()
+        self._flushed_at = time.monotonic()
+        try:
+            pipe = get_redis().pipeline(transaction=False)
+            pipe.xadd(self.key, {"event": "token", "data": json.dumps({"text": text}, ensure_ascii=False)})
+            if not self._expire_set:
+                pipe.expire(self.key, STREAM_TTL)
+            pipe.execute()
+            self._expire_set = True
+        except Exception as e:
+            logger.warning(f"Не удалось записать токены в поток {self.key}: {str(e)}")
@@ -0,0 +1,105 @@
+"""
+Заглушка модели для нагрузочного тестирования без весов и без сети.
+
+Отвечает детерминированным текстом, выдерживая STUB_TOKEN_MS на каждый
+«токен», поэтому нагрузочный прогон измеряет очередь, БД и Redis,
+а не скорость конкретной модели. Включается MODEL_BACKEND=stub.
+"""
+import time
+from typing import Callable, List, Optional, Sequence
+
+from ai_worker.worker.core.config import MODEL_NAME, STUB_TOKEN_MS, STUB_NEW_TOKENS
+from ai_worker.worker.core.huggingai_client import Prompt
+from ai_worker.worker.core.stopping import GenerationOptions, trim_stop
+from ai_worker.worker.utils.logger import logger
+from fastapi_api.app.utils.tracing import span
+
+
+class StubTokenizer:
+    """Побайтовый токенизатор с интерфейсом, которым пользуются ContextBuilder и стримеры."""
+
+    model_max_length = 1024
+    eos_token = ""
+    pad_token = ""
+
+    def encode(self, text: str) -> List[int]:
+        return list(text.encode("utf-8"))
+
+    def decode(self, token_ids: Sequence[int], **kwargs) -> str:
+        return bytes(token_ids).decode("utf-8", errors="ignore")
+
+
+class StubClient:
+    """Клиент-заглушка с интерфейсом HuggingFaceClient."""
+
+    def __init__(self, model_name: str = MODEL_NAME,
+                 token_ms: float = STUB_TOKEN_MS, new_tokens: int = STUB_NEW_TOKENS):
+        self.model_name = model_name
+        self.backend = "stub"
+        self.token_delay = token_ms / 1000
+        self.new_tokens = new_tokens
+        self.tokenizer = StubTokenizer()
+        logger.info(f"Заглушка модели {model_name}: {new_tokens} токенов по {token_ms} мс")
+
+    def _words(self, prompt: Prompt, count: Optional[int] = None) -> List[str]:
+        count = count or self.new_tokens
+        text = prompt if isinstance(prompt, str) else self.tokenizer.decode(prompt)
+        words = text.split()[-count:] or ["..."]
+        return [words[index % len(words)] for index in range(count)]
+
+    def generate_text(self, input_data: str, streamer=None,
+                      input_ids: Optional[List[int]] = None,
+                      prefix_lengths: Sequence[int] = (),
+                      options: Optional[GenerationOptions] = None,
+                      should_stop: Optional[Callable[[], bool]] = None) -> str:
+        """
+        Возвращает слова промпта по одному на токен, отдавая их стримеру.
+        Из ограничений options учитываются число токенов, бюджет времени и
+        стоп-строки; should_stop проверяется после каждого токена.
+        """
+        count = min(self.new_tokens, options.max_new_tokens) if options else self.new_tokens
+        deadline = time.monotonic() + options.time_budget_ms / 1000 if options and options.time_budget_ms else None
+        words = []
+        with span("generate", backend=self.backend) as attrs:
+            for index, word in enumerate(self._words(input_data if input_ids is None else input_ids, count)):
+                time.sleep(self.token_delay)
+                words.append(word)
+                if streamer is not None:
+                    streamer.on_finalized_text(word if index == 0 else f" {word}")
+                if deadline is not None and time.monotonic() >= deadline:
+                    break
+                if options and options.stop and trim_stop(" ".join(words), options.stop) != " ".join(words):
+                    break
+                if should_stop is not None and should_stop():
+                    break
+            if streamer is not None:
+                streamer.end()
+            attrs["new_tokens"] = len(words)
+        return trim_stop(" ".join(words), options.stop) if options else " ".join(words)
+
+    def generate_batch(self, prompts: List[Prompt],
+                       should_stop: Sequence[Optional[Callable[[], bool]]] = (),
+                       streamers: Sequence = ()) -> List[str]:
+        """
+        Батч занимает столько же времени, сколько один промпт; строка,
+        для которой should_stop вернул True, дальше не растёт.
+        """
+        answers = [self._words(prompt) for prompt in prompts]
+        words: List[List[str]] = [[] for _ in prompts]
+        active = list(range(len(prompts)))
+        for index in range(self.new_tokens):
+            if not active:
+                break
+            time.sleep(self.token_delay)
+            for row in list(active):
+                words[row].append(answers[row][index])
+                if row < len(should_stop) and should_stop[row] is not None and should_stop[row]():
+                    active.remove(row)
+        results = [" ".join(row) for row in words]
+        for streamer, result in zip(streamers, results):
+            if streamer is not None:
+                streamer.on_finalized_text(result, stream_end=True)
+        return results
+
+    def cleanup(self):
+        """У заглушки нет ресурсов для освобождения."""
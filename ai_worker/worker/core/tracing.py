@@ -0,0 +1,46 @@
+"""Продолжение трассы задачи чата в воркере и выгрузка его спанов"""
+import time
+from contextlib import contextmanager
+from typing import Iterator, Optional
+
+from ai_worker.worker.core.config import TRACE_EXPORTER, TRACE_FILE, TRACE_TTL, TRACE_MAX_SPANS
+from ai_worker.worker.core.redis_client import get_redis
+from ai_worker.worker.utils.logger import logger
+from fastapi_api.app.utils.tracing import Trace, record_span, start_trace, trace_key, write_spans_file
+
+
+def export_trace(trace: Trace) -> None:
+    """Выгружает спаны воркера одним пакетом."""
+    if not trace.spans:
+        return
+    try:
+        if TRACE_EXPORTER == "file":
+            write_spans_file(TRACE_FILE, trace)
+            return
+        key = trace_key(trace.trace_id)
+        pipe = get_redis().pipeline(transaction=False)
+        pipe.rpush(key, *trace.encoded_spans())
+        pipe.ltrim(key, -TRACE_MAX_SPANS, -1)
+        pipe.expire(key, TRACE_TTL)
+        pipe.execute()
+    except Exception as e:
+        logger.warning(f"Не удалось выгрузить трассу {trace.trace_id}: {str(e)}")
+
+
+@contextmanager
+def task_trace(context: Optional[dict]) -> Iterator[Optional[Trace]]:
+    """
+    Продолжает трассу, открытую API, на время обработки задачи: записывает
+    ожидание в очереди (от enqueued_at до начала обработки) и по завершении
+    выгружает спаны. Без контекста (задача не трассируется) ничего не делает.
+    """
+    if not context:
+        yield None
+        return
+    with start_trace("worker", context) as trace:
+        if context.get("enqueued_at"):
+            record_span("queue_wait", context["enqueued_at"], time.time())
+        try:
+            yield trace
+        finally:
+            export_trace(trace)
@@ -0,0 +1,93 @@
+"""Загрузка весов safetensors через отображение файлов в память"""
+import json
+import os
+import struct
+from typing import Dict, List, Optional
+
+import torch
+from transformers import AutoConfig, AutoModelForCausalLM
+from transformers.modeling_utils import no_init_weights
+from transformers.utils import SAFE_WEIGHTS_INDEX_NAME, SAFE_WEIGHTS_NAME, cached_file
+
+from ai_worker.worker.utils.logger import logger
+
+DTYPES = {
+    "F64": torch.float64, "F32": torch.float32, "F16": torch.float16, "BF16": torch.bfloat16,
+    "I64": torch.int64, "I32": torch.int32, "I16": torch.int16, "I8": torch.int8,
+    "U8": torch.uint8, "BOOL": torch.bool,
+}
+
+
+def safetensors_files(model_name: str) -> List[str]:
+    """Локальные пути к файлам safetensors модели (скачиваются в кэш HF при необходимости)."""
+    index = cached_file(model_name, SAFE_WEIGHTS_INDEX_NAME,
+                        _raise_exceptions_for_missing_entries=False)
+    if index is not None:
+        with open(index, "r") as file:
+            shards = sorted(set(json.load(file)["weight_map"].values()))
+        return [cached_file(model_name, shard) for shard in shards]
+    path = cached_file(model_name, SAFE_WEIGHTS_NAME, _raise_exceptions_for_missing_entries=False)
+    if path is None:
+        raise RuntimeError(f"У модели {model_name} нет весов в формате safetensors")
+    return [path]
+
+
+def mmap_safetensors(path: str) -> Dict[str, torch.Tensor]:
+    """
+    Отображает файл safetensors в память (MAP_PRIVATE) и возвращает тензоры,
+    ссылающиеся на эти страницы. Пока веса не изменяются, страницы общие
+    с page cache и со всеми процессами, отобразившими тот же файл.
+    """
+    with open(path, "rb") as file:
+        header_size = struct.unpack("<Q", file.read(8))[0]
+        header = json.loads(file.read(header_size))
+    header.pop("__metadata__", None)
+    storage = torch.UntypedStorage.from_file(path, shared=False, nbytes=os.path.getsize(path))
+    data_start = 8 + header_size
+    tensors = {}
+    for name, info in header.items():
+        dtype = DTYPES[info["dtype"]]
+        begin, end = (data_start + offset for offset in info["data_offsets"])
+        itemsize = torch.empty(0, dtype=dtype).element_size()
+        if begin % itemsize:
+            # Невыровненный тензор нельзя отобразить без копирования
+            raw = torch.empty(0, dtype=torch.uint8).set_(storage, begin, (end - begin,))
+            tensors[name] = raw.clone().view(dtype).reshape(info["shape"])
+            continue
+        tensors[name] = torch.empty(0, dtype=dtype).set_(storage, begin // itemsize, info["shape"])
+    return tensors
+
+
+def load_mmap_model(model_name: str, dtype: Optional[torch.dtype] = None) -> torch.nn.Module:
+    """
+    Создаёт модель по конфигурации и подставляет в неё отображённые веса без
+    копирования. Тензоры другого dtype преобразуются и становятся приватными.
+    """
+    config = AutoConfig.from_pretrained(model_name)
+    with no_init_weights():
+        model = AutoModelForCausalLM.from_config(config)
+    state: Dict[str, torch.Tensor] = {}
+    for path in safetensors_files(model_name):
+        state.update(mmap_safetensors(path))
+    if dtype is not None:
+        converted = [name for name, tensor in state.items()
+                     if tensor.is_floating_point() and tensor.dtype != dtype]
+        for name in converted:
+            state[name] = state[name].to(dtype)
+        if converted:
+            logger.warning(f"{len(converted)} тензоров модели {model_name} преобразованы в {dtype} "
+                           f"и не делятся между процессами")
+    # Чекпоинты базовой модели хранят ключи без префикса (например, transformer.)
+    prefix = model.base_model_prefix
+    target = model
+    if prefix and hasattr(model, prefix) and not any(name.startswith(f"{prefix}.") for name in state):
+        target = getattr(model, prefix)
+    missing, _ = target.load_state_dict(state, strict=False, assign=True)
+    model.tie_weights()
+    if dtype is not None:
+        model.to(dtype)
+    missing = [name for name in missing if name not in (model._tied_weights_keys or [])]
+    if missing:
+        logger.warning(f"В весах модели {model_name} нет параметров: {', '.join(missing)}")
+    logger.info(f"Веса модели {model_name} отображены в память")
+    return model.eval()
@@ -1,21 +1,44 @@
 """Задачи Celery для обработки AI-задач"""
 import asyncio
-import logging
+from typing import Optional
+from billiard.process import current_process
 from celery import Celery
+from celery.signals import (worker_process_init, worker_process_shutdown,
+                            worker_ready, worker_shutdown)
 from celery.utils.log import get_task_logger
+from celery.worker.request import Request
+from kombu import Queue
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.future import select
-from uuid import uuid4
+from sqlalchemy.pool import NullPool
 
-from ai_worker.worker.core.config import REDIS_URL
-from ai_worker.worker.core.huggingai_client import HuggingFaceClient
-from ai_worker.worker.utils.logger import logger, log_id_filter
-from fastapi_api.app.db.database import async_session_maker
-from fastapi_api.app.db.models import Task, TaskStatus, Message, SenderType
+from ai_worker.worker.core.batching import generate_text
+from ai_worker.worker.core.cancellation import TaskCancelled, TaskControl
+from ai_worker.worker.core.config import (REDIS_URL, WORKER_POOL, WORKER_CONCURRENCY, CONTEXT_MAX_TURNS,
+                                          TASK_SOFT_TIME_LIMIT, TASK_TIME_LIMIT, DATABASE_URL)
+from ai_worker.worker.core.context import load_history
+from ai_worker.worker.core.cpu_budget import configure_process
+from ai_worker.worker.core.events import publish_task_completed
+from ai_worker.worker.core.finalizer import task_finalizer
+from ai_worker.worker.core.metrics_reporter import metrics_reporter
+from ai_worker.worker.core.model_registry import model_registry
+from ai_worker.worker.core.redis_client import close_redis
+from ai_worker.worker.core.response_cache import store_response
+from ai_worker.worker.core.runtime import runtime
+from ai_worker.worker.core.scheduler import claim_task, claimed_task, release_task
+from ai_worker.worker.core.stopping import GenerationOptions
+from ai_worker.worker.core.streaming import publish_event
+from ai_worker.worker.core.tracing import task_trace
+from ai_worker.worker.utils.logger import logger
+from ai_worker.worker.utils.metrics import metrics
+from fastapi_api.app.db.models import Task, TaskStatus
+from fastapi_api.app.utils.correlation import bind_log_id
+from fastapi_api.app.utils.scheduler import LANES, lane_queue
+from fastapi_api.app.utils.tracing import span
 
 
+# Тот же логгер ai_assistant, что и logger: уровень и обработчики задаёт setup_logger
 celery_logger = get_task_logger("ai_assistant")
-celery_logger.handlers = logger.handlers
-celery_logger.setLevel(logging.DEBUG)
 celery_app = Celery(
     "ai_worker",
     broker=REDIS_URL,
@@ -29,66 +52,200 @@ celery_app.conf.update(
     enable_utc=True,
     task_ignore_result=False,
     task_store_errors_even_if_ignored=True,
-    worker_pool="solo",
+    worker_pool=WORKER_POOL,
+    worker_concurrency=WORKER_CONCURRENCY,
     task_track_started=True,
+    # Задача подтверждается после записи результата в БД (at-least-once)
+    task_acks_late=True,
+    task_reject_on_worker_lost=True,
+    # Очереди полос опрашиваются строго по приоритету, затем общая очередь.
+    # Тик берётся только когда процесс свободен, иначе приоритет теряется.
+    task_queues=[Queue(lane_queue(lane)) for lane in LANES] + [Queue("celery")],
+    broker_transport_options={"queue_order_strategy": "priority"},
+    worker_prefetch_multiplier=1,
+    # Лимиты Celery действуют только в пуле prefork; мягкий лимит дублирует TaskControl.
+    # После жёсткого лимита дочерний процесс убит, задачу помечает FAILED TimeLimitRequest.
+    task_soft_time_limit=TASK_SOFT_TIME_LIMIT or None,
+    task_time_limit=TASK_TIME_LIMIT or None,
 )
 
 
-async def _process_ai_task(task_id: str, input_data: str):
-    logger.debug(f"Начало обработки задачи {task_id} с входными данными: {input_data}")
-    client = None
-    async with async_session_maker() as db:
+@worker_process_init.connect
+def preload_models_in_child(**kwargs):
+    """
+    Делит ядра между дочерними процессами prefork-пула, затем загружает модели
+    и открывает пул БД (после fork, чтобы не наследовать потоки и соединения).
+    """
+    configure_process(getattr(current_process(), "index", 0), WORKER_CONCURRENCY)
+    runtime.start()
+    model_registry.preload()
+    metrics_reporter.start()
+
+
+@worker_ready.connect
+def preload_models(**kwargs):
+    """Загружает модели и открывает пул БД в главном процессе, если задачи выполняются в нём же."""
+    if celery_app.conf.worker_pool in ("solo", "threads"):
+        configure_process()
+        runtime.start()
+        model_registry.preload()
+        metrics_reporter.start()
+
+
+@worker_process_shutdown.connect
+@worker_shutdown.connect
+def unload_models(**kwargs):
+    """Освобождает модели и соединения при остановке процесса воркера."""
+    metrics_reporter.stop()
+    model_registry.close()
+    if runtime.session_maker is not None:
+        runtime.run(task_finalizer.flush())
+    runtime.stop()
+    close_redis()
+
+
+async def _fail_task(task_id: str, error: str, session_maker=None) -> bool:
+    """
+    Помечает задачу как FAILED. Возвращает False, если задача не найдена,
+    уже завершена (например, при повторной доставке) или отменена.
+    """
+    async with (session_maker or runtime.session_maker)() as db:
+        task_result = await db.execute(select(Task).filter_by(task_id=task_id))
+        task = task_result.scalars().first()
+        if not task or task.status in (TaskStatus.COMPLETED, TaskStatus.CANCELLED):
+            return False
+        task.status = TaskStatus.FAILED
+        task.result = error
+        await db.commit()
+        return True
+
+
+async def _fail_task_once(task_id: str, error: str) -> bool:
+    """_fail_task на отдельном соединении: в главном процессе prefork нет runtime."""
+    engine = create_async_engine(DATABASE_URL, poolclass=NullPool)
+    try:
+        return await _fail_task(task_id, error, async_sessionmaker(engine))
+    finally:
+        await engine.dispose()
+
+
+class TimeLimitRequest(Request):
+    """
+    Запрос Celery, помечающий задачу FAILED после жёсткого лимита времени.
+    on_timeout вызывается в главном процессе prefork, когда дочерний уже убит,
+    поэтому ни except в задаче, ни Task.on_failure в этом случае не выполняются.
+    """
+
+    def on_timeout(self, soft, timeout):
+        super().on_timeout(soft, timeout)
+        if not soft:
+            _fail_after_time_limit(self, timeout)
+
+
+def _fail_after_time_limit(request: Request, timeout: float) -> None:
+    error = f"Превышено время обработки задачи ({timeout:g} с)"
+    try:
+        if request.name == process_next_task.name:
+            # Тик справедливого планировщика: задачу знает только закрепление за тиком
+            lane = request.args[0]
+            claimed = claimed_task(lane, request.id)
+            release_task(lane, request.id)
+            task_id = claimed["task_id"] if claimed else None
+        else:
+            task_id = request.args[0]
+        if task_id is None:
+            return
+        logger.error("Задача %s прервана жёстким лимитом времени (%g с)", task_id, timeout)
+        if asyncio.run(_fail_task_once(task_id, error)):
+            publish_task_completed(task_id, TaskStatus.FAILED.value, error)
+        publish_event(task_id, "error", {"error": error})
+    except Exception as e:
+        logger.error("Не удалось пометить задачу %s как FAILED после жёсткого лимита: %s",
+                     request.id, e)
+
+
+def _process_ai_task(task_id: str, input_data: str, cache: Optional[dict] = None,
+                     generation: Optional[dict] = None):
+    logger.debug("Начало обработки задачи %s с входными данными: %s", task_id, input_data)
+    control = TaskControl(task_id)
+    # Отменённая в очереди задача снимается без генерации; статус уже записал API
+    if control.cancelled(force=True):
+        logger.info("Задача %s отменена до начала обработки", task_id)
+        metrics.inc("tasks.cancelled_before_start")
+        return None
+    # Время события в потоке отделяет ожидание в очереди от обработки
+    publish_event(task_id, "start", {})
+    try:
+        with span("context.load_history"):
+            history = runtime.run(load_history(task_id)) if CONTEXT_MAX_TURNS > 0 else None
+        control.check()
+        # Генерация выполняется в потоке задачи, чтобы не блокировать общий event loop
+        logger.debug("Вызов generate_text")
+        options = GenerationOptions.from_dict(generation) if generation else None
+        result = generate_text(input_data, task_id=task_id, history=history, options=options,
+                               control=control)
+        logger.debug("Получен результат: %s", result)
+        # Генерация, остановленная отменой или лимитом времени, не сохраняется
+        control.check()
+
+        with span("db.finalize"):
+            runtime.run(task_finalizer.complete(task_id, result))
+        with span("publish"):
+            publish_event(task_id, "done", {"result": result})
+            publish_task_completed(task_id, TaskStatus.COMPLETED.value, result)
+        # Ответ, зависящий от истории конкретного пользователя, нельзя отдавать другим
+        if history is None or not history.turns:
+            store_response(cache, input_data, result)
+        logger.info("Задача %s успешно обработана", task_id)
+        return result
+    except TaskCancelled:
+        # Статус CANCELLED и событие в поток записал API
+        logger.info("Обработка задачи %s прервана отменой", task_id)
+        metrics.inc("tasks.cancelled")
+        return None
+    except Exception as e:
+        logger.error("Ошибка обработки задачи %s: %s", task_id, e)
         try:
-            logger.debug("Инициализация HuggingFaceClient")
-            client = HuggingFaceClient()
-            logger.debug("Вызов generate_text")
-            result = client.generate_text(input_data)
-            logger.debug(f"Получен результат: {result}")
-
-            logger.debug(f"Запрос задачи {task_id} из базы данных")
-            task_result = await db.execute(select(Task).filter_by(task_id=task_id))
-            task = task_result.scalars().first()
-            if not task:
-                logger.error(f"Задача {task_id} не найдена")
-                raise ValueError(f"Задача {task_id} не найдена")
-
-            task.status = TaskStatus.COMPLETED
-            task.result = result
-            message = Message(
-                user_id=task.user_id,
-                task_id=task.id,
-                sender=SenderType.ASSISTANT,
-                content=result
-            )
-            db.add(message)
-            await db.commit()
-            logger.info(f"Задача {task_id} успешно обработана")
+            if runtime.run(_fail_task(task_id, str(e))):
+                publish_task_completed(task_id, TaskStatus.FAILED.value, str(e))
+        except Exception as fail_error:
+            # Исходная ошибка важнее: она уходит клиенту в поток и в Celery
+            logger.error("Не удалось пометить задачу %s как FAILED: %s", task_id, fail_error)
+        publish_event(task_id, "error", {"error": str(e)})
+        raise
+
+
+@celery_app.task(bind=True, max_retries=3, default_retry_delay=60, Request=TimeLimitRequest)
+def process_ai_task(self, task_id: str, input_data: str, cache: Optional[dict] = None,
+                    generation: Optional[dict] = None):
+    # Логи задачи пишутся с log_id запроса API, создавшего задачу
+    with bind_log_id(self.request.get("log_id")):
+        try:
+            logger.debug("Запуск process_ai_task для task_id=%s", task_id)
+            with task_trace(self.request.get("trace")), span("worker.task", task_id=task_id):
+                result = _process_ai_task(task_id, input_data, cache, generation)
+            logger.info("Успешно выполнен process_ai_task для task_id=%s", task_id)
             return result
         except Exception as e:
-            logger.error(f"Ошибка обработки задачи {task_id}: {str(e)}")
-            task_result = await db.execute(select(Task).filter_by(task_id=task_id))
-            task = task_result.scalars().first()
-            if task:
-                task.status = TaskStatus.FAILED
-                task.result = str(e)
-                await db.commit()
+            logger.error("Ошибка в process_ai_task для task_id=%s: %s", task_id, e)
             raise
-        finally:
-            if client:
-                client.cleanup()
 
 
-@celery_app.task(bind=True, max_retries=3, default_retry_delay=60)
-def process_ai_task(self, task_id: str, input_data: str):
-    log_id = str(uuid4())
-    log_id_filter.log_id = log_id
+@celery_app.task(bind=True, Request=TimeLimitRequest)
+def process_next_task(self, lane: str):
+    """
+    Тик полосы lane: забирает из неё следующую задачу по DRR между
+    пользователями и обрабатывает её. Задача закреплена за тиком до конца
+    обработки, поэтому при повторной доставке тика выполняется она же.
+    """
+    task = claim_task(lane, self.request.id)
+    if task is None:
+        return None
     try:
-        logger.debug(f"Запуск process_ai_task для task_id={task_id}")
-        result = asyncio.run(_process_ai_task(task_id, input_data))
-        logger.info(f"Успешно выполнен process_ai_task для task_id={task_id}")
-        return result
-    except Exception as e:
-        logger.error(f"Ошибка в process_ai_task для task_id={task_id}: {str(e)}")
-        raise
+        with bind_log_id(task.get("log_id")):
+            logger.debug("Задача %s получена из полосы %s", task["task_id"], lane)
+            with task_trace(task.get("trace")), span("worker.task", task_id=task["task_id"], lane=lane):
+                return _process_ai_task(task["task_id"], task["message"], task.get("cache"),
+                                        task.get("generation"))
     finally:
-        log_id_filter.log_id = None
\ No newline at end of file
+        release_task(lane, self.request.id)
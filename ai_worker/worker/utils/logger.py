@@ -1,22 +1,14 @@
 import logging
 import logging.handlers
 import os
-from typing import Optional
 
-class LogIdFilter(logging.Filter):
-    def __init__(self):
-        super().__init__()
-        self.log_id: Optional[str] = None
+from ai_worker.worker.core.config import LOG_LEVEL, LOG_LEVELS, LOG_FORMAT, LOG_DEBUG_SAMPLE
+from fastapi_api.app.utils.correlation import LogIdFilter
+from fastapi_api.app.utils.log_pipeline import configure
 
-    def filter(self, record):
-        record.log_id = self.log_id or "no-id"
-        return True
 
 def setup_logger():
     logger = logging.getLogger("ai_assistant")
-    if logger.hasHandlers():
-        logger.handlers.clear()  # Очищаем существующие обработчики, чтобы избежать дублирования
-    logger.setLevel(logging.DEBUG)  # Устанавливаем DEBUG для большей детализации
 
     # Создаём директорию logs с проверкой ошибок
     try:
@@ -33,31 +25,26 @@ def setup_logger():
             backupCount=10,
             encoding="utf-8"
         )
-        formatter = logging.Formatter("[%(log_id)s:%(asctime)s - %(levelname)s - %(message)s]")
-        file_handler.setFormatter(formatter)
     except Exception as e:
         print(f"Ошибка настройки файлового обработчика: {str(e)}")
         raise
 
     # Добавляем консольный обработчик для отладки
     console_handler = logging.StreamHandler()
-    console_handler.setFormatter(formatter)
-    console_handler.setLevel(logging.DEBUG)
 
-    # Настраиваем фильтр
-    log_id_filter = LogIdFilter()
-    logger.addFilter(log_id_filter)
+    # Оба обработчика пишут из фонового потока: генерация не ждёт диска и консоли
+    configure(logger, [file_handler, console_handler], level=LOG_LEVEL, levels=LOG_LEVELS,
+              log_format=LOG_FORMAT, debug_sample=LOG_DEBUG_SAMPLE)
 
-    # Добавляем обработчики
-    logger.addHandler(file_handler)
-    logger.addHandler(console_handler)
+    # Настраиваем фильтр log_id из contextvar (выполняется в вызывающем потоке, до очереди)
+    logger.addFilter(LogIdFilter())
 
     # Тестовый лог
     logger.debug("Логгер инициализирован")
-    return logger, log_id_filter
+    return logger
 
 try:
-    logger, log_id_filter = setup_logger()
+    logger = setup_logger()
 except Exception as e:
     print(f"Ошибка инициализации логгера: {str(e)}")
     raise
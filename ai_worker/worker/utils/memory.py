@@ -0,0 +1,56 @@
+"""Утилиты для оценки потребления памяти процессом воркера"""
+import os
+import sys
+from typing import Dict
+
+
+def get_rss_bytes() -> int:
+    """
+    Возвращает текущий резидентный объём памяти процесса (RSS) в байтах.
+    На Windows (нет ни procfs, ни модуля resource) возвращает 0.
+    """
+    try:
+        with open("/proc/self/statm", "r") as statm:
+            resident_pages = int(statm.read().split()[1])
+        return resident_pages * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        # Нет procfs: используем пиковое значение из getrusage
+        try:
+            import resource
+        except ImportError:
+            return 0
+        max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return max_rss if sys.platform == "darwin" else max_rss * 1024
+
+
+def format_bytes(size: int) -> str:
+    """Форматирует размер в байтах в человекочитаемый вид."""
+    return f"{size / (1024 * 1024):.1f} MB"
+
+
+def get_memory_info() -> Dict[str, int]:
+    """
+    Возвращает RSS, PSS (пропорциональная доля общих страниц), USS (только
+    приватные страницы процесса) и объём общих страниц в байтах.
+    Без /proc/self/smaps_rollup доступен только RSS.
+    """
+    try:
+        with open("/proc/self/smaps_rollup", "r") as smaps:
+            fields = {}
+            for line in smaps:
+                parts = line.split()
+                if len(parts) == 3 and parts[2] == "kB":
+                    fields[parts[0].rstrip(":")] = int(parts[1]) * 1024
+    except (OSError, ValueError):
+        return {"rss": get_rss_bytes()}
+    return {
+        "rss": fields.get("Rss", 0),
+        "pss": fields.get("Pss", 0),
+        "uss": fields.get("Private_Clean", 0) + fields.get("Private_Dirty", 0),
+        "shared": fields.get("Shared_Clean", 0) + fields.get("Shared_Dirty", 0),
+    }
+
+
+def format_memory(info: Dict[str, int]) -> str:
+    """Форматирует показатели get_memory_info для лога."""
+    return ", ".join(f"{name.upper()}: {format_bytes(size)}" for name, size in info.items())
@@ -0,0 +1,36 @@
+"""Простые метрики процесса воркера"""
+import threading
+from typing import Dict, Union
+
+Number = Union[int, float]
+
+
+class Metrics:
+    """Потокобезопасное хранилище счётчиков и показателей воркера."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._values: Dict[str, Number] = {}
+
+    def inc(self, name: str, value: Number = 1) -> None:
+        """Увеличивает счётчик name на value."""
+        with self._lock:
+            self._values[name] = self._values.get(name, 0) + value
+
+    def set(self, name: str, value: Number) -> None:
+        """Устанавливает текущее значение показателя name."""
+        with self._lock:
+            self._values[name] = value
+
+    def remove(self, name: str) -> None:
+        """Удаляет показатель name."""
+        with self._lock:
+            self._values.pop(name, None)
+
+    def snapshot(self) -> Dict[str, Number]:
+        """Возвращает копию всех показателей."""
+        with self._lock:
+            return dict(self._values)
+
+
+metrics = Metrics()
@@ -1,16 +1,19 @@
 """API для обработки чатов и задач"""
-from typing import List
+from typing import Optional
 
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, HTTPException, Query, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from fastapi_api.app.db.database import get_async_db
+from fastapi_api.app.core.config import STATUS_MAX_WAIT, MESSAGES_PAGE_SIZE, MESSAGES_MAX_PAGE_SIZE
+from fastapi_api.app.db.database import get_async_db, async_session_maker
 from fastapi_api.app.services.chat import create_chat_service
-from fastapi_api.app.services.tasks import get_task_status_service
-from fastapi_api.app.services.messages import get_user_messages_service
+from fastapi_api.app.services.tasks import get_task_status_service, cancel_task_service
+from fastapi_api.app.services.messages import get_user_messages_service, stream_user_messages
+from fastapi_api.app.services.streaming import stream_task_events, format_sse
 from fastapi_api.app.schemas.chat import ChatRequest, ChatResponse
 from fastapi_api.app.schemas.tasks import TaskStatusResponse
-from fastapi_api.app.schemas.messages import MessageResponse
+from fastapi_api.app.schemas.messages import MessagePage
 
 
 chat_router = APIRouter(prefix="/api", tags=["chat"])
@@ -25,16 +28,67 @@ async def create_chat(request: ChatRequest,
     return await create_chat_service(request, db)
 
 
+@chat_router.delete("/chat/{task_id}", response_model=TaskStatusResponse)
+async def cancel_chat(task_id: str,
+                      db: AsyncSession = Depends(get_async_db)):
+    """Отменяет задачу, ещё ожидающую в очереди или генерируемую воркером."""
+    return await cancel_task_service(task_id, db)
+
+
+@chat_router.get("/chat/{task_id}/stream")
+async def stream_chat(task_id: str,
+                      db: AsyncSession = Depends(get_async_db)):
+    """Транслирует токены ответа модели в формате Server-Sent Events."""
+    events = await stream_task_events(task_id, db)
+    return StreamingResponse(
+        (format_sse(event) async for event in events),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@chat_router.websocket("/chat/{task_id}/ws")
+async def stream_chat_ws(websocket: WebSocket, task_id: str):
+    """Транслирует токены ответа модели через WebSocket."""
+    await websocket.accept()
+    try:
+        async with async_session_maker() as db:
+            events = await stream_task_events(task_id, db)
+        async for event in events:
+            await websocket.send_json(event)
+        await websocket.close()
+    except WebSocketDisconnect:
+        pass
+    except HTTPException as e:
+        await websocket.close(code=4404, reason=e.detail)
+
+
 @tasks_router.get("/status/{task_id}", response_model=TaskStatusResponse)
 async def get_task_status(task_id: str,
+                          wait: float = Query(0, ge=0, le=STATUS_MAX_WAIT),
                           db: AsyncSession = Depends(get_async_db)):
-    """Получает статус задачи по её task_id."""
-    return await get_task_status_service(task_id, db)
+    """
+    Получает статус задачи по её task_id.
+    С параметром wait ждёт завершения задачи до wait секунд.
+    """
+    return await get_task_status_service(task_id, db, wait)
 
 
-@messages_router.get("/messages/{user_id}",
-                     response_model=List[MessageResponse])
+@messages_router.get("/messages/{user_id}", response_model=MessagePage)
 async def get_user_messages(user_id: int,
+                            before: Optional[str] = None,
+                            limit: int = Query(MESSAGES_PAGE_SIZE, ge=1, le=MESSAGES_MAX_PAGE_SIZE),
                             db: AsyncSession = Depends(get_async_db)):
-    """Получает историю сообщений пользователя."""
-    return await get_user_messages_service(user_id, db)
+    """
+    Получает страницу истории сообщений пользователя.
+    Для перехода к более старым сообщениям передайте next_before в параметре before.
+    """
+    return await get_user_messages_service(user_id, db, before, limit)
+
+
+@messages_router.get("/messages/{user_id}/export")
+async def export_user_messages(user_id: int,
+                               db: AsyncSession = Depends(get_async_db)):
+    """Выгружает всю историю сообщений пользователя потоковым JSON-массивом."""
+    return StreamingResponse(stream_user_messages(user_id, db),
+                             media_type="application/json")
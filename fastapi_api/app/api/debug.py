@@ -0,0 +1,18 @@
+"""API для отладки обработки задач"""
+from fastapi import APIRouter
+
+from fastapi_api.app.schemas.traces import TraceResponse
+from fastapi_api.app.services.traces import get_task_trace_service
+
+
+debug_router = APIRouter(prefix="/api/debug", tags=["debug"])
+
+
+@debug_router.get("/traces/{task_id}", response_model=TraceResponse)
+async def get_task_trace(task_id: str):
+    """
+    Показывает, на что ушло время задачи: этапы в API (вставка в БД,
+    постановка в очередь) и в воркере (ожидание в очереди, загрузка модели,
+    токенизация, генерация, декодирование, запись результата).
+    """
+    return await get_task_trace_service(task_id)
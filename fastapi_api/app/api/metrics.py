@@ -0,0 +1,46 @@
+"""API для просмотра метрик сервиса"""
+from typing import Any, Dict, List
+
+from fastapi import APIRouter
+
+from fastapi_api.app.services.admission import get_admission_stats
+from fastapi_api.app.services.response_cache import get_cache_stats
+from fastapi_api.app.services.scheduler import get_queue_stats
+from fastapi_api.app.services.user_cache import get_user_cache_stats
+from fastapi_api.app.services.worker_metrics import get_worker_metrics
+
+
+metrics_router = APIRouter(prefix="/api/metrics", tags=["metrics"])
+
+
+@metrics_router.get("/cache")
+async def get_response_cache_metrics() -> Dict[str, float]:
+    """Получает счётчики попаданий и промахов кэша ответов."""
+    return await get_cache_stats()
+
+
+@metrics_router.get("/workers")
+async def get_workers_metrics() -> List[Dict[str, Any]]:
+    """
+    Получает метрики процессов воркера: память (RSS, PSS, USS), кэши,
+    батчинг и т.д. Каждый процесс публикует их раз в METRICS_REPORT_INTERVAL.
+    """
+    return await get_worker_metrics()
+
+
+@metrics_router.get("/queues")
+async def get_queues_metrics() -> Dict[str, Dict[str, Any]]:
+    """Получает глубину очередей и время ожидания задач по полосам приоритета."""
+    return await get_queue_stats()
+
+
+@metrics_router.get("/admission")
+async def get_admission_metrics() -> Dict[str, float]:
+    """Получает число принятых и отклонённых задач и текущую оценку ожидания."""
+    return await get_admission_stats()
+
+
+@metrics_router.get("/users")
+async def get_user_cache_metrics() -> Dict[str, float]:
+    """Получает попадания кэша пользователей по уровням (для обработавшей запрос реплики)."""
+    return await get_user_cache_stats()
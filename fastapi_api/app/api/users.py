@@ -1,14 +1,16 @@
 """API для работы с пользователями"""
-from typing import List
+from typing import Optional
 
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Query
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from fastapi_api.app.core.config import USERS_PAGE_SIZE, USERS_MAX_PAGE_SIZE
 from fastapi_api.app.db.database import get_async_db
 from fastapi_api.app.services.users import (create_user_service, get_user_by_id_service,
                                 get_user_by_telegram_id_service, update_user_service,
-                                delete_user_service, get_all_users_service)
-from fastapi_api.app.schemas.users import UserCreate, UserResponse
+                                delete_user_service, get_all_users_service, stream_users)
+from fastapi_api.app.schemas.users import UserCreate, UserPage, UserResponse
 
 
 users_router = APIRouter(prefix="/api/users", tags=["users"])
@@ -21,6 +23,12 @@ async def create_user(user_data: UserCreate,
     return await create_user_service(user_data, db)
 
 
+@users_router.get("/export")
+async def export_users(db: AsyncSession = Depends(get_async_db)):
+    """Выгружает всех пользователей потоком NDJSON."""
+    return StreamingResponse(stream_users(db), media_type="application/x-ndjson")
+
+
 @users_router.get("/{user_id}", response_model=UserResponse)
 async def get_user(user_id: int, db: AsyncSession = Depends(get_async_db)):
     """Получает пользователя по его id."""
@@ -48,7 +56,12 @@ async def delete_user(user_id: int, db: AsyncSession = Depends(get_async_db)):
     return {"message": "Пользователь успешно удалён"}
 
 
-@users_router.get("/", response_model=List[UserResponse])
-async def get_all_users(db: AsyncSession = Depends(get_async_db)):
-    """Получает список всех пользователей."""
-    return await get_all_users_service(db)
+@users_router.get("/", response_model=UserPage)
+async def get_all_users(after: Optional[str] = None,
+                        limit: int = Query(USERS_PAGE_SIZE, ge=1, le=USERS_MAX_PAGE_SIZE),
+                        db: AsyncSession = Depends(get_async_db)):
+    """
+    Получает страницу списка пользователей.
+    Для перехода к следующей странице передайте next_after в параметре after.
+    """
+    return await get_all_users_service(db, after, limit)
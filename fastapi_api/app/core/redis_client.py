@@ -0,0 +1,40 @@
+"""Асинхронное подключение к Redis"""
+from typing import Optional
+
+from fastapi import FastAPI
+from redis.asyncio import Redis
+
+from fastapi_api.app.core.config import REDIS_URL
+from fastapi_api.app.utils.logger import logger
+
+_client: Optional[Redis] = None
+
+
+def get_redis() -> Redis:
+    """Возвращает общий для процесса асинхронный клиент Redis."""
+    global _client
+    if _client is None:
+        _client = Redis.from_url(REDIS_URL, decode_responses=True)
+    return _client
+
+
+async def init_redis(app: FastAPI) -> None:
+    """Проверяет подключение к Redis при старте приложения."""
+    try:
+        await get_redis().ping()
+        app.state.redis_status = "connected"
+        logger.info("Соединение с Redis успешно установлено")
+    except Exception as e:
+        # Redis нужен только для дополнительных возможностей (стриминг и т.п.)
+        app.state.redis_status = f"error: {str(e)}"
+        logger.error(f"Не удалось подключиться к Redis: {e}")
+
+
+async def close_redis(app: FastAPI) -> None:
+    """Закрывает соединения с Redis при завершении приложения."""
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+        app.state.redis_status = "disconnected"
+        logger.info("Соединения с Redis успешно закрыты")
@@ -1,17 +1,15 @@
 """Асинхронное подключение к PostgreSQL"""
-from uuid import uuid4
 from typing import AsyncGenerator
 
 from fastapi import FastAPI
-from loguru import logger
 from sqlalchemy.ext.asyncio import (create_async_engine, async_sessionmaker,
                                     AsyncSession)
 
-from fastapi_api.app.core.config import DATABASE_URL
-from fastapi_api.app.utils.logger import log_id_filter, logger
+from fastapi_api.app.core.config import DATABASE_URL, SQL_ECHO
+from fastapi_api.app.utils.logger import logger
 
 
-async_engine = create_async_engine(DATABASE_URL, echo=True)
+async_engine = create_async_engine(DATABASE_URL, echo=SQL_ECHO)
 async_session_maker = async_sessionmaker(
     async_engine, expire_on_commit=False, class_=AsyncSession
 )
@@ -30,8 +28,6 @@ async def init_db(app: FastAPI) -> None:
     """
     Инициализация подключения к базе данных при старте приложения.
     """
-    log_id = str(uuid4())
-    log_id_filter.log_id = log_id
     try:
         logger.info("Инициализация подключения к базе данных...")
         app.state.db_session_maker = async_session_maker
@@ -42,22 +38,15 @@ async def init_db(app: FastAPI) -> None:
         app.state.db_status = f"error: {str(e)}"
         logger.error(f"Не удалось подключиться к базе данных: {e}")
         raise
-    finally:
-        log_id_filter.log_id = None
 
 
 async def close_db(app: FastAPI) -> None:
     """
     Закрытие соединений с базой данных при завершении приложения.
     """
-    log_id = str(uuid4())
-    log_id_filter.log_id = log_id
-    try:
-        logger.info("Закрытие соединений с базой данных...")
-        if hasattr(app.state, "db_session_maker"):
-            await async_engine.dispose()
-            app.state.db_session_maker = None
-            app.state.db_status = "disconnected"
-            logger.info("Соединения с базой данных успешно закрыты")
-    finally:
-        log_id_filter.log_id = None
+    logger.info("Закрытие соединений с базой данных...")
+    if hasattr(app.state, "db_session_maker"):
+        await async_engine.dispose()
+        app.state.db_session_maker = None
+        app.state.db_status = "disconnected"
+        logger.info("Соединения с базой данных успешно закрыты")
@@ -1,6 +1,5 @@
 """ Корневой файл API """
 import os
-from uuid import uuid4
 from typing import Dict, Union
 
 from contextlib import asynccontextmanager
@@ -9,35 +8,45 @@ from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 
 from fastapi_api.app.db.database import init_db, close_db
+from fastapi_api.app.core.redis_client import init_redis, close_redis
+from fastapi_api.app.services.task_events import task_events
+from fastapi_api.app.services.user_cache import user_cache
 from fastapi_api.app.api.chat import chat_router, tasks_router, messages_router
 from fastapi_api.app.api.users import users_router
-from fastapi_api.app.utils.logger import log_id_filter, logger
+from fastapi_api.app.api.metrics import metrics_router
+from fastapi_api.app.api.debug import debug_router
+from fastapi_api.app.utils.correlation import REQUEST_ID_HEADER, bind_log_id
+from fastapi_api.app.utils.logger import logger
 from fastapi_api.app.core.config import MODEL_NAME
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    """Контекст жизненного цикла приложения"""
-    log_id = str(uuid4())
-    log_id_filter.log_id = log_id
-    try:
-        logger.info("Приложение запускается: инициализация ресурсов...")
-        await init_db(app)
-        ml_model = {"name": "gpt", "version": "2.0"}
-        logger.info(f"Модель ML загружена: {ml_model}")
-        app.state.model = ml_model
-        yield
-    except Exception as e:
-        logger.error(f"Ошибка при запуске приложения: {e}")
-        raise
-    finally:
-        logger.info("Приложение останавливается: очистка ресурсов...")
-        await close_db(app)
-        if hasattr(app.state, "model"):
-            logger.info("Выгрузка модели ML")
-            app.state.model = None
-        logger.info("Ресурсы успешно очищены.")
-        log_id_filter.log_id = None
+    """Контекст жизненного цикла приложения (запуск и остановка пишут в лог с одним log_id)"""
+    with bind_log_id():
+        try:
+            logger.info("Приложение запускается: инициализация ресурсов...")
+            await init_db(app)
+            await init_redis(app)
+            await task_events.start()
+            await user_cache.start()
+            ml_model = {"name": "gpt", "version": "2.0"}
+            logger.info(f"Модель ML загружена: {ml_model}")
+            app.state.model = ml_model
+            yield
+        except Exception as e:
+            logger.error(f"Ошибка при запуске приложения: {e}")
+            raise
+        finally:
+            logger.info("Приложение останавливается: очистка ресурсов...")
+            await task_events.stop()
+            await user_cache.stop()
+            await close_db(app)
+            await close_redis(app)
+            if hasattr(app.state, "model"):
+                logger.info("Выгрузка модели ML")
+                app.state.model = None
+            logger.info("Ресурсы успешно очищены.")
 
 # Создаём приложение FastAPI
 app = FastAPI(
@@ -49,7 +58,7 @@ app.add_middleware(
     CORSMiddleware,
     allow_origins=["http://localhost:8000", "null"],
     allow_credentials=True,
-    allow_methods=["GET", "POST"],
+    allow_methods=["GET", "POST", "DELETE"],
     allow_headers=["Authorization", "Content-Type"]
 )
 os.makedirs("logs", exist_ok=True)
@@ -57,21 +66,22 @@ os.makedirs("logs", exist_ok=True)
 
 @app.middleware("http")
 async def log_middleware(request: Request, call_next):
-    """Функция логирования работы FastAPI"""
-    log_id = str(uuid4())
-    log_id_filter.log_id = log_id
-    try:
-        response = await call_next(request)
-        if response.status_code in [401, 402, 403, 404]:
-            logger.warning(f"Request to {request.url.path} failed")
-        else:
-            logger.info(f"Successfully accessed {request.url.path}")
+    """
+    Функция логирования работы FastAPI. Выдаёт запросу log_id (или берёт
+    его из заголовка X-Request-ID) и возвращает его в том же заголовке.
+    """
+    with bind_log_id(request.headers.get(REQUEST_ID_HEADER)) as log_id:
+        try:
+            response = await call_next(request)
+            if response.status_code in [401, 402, 403, 404]:
+                logger.warning("Request to %s failed", request.url.path)
+            else:
+                logger.info("Successfully accessed %s", request.url.path)
+        except Exception as ex:
+            logger.error("Request to %s failed: %s", request.url.path, ex)
+            response = JSONResponse(content={"success": False}, status_code=500)
+        response.headers[REQUEST_ID_HEADER] = log_id
         return response
-    except Exception as ex:
-        logger.error(f"Request to {request.url.path} failed: {ex}")
-        return JSONResponse(content={"success": False}, status_code=500)
-    finally:
-        log_id_filter.log_id = None
 
 
 # Корневой эндпоинт для проверки
@@ -81,19 +91,14 @@ async def root(request: Request) -> Dict[str, Union[str, Dict[str, str], None]]:
     Корневой маршрут, подтверждающий, что API работает.
     Проверяет состояние подключения к базе данных и наличие ML-модели.
     """
-    log_id = str(uuid4())
-    log_id_filter.log_id = log_id
-    try:
-        db_status = getattr(request.app.state, "db_status", "disconnected")
-        model_info = getattr(request.app.state, "model", None)
-        logger.info("Корневой эндпоинт вызван")
-        return {
-            "message": "Добро пожаловать в API ИИ ассистента!",
-            "db_status": db_status,
-            "model": model_info,
-        }
-    finally:
-        log_id_filter.log_id = None
+    db_status = getattr(request.app.state, "db_status", "disconnected")
+    model_info = getattr(request.app.state, "model", None)
+    logger.info("Корневой эндпоинт вызван")
+    return {
+        "message": "Добро пожаловать в API ИИ ассистента!",
+        "db_status": db_status,
+        "model": model_info,
+    }
 
 
 # вложение и подключение
@@ -101,3 +106,5 @@ app.include_router(chat_router)
 app.include_router(tasks_router)
 app.include_router(messages_router)
 app.include_router(users_router)
+app.include_router(metrics_router)
+app.include_router(debug_router)
@@ -0,0 +1,35 @@
+"""Add cancelled task status
+
+Revision ID: 7c1e5a9d2f43
+Revises: 4d667ad47fec
+Create Date: 2026-10-18 21:20:11.482310
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7c1e5a9d2f43'
+down_revision: Union[str, Sequence[str], None] = '4d667ad47fec'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # ALTER TYPE ... ADD VALUE нельзя выполнять в транзакции вместе с другими командами
+    with op.get_context().autocommit_block():
+        op.execute("ALTER TYPE taskstatus ADD VALUE IF NOT EXISTS 'CANCELLED'")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # Значение из enum PostgreSQL не удаляется: тип пересоздаётся, отменённые задачи становятся FAILED
+    op.execute("UPDATE tasks SET status = 'FAILED' WHERE status = 'CANCELLED'")
+    op.execute("ALTER TYPE taskstatus RENAME TO taskstatus_old")
+    sa.Enum('PENDING', 'PROCESSING', 'COMPLETED', 'FAILED', name='taskstatus').create(op.get_bind())
+    op.execute("ALTER TABLE tasks ALTER COLUMN status TYPE taskstatus USING status::text::taskstatus")
+    op.execute("DROP TYPE taskstatus_old")
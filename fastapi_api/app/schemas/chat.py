@@ -1,14 +1,39 @@
-from pydantic import BaseModel
+from typing import List, Optional
 
+from pydantic import BaseModel, Field, field_validator
+
+from fastapi_api.app.core.config import (GENERATION_MAX_NEW_TOKENS, GENERATION_MAX_STOP_SEQUENCES,
+                                         GENERATION_MAX_STOP_CHARS, GENERATION_MAX_TIME_BUDGET_MS)
 from fastapi_api.app.db.models import TaskStatus
 
 
+class GenerationOptions(BaseModel):
+    """Ограничения генерации ответа; не заданные поля берутся из настроек воркера"""
+    max_new_tokens: Optional[int] = Field(None, ge=1, le=GENERATION_MAX_NEW_TOKENS)
+    # Генерация останавливается на первой из строк, сама строка в ответ не входит
+    stop: List[str] = Field(default_factory=list, max_length=GENERATION_MAX_STOP_SEQUENCES)
+    # Бюджет времени генерации, мс: по его исчерпании возвращается то, что успело сгенерироваться
+    time_budget_ms: Optional[int] = Field(None, ge=1, le=GENERATION_MAX_TIME_BUDGET_MS)
+    # Остановка в конце первого законченного предложения
+    stop_at_sentence: bool = False
+
+    @field_validator("stop")
+    @classmethod
+    def check_stop(cls, stop: List[str]) -> List[str]:
+        if any(not item or len(item) > GENERATION_MAX_STOP_CHARS for item in stop):
+            raise ValueError(f"Стоп-строки должны быть непустыми и не длиннее {GENERATION_MAX_STOP_CHARS} символов")
+        return stop
+
+
 class ChatRequest(BaseModel):
     user_id: int
     message: str
+    generation: Optional[GenerationOptions] = None
 
 
 class ChatResponse(BaseModel):
     task_id: str
     status: TaskStatus
     message: str
+    # Оценка ожидания в очереди, секунды (None — оценка недоступна)
+    estimated_wait: Optional[float] = None
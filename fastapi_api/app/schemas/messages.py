@@ -1,5 +1,5 @@
 from datetime import datetime
-from typing import Optional
+from typing import List, Optional
 from pydantic import BaseModel
 
 from fastapi_api.app.db.models import SenderType
@@ -21,3 +21,8 @@ class MessageResponse(MessageBase):
 
     class Config:
         from_attributes = True
+
+
+class MessagePage(BaseModel):
+    items: List[MessageResponse]
+    next_before: Optional[str] = None
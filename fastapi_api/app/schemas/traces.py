@@ -0,0 +1,24 @@
+from typing import Any, Dict, List, Optional
+
+from pydantic import BaseModel
+
+
+class SpanResponse(BaseModel):
+    name: str
+    service: str
+    span_id: str
+    parent_id: Optional[str] = None
+    # Начало этапа относительно начала трассы и его длительность, мс
+    offset_ms: float
+    duration_ms: float
+    attrs: Dict[str, Any] = {}
+
+
+class TraceResponse(BaseModel):
+    trace_id: str
+    task_id: str
+    # От начала первого до конца последнего этапа, мс
+    total_ms: float
+    # Суммарная длительность этапов по имени, мс
+    stages: Dict[str, float]
+    spans: List[SpanResponse]
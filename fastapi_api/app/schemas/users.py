@@ -1,5 +1,5 @@
 from datetime import datetime
-from typing import Optional
+from typing import List, Optional
 from pydantic import BaseModel
 
 
@@ -18,3 +18,8 @@ class UserResponse(UserBase):
 
     class Config:
         from_attributes = True
+
+
+class UserPage(BaseModel):
+    items: List[UserResponse]
+    next_after: Optional[str] = None
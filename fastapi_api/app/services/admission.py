@@ -0,0 +1,141 @@
+"""Контроль допуска задач чата: ограничение частоты и оценка ожидания в очереди"""
+import math
+import time
+from typing import Dict, Optional
+
+from fastapi import HTTPException, status
+
+from fastapi_api.app.core.config import (CHAT_SCHEDULING, ADMISSION_MAX_WAIT, ADMISSION_WINDOW,
+                                         ADMISSION_TASK_SECONDS, RATE_LIMIT_PER_MINUTE,
+                                         RATE_LIMIT_BURST, RATE_LIMIT_KEY_PREFIX,
+                                         SCHEDULER_KEY_PREFIX)
+from fastapi_api.app.core.redis_client import get_redis
+from fastapi_api.app.services.scheduler import choose_lane
+from fastapi_api.app.utils.helpers import service_wrapper
+from fastapi_api.app.utils.logger import logger
+from fastapi_api.app.utils.scheduler import LANES, COMPLETED_KEY_PREFIX, lane_key
+
+ADMISSION_STATS_KEY = f"{SCHEDULER_KEY_PREFIX}admission"
+# Очередь Celery по умолчанию (CHAT_SCHEDULING=fifo)
+DEFAULT_QUEUE = "celery"
+
+# KEYS: ведро пользователя; ARGV: пополнение, токенов в секунду, ёмкость
+# Возвращает {1, 0}, если запрос разрешён, иначе {0, секунды до появления токена}
+TOKEN_BUCKET_SCRIPT = """
+local time = redis.call('TIME')
+local now = tonumber(time[1]) + tonumber(time[2]) / 1000000
+local rate = tonumber(ARGV[1])
+local capacity = tonumber(ARGV[2])
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(bucket[1]) or capacity
+local ts = tonumber(bucket[2]) or now
+tokens = math.min(capacity, tokens + (now - ts) * rate)
+local allowed, retry = 0, 0
+if tokens >= 1 then
+    tokens = tokens - 1
+    allowed = 1
+else
+    retry = (1 - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now))
+redis.call('EXPIRE', KEYS[1], math.ceil(capacity / rate) + 1)
+return {allowed, tostring(retry)}
+"""
+
+_token_bucket_script = None
+
+
+async def _count(name: str) -> None:
+    """Увеличивает счётчик допуска; без Redis счётчик просто пропускается."""
+    try:
+        await get_redis().hincrby(ADMISSION_STATS_KEY, name, 1)
+    except Exception as e:
+        logger.warning(f"Не удалось обновить счётчик допуска {name}: {e}")
+
+
+def _too_many_requests(detail: str, retry_after: float) -> HTTPException:
+    return HTTPException(status_code=status.HTTP_429_TOO_MANY_REQUESTS, detail=detail,
+                         headers={"Retry-After": str(max(1, math.ceil(retry_after)))})
+
+
+async def check_rate_limit(user_id: int) -> None:
+    """
+    Списывает токен из ведра пользователя (RATE_LIMIT_PER_MINUTE, пачка
+    RATE_LIMIT_BURST). Если токенов нет, отвечает 429 с Retry-After.
+    """
+    global _token_bucket_script
+    if RATE_LIMIT_PER_MINUTE <= 0:
+        return
+    try:
+        if _token_bucket_script is None:
+            _token_bucket_script = get_redis().register_script(TOKEN_BUCKET_SCRIPT)
+        allowed, retry_after = await _token_bucket_script(
+            keys=[f"{RATE_LIMIT_KEY_PREFIX}{user_id}"],
+            args=[RATE_LIMIT_PER_MINUTE / 60, RATE_LIMIT_BURST]
+        )
+    except Exception as e:
+        # Без Redis запросы не ограничиваются
+        logger.warning(f"Не удалось проверить лимит запросов пользователя {user_id}: {e}")
+        return
+    if not allowed:
+        await _count("rate_limited")
+        raise _too_many_requests("Слишком много запросов", float(retry_after))
+
+
+async def estimate_wait(lane: Optional[str]) -> float:
+    """
+    Оценивает ожидание новой задачи в очереди, секунды: число задач перед ней
+    (в её полосе и более приоритетных) делится на число задач, завершённых
+    воркерами за последние ADMISSION_WINDOW секунд.
+    """
+    redis = get_redis()
+    now = int(time.time())
+    pipe = redis.pipeline(transaction=False)
+    if lane is None:
+        pipe.llen(DEFAULT_QUEUE)
+    else:
+        for ahead in LANES[:LANES.index(lane) + 1]:
+            pipe.hget(lane_key(ahead, "stats"), "depth")
+    pipe.mget([f"{COMPLETED_KEY_PREFIX}{second}" for second in range(now - ADMISSION_WINDOW, now)])
+    *depths, completed = await pipe.execute()
+    depth = sum(int(value or 0) for value in depths)
+    if depth <= 0:
+        return 0.0
+    done = sum(int(value or 0) for value in completed)
+    throughput = done / ADMISSION_WINDOW if done else 1 / ADMISSION_TASK_SECONDS
+    return depth / throughput
+
+
+async def admit_task(user_id: int, message: str) -> Optional[float]:
+    """
+    Решает, принимать ли задачу в очередь. Возвращает оценку ожидания в
+    секундах (None, если её не удалось получить) или отвечает 429, если
+    ожидание превышает ADMISSION_MAX_WAIT.
+    """
+    lane = choose_lane(user_id, message) if CHAT_SCHEDULING == "fair" else None
+    try:
+        wait = await estimate_wait(lane)
+    except Exception as e:
+        logger.warning(f"Не удалось оценить ожидание в очереди: {e}")
+        return None
+    if ADMISSION_MAX_WAIT > 0 and wait > ADMISSION_MAX_WAIT:
+        await _count("shed")
+        raise _too_many_requests("Сервис перегружен, повторите запрос позже",
+                                 wait - ADMISSION_MAX_WAIT)
+    await _count("admitted")
+    return round(wait, 1)
+
+
+@service_wrapper
+async def get_admission_stats() -> Dict[str, float]:
+    """Возвращает счётчики допуска и текущую оценку ожидания по полосам."""
+    redis = get_redis()
+    stats = {name: int(value) for name, value in (await redis.hgetall(ADMISSION_STATS_KEY)).items()}
+    for name in ("admitted", "shed", "rate_limited"):
+        stats.setdefault(name, 0)
+    if CHAT_SCHEDULING == "fair":
+        for lane in LANES:
+            stats[f"estimated_wait_{lane}"] = round(await estimate_wait(lane), 1)
+    else:
+        stats["estimated_wait"] = round(await estimate_wait(None), 1)
+    return stats
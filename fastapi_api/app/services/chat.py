@@ -1,48 +1,139 @@
 """Сервис для обработки чатов и задач"""
+import time
+from datetime import datetime
+from typing import Optional
 from uuid import uuid4
 
+from sqlalchemy import insert, literal, select
 from sqlalchemy.ext.asyncio import AsyncSession
 from fastapi import HTTPException, status
 
-from fastapi_api.app.db.models import Task, TaskStatus, Message, SenderType
+from fastapi_api.app.core.config import (RESPONSE_CACHE_SEMANTIC, RESPONSE_CACHE_WITH_HISTORY, CHAT_SCHEDULING,
+                                         CONTEXT_MAX_TURNS)
+from fastapi_api.app.db.models import Task, TaskStatus, Message, SenderType, User
 from fastapi_api.app.schemas.chat import ChatRequest, ChatResponse
+from fastapi_api.app.utils.correlation import get_log_id
 from fastapi_api.app.utils.helpers import service_wrapper
 from fastapi_api.app.worker.main import celery_app
-from fastapi_api.app.services.users import get_user_by_id_service
+from fastapi_api.app.services.admission import admit_task, check_rate_limit
+from fastapi_api.app.services.response_cache import lookup_response
+from fastapi_api.app.services.scheduler import enqueue_chat_task
+from fastapi_api.app.services.traces import export_trace, should_trace
+from fastapi_api.app.utils.tracing import current_trace, span, start_trace
+
+
+def _build_chat_insert(task_id: str, request: ChatRequest, task_status: TaskStatus,
+                       cached_result: Optional[str]):
+    """
+    Один запрос вместо пяти: проверка пользователя, вставка задачи и сообщений.
+    Если пользователь не найден, CTE не вставляет ни одной строки.
+    """
+    now = datetime.now()
+    sender_type = Message.__table__.c.sender.type
+    chat_user = select(User.id).where(User.id == request.user_id).cte("chat_user")
+    new_task = (
+        insert(Task)
+        .from_select(
+            ["task_id", "user_id", "input_data", "status", "result", "created_at", "updated_at"],
+            select(literal(task_id), chat_user.c.id, literal(request.message),
+                   literal(task_status, type_=Task.__table__.c.status.type),
+                   literal(cached_result), literal(now), literal(now))
+        )
+        .returning(Task.id, Task.user_id)
+        .cte("new_task")
+    )
+    rows = select(new_task.c.user_id, new_task.c.id,
+                  literal(SenderType.USER, type_=sender_type),
+                  literal(request.message), literal(now))
+    if cached_result is not None:
+        rows = rows.union_all(
+            select(new_task.c.user_id, new_task.c.id,
+                   literal(SenderType.ASSISTANT, type_=sender_type),
+                   literal(cached_result), literal(now))
+        )
+    return (
+        insert(Message)
+        .from_select(["user_id", "task_id", "sender", "content", "created_at"], rows,
+                     include_defaults=False)
+        .add_cte(new_task)
+        .returning(Message.task_id)
+    )
 
 
 @service_wrapper
 async def create_chat_service(request: ChatRequest, db: AsyncSession) -> ChatResponse:
-    """Создаёт задачу и сообщение от пользователя, отправляет задачу в Celery."""
-    user = await get_user_by_id_service(request.user_id, db)
-    if not user:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,
-                            detail="Пользователь не найден")
+    """
+    Создаёт задачу и сообщение от пользователя, отправляет задачу в Celery
+    (при CHAT_SCHEDULING=fair — через полосы приоритета и очереди пользователей).
+    Если ответ найден в кэше, задача сразу завершается без обращения к воркеру.
+    Пользователь проверяется той же вставкой: для неизвестного она не создаёт
+    строк, и запрос получает 404. Запросы сверх лимита пользователя и задачи,
+    которым пришлось бы ждать в очереди дольше ADMISSION_MAX_WAIT, отклоняются с 429.
+    Доля запросов TRACE_SAMPLE_RATE трассируется до конца обработки воркером.
+    Ограничения генерации из запроса передаются воркеру вместе с задачей;
+    ответы на такие запросы не ищутся в кэше и не сохраняются в него.
+    В кэше только ответы, сгенерированные без истории диалога; при
+    RESPONSE_CACHE_WITH_HISTORY=false и включённом контексте кэш не используется.
+    """
+    if not should_trace():
+        return await _create_chat(request, db)
+    with start_trace("api") as trace:
+        with span("chat.request", user_id=request.user_id):
+            response = await _create_chat(request, db)
+    await export_trace(trace, response.task_id)
+    return response
+
+
+async def _create_chat(request: ChatRequest, db: AsyncSession) -> ChatResponse:
+    with span("rate_limit"):
+        await check_rate_limit(request.user_id)
+    generation = request.generation.model_dump(exclude_defaults=True) if request.generation else None
+    cache_key, cached_result = None, None
+    if not generation and (RESPONSE_CACHE_WITH_HISTORY or CONTEXT_MAX_TURNS <= 0):
+        with span("cache.lookup") as attrs:
+            cache_key, cached_result = await lookup_response(request.message)
+            attrs["hit"] = cached_result is not None
+    task_status = TaskStatus.PENDING if cached_result is None else TaskStatus.COMPLETED
+    estimated_wait = 0.0
+    if cached_result is None:
+        with span("admission"):
+            estimated_wait = await admit_task(request.user_id, request.message)
     task_id = str(uuid4())
-    task = Task(
-        task_id=task_id,
-        user_id=request.user_id,
-        input_data=request.message,
-        status=TaskStatus.PENDING
-    )
-    db.add(task)
-    await db.flush()
-    message = Message(
-        user_id=request.user_id,
-        task_id=task.id,
-        sender=SenderType.USER,
-        content=request.message
-    )
-    db.add(message)
-    await db.commit()
-    await db.refresh(task)
-    celery_app.send_task(
-        "ai_worker.worker.tasks.ai_tasks.process_ai_task",
-        args=[task_id, request.message]
-    )
+    with span("db.insert"):
+        result = await db.execute(_build_chat_insert(task_id, request, task_status, cached_result))
+        if result.first() is None:
+            await db.rollback()
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,
+                                detail="Пользователь не найден")
+        await db.commit()
+    if cached_result is None:
+        kwargs = {}
+        if cache_key is not None:
+            kwargs["cache"] = {"key": cache_key, "semantic": RESPONSE_CACHE_SEMANTIC}
+        if generation:
+            kwargs["generation"] = generation
+        with span("enqueue", scheduling=CHAT_SCHEDULING):
+            trace = current_trace()
+            # Воркер продолжит трассу: его этапы станут дочерними для enqueue
+            trace_context = trace.context(enqueued_at=time.time()) if trace is not None else None
+            if CHAT_SCHEDULING == "fair":
+                await enqueue_chat_task(task_id, request.user_id, request.message,
+                                        kwargs.get("cache"), trace_context, kwargs.get("generation"))
+            else:
+                # log_id запроса едет в заголовке: логи воркера по задаче пишутся с ним же
+                headers = {"log_id": get_log_id()}
+                if trace_context:
+                    headers["trace"] = trace_context
+                celery_app.send_task(
+                    "ai_worker.worker.tasks.ai_tasks.process_ai_task",
+                    args=[task_id, request.message],
+                    kwargs=kwargs,
+                    headers=headers
+                )
     return ChatResponse(
         task_id=task_id,
         user_id=request.user_id,
         message=request.message,
-        status=TaskStatus.PENDING
+        status=task_status,
+        estimated_wait=estimated_wait
     )
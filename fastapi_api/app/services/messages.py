@@ -1,28 +1,83 @@
 """Сервис для работы с сообщениями"""
-from typing import List
+from datetime import datetime
+from typing import AsyncIterator, Optional
 
+from sqlalchemy import tuple_
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
+from fastapi import HTTPException, status
 
+from fastapi_api.app.core.config import MESSAGES_PAGE_SIZE
 from fastapi_api.app.db.models import Message
-from fastapi_api.app.schemas.messages import MessageResponse
-from fastapi_api.app.utils.helpers import service_wrapper
+from fastapi_api.app.schemas.messages import MessagePage, MessageResponse
+from fastapi_api.app.utils.helpers import service_wrapper, encode_cursor, decode_cursor
+
+MESSAGE_COLUMNS = (Message.id, Message.sender, Message.content, Message.created_at)
+EXPORT_CHUNK_SIZE = 1000
 
 
 @service_wrapper
-async def get_user_messages_service(user_id: int,
-                                    db: AsyncSession) -> List[MessageResponse]:
-    """Получает историю сообщений пользователя."""
-    result = await db.execute(
-        select(Message).filter_by(user_id=user_id).order_by(Message.created_at)
+async def get_user_messages_service(user_id: int, db: AsyncSession,
+                                    before: Optional[str] = None,
+                                    limit: int = MESSAGES_PAGE_SIZE) -> MessagePage:
+    """
+    Получает страницу истории сообщений пользователя: до limit сообщений,
+    предшествующих курсору before (по умолчанию — самые новые).
+    Сообщения страницы упорядочены по времени, next_before указывает
+    на более старую страницу.
+    """
+    query = select(*MESSAGE_COLUMNS).where(Message.user_id == user_id)
+    if before:
+        try:
+            created_at, message_id = decode_cursor(before)
+            cursor_key = (datetime.fromisoformat(created_at), int(message_id))
+        except (ValueError, TypeError):
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
+                                detail="Некорректный курсор")
+        query = query.where(tuple_(Message.created_at, Message.id) < tuple_(*cursor_key))
+    query = query.order_by(Message.created_at.desc(), Message.id.desc()).limit(limit + 1)
+    rows = (await db.execute(query)).all()
+    next_before = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_before = encode_cursor(rows[-1].created_at.isoformat(), rows[-1].id)
+    return MessagePage(
+        items=[
+            MessageResponse(
+                id=row.id,
+                sender=row.sender,
+                content=row.content,
+                created_at=row.created_at
+            )
+            for row in reversed(rows)
+        ],
+        next_before=next_before
+    )
+
+
+async def stream_user_messages(user_id: int, db: AsyncSession) -> AsyncIterator[str]:
+    """
+    Отдаёт всю историю пользователя JSON-массивом по частям, читая её
+    серверным курсором, так что память не зависит от объёма истории.
+    """
+    result = await db.stream(
+        select(*MESSAGE_COLUMNS)
+        .where(Message.user_id == user_id)
+        .order_by(Message.created_at, Message.id)
+        .execution_options(yield_per=EXPORT_CHUNK_SIZE)
     )
-    messages = result.scalars().all()
-    return [
-        MessageResponse(
-            id=message.id,
-            sender=message.sender,
-            content=message.content,
-            created_at=message.created_at
+    yield "["
+    separator = ""
+    async for rows in result.partitions():
+        chunk = ",".join(
+            MessageResponse(
+                id=row.id,
+                sender=row.sender,
+                content=row.content,
+                created_at=row.created_at
+            ).model_dump_json()
+            for row in rows
         )
-        for message in messages
-    ]
+        yield separator + chunk
+        separator = ","
+    yield "]"
@@ -0,0 +1,93 @@
+"""Сервис поиска готовых ответов в кэше"""
+import asyncio
+import time
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from fastapi_api.app.core.config import (MODEL_NAME, GENERATION_PARAMS, RESPONSE_CACHE_ENABLED,
+                                         RESPONSE_CACHE_SEMANTIC, RESPONSE_CACHE_SIMILARITY)
+from fastapi_api.app.core.redis_client import get_redis
+from fastapi_api.app.utils.helpers import service_wrapper
+from fastapi_api.app.utils.logger import logger
+from fastapi_api.app.utils.response_cache import (ENTRY_PREFIX, LRU_KEY, VECTORS_KEY, STATS_KEY,
+                                                  EMBEDDING_DIMS, cache_key, is_cacheable, embed_prompt,
+                                                  unpack_vectors)
+
+# Снимок векторов семантического уровня (ключи и матрица по строке на ключ),
+# обновляемый не чаще раза в SEMANTIC_REFRESH секунд
+SEMANTIC_REFRESH = 30.0
+_keys: List[str] = []
+_matrix = np.empty((0, EMBEDDING_DIMS), dtype=np.float32)
+_vectors_loaded_at = 0.0
+_refresh_lock = asyncio.Lock()
+
+
+async def lookup_response(prompt: str) -> Tuple[Optional[str], Optional[str]]:
+    """
+    Ищет готовый ответ на промпт.
+    Возвращает (ключ кэша, ответ): ключ равен None, если ответ не кэшируется,
+    ответ равен None при промахе.
+    """
+    if not RESPONSE_CACHE_ENABLED or not is_cacheable(prompt, GENERATION_PARAMS):
+        return None, None
+    key = cache_key(prompt, MODEL_NAME, GENERATION_PARAMS)
+    try:
+        redis = get_redis()
+        hit_key, tier = key, "hits"
+        cached = await redis.get(f"{ENTRY_PREFIX}{key}")
+        if cached is None and RESPONSE_CACHE_SEMANTIC:
+            hit_key, cached = await _lookup_similar(prompt)
+            tier = "semantic_hits"
+        pipe = redis.pipeline(transaction=False)
+        if cached is None:
+            pipe.hincrby(STATS_KEY, "misses", 1)
+        else:
+            pipe.hincrby(STATS_KEY, tier, 1)
+            pipe.zadd(LRU_KEY, {hit_key: time.time()}, xx=True)
+        await pipe.execute()
+        return key, cached
+    except Exception as e:
+        # Кэш не должен мешать обработке запроса
+        logger.warning(f"Ошибка обращения к кэшу ответов: {e}")
+        return key, None
+
+
+async def _refresh_vectors() -> None:
+    """
+    Перечитывает векторы из Redis. Разбор идёт в отдельном потоке, чтобы не
+    занимать event loop; запросы на время обновления ищут по прежнему снимку.
+    """
+    global _keys, _matrix, _vectors_loaded_at
+    async with _refresh_lock:
+        packed = await get_redis().hgetall(VECTORS_KEY)
+        _keys, _matrix = await asyncio.to_thread(unpack_vectors, packed)
+        _vectors_loaded_at = time.monotonic()
+
+
+async def _lookup_similar(prompt: str) -> Tuple[Optional[str], Optional[str]]:
+    if time.monotonic() - _vectors_loaded_at > SEMANTIC_REFRESH and not _refresh_lock.locked():
+        await _refresh_vectors()
+    keys, matrix = _keys, _matrix
+    if not keys:
+        return None, None
+    # Векторы нормированы: косинусная близость — скалярное произведение
+    scores = matrix @ np.asarray(embed_prompt(prompt), dtype=np.float32)
+    best = int(scores.argmax())
+    if scores[best] < RESPONSE_CACHE_SIMILARITY:
+        return None, None
+    return keys[best], await get_redis().get(f"{ENTRY_PREFIX}{keys[best]}")
+
+
+@service_wrapper
+async def get_cache_stats() -> Dict[str, float]:
+    """Возвращает счётчики попаданий и промахов кэша ответов."""
+    redis = get_redis()
+    stats = {name: int(value) for name, value in (await redis.hgetall(STATS_KEY)).items()}
+    stats.setdefault("hits", 0)
+    stats.setdefault("semantic_hits", 0)
+    stats.setdefault("misses", 0)
+    stats["entries"] = await redis.zcard(LRU_KEY)
+    total = stats["hits"] + stats["semantic_hits"] + stats["misses"]
+    stats["hit_ratio"] = (stats["hits"] + stats["semantic_hits"]) / total if total else 0.0
+    return stats
@@ -0,0 +1,80 @@
+"""Сервис постановки задач чата в очереди с приоритетами и справедливым планированием"""
+import json
+import statistics
+from typing import Any, Dict, Optional
+
+from fastapi_api.app.core.config import (PREMIUM_USER_IDS, SHORT_PROMPT_CHARS, SCHEDULER_COST_CHARS,
+                                         SCHEDULER_MAX_COST)
+from fastapi_api.app.core.redis_client import get_redis
+from fastapi_api.app.utils.correlation import get_log_id
+from fastapi_api.app.utils.helpers import service_wrapper
+from fastapi_api.app.utils.scheduler import LANES, ENQUEUE_SCRIPT, enqueue_keys, lane_key, lane_queue
+from fastapi_api.app.worker.main import celery_app
+
+_enqueue_script = None
+
+
+def choose_lane(user_id: int, message: str) -> str:
+    """Полоса задачи: премиальные пользователи, затем короткие промпты, затем остальные."""
+    if user_id in PREMIUM_USER_IDS:
+        return "premium"
+    if len(message) <= SHORT_PROMPT_CHARS:
+        return "short"
+    return "default"
+
+
+async def enqueue_chat_task(task_id: str, user_id: int, message: str,
+                            cache: Optional[dict] = None, trace: Optional[dict] = None,
+                            generation: Optional[dict] = None) -> str:
+    """
+    Кладёт задачу в очередь пользователя в её полосе и отправляет тик
+    в очередь Celery этой полосы. Возвращает выбранную полосу.
+    Контекст трассы trace и log_id запроса едут в самой задаче: тик может
+    достаться другой задаче.
+    """
+    global _enqueue_script
+    if _enqueue_script is None:
+        _enqueue_script = get_redis().register_script(ENQUEUE_SCRIPT)
+    lane = choose_lane(user_id, message)
+    cost = min(SCHEDULER_MAX_COST, 1 + len(message) // SCHEDULER_COST_CHARS)
+    task = json.dumps({"task_id": task_id, "message": message, "cache": cache, "trace": trace,
+                       "log_id": get_log_id(), "generation": generation})
+    await _enqueue_script(
+        keys=enqueue_keys(lane),
+        args=[user_id, task, cost]
+    )
+    celery_app.send_task(
+        "ai_worker.worker.tasks.ai_tasks.process_next_task",
+        args=[lane],
+        queue=lane_queue(lane)
+    )
+    return lane
+
+
+@service_wrapper
+async def get_queue_stats() -> Dict[str, Dict[str, Any]]:
+    """Возвращает по каждой полосе глубину очереди, число активных пользователей и ожидание."""
+    redis = get_redis()
+    pipe = redis.pipeline(transaction=False)
+    for lane in LANES:
+        pipe.hgetall(lane_key(lane, "stats"))
+        pipe.llen(lane_key(lane, "active"))
+        pipe.lrange(lane_key(lane, "waits"), 0, -1)
+    replies = await pipe.execute()
+    stats = {}
+    for index, lane in enumerate(LANES):
+        counters, active_users, waits = replies[index * 3:index * 3 + 3]
+        counters = {name: int(value) for name, value in counters.items()}
+        waits = sorted(int(wait) for wait in waits)
+        claimed = counters.get("claimed", 0)
+        stats[lane] = {
+            "depth": counters.get("depth", 0),
+            "active_users": active_users,
+            "enqueued": counters.get("enqueued", 0),
+            "claimed": claimed,
+            "wait_ms_avg": counters.get("wait_ms_sum", 0) / claimed if claimed else 0.0,
+            "wait_ms_p50": statistics.median(waits) if waits else 0.0,
+            "wait_ms_p95": waits[max(0, int(len(waits) * 0.95) - 1)] if waits else 0.0,
+            "wait_ms_max": waits[-1] if waits else 0.0,
+        }
+    return stats
@@ -0,0 +1,70 @@
+"""Сервис потоковой передачи ответа модели клиенту"""
+import json
+import time
+from typing import AsyncIterator, Dict
+
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+from fastapi import HTTPException, status
+
+from fastapi_api.app.core.config import (STREAM_KEY_PREFIX, STREAM_BLOCK_MS,
+                                         STREAM_IDLE_TIMEOUT)
+from fastapi_api.app.core.redis_client import get_redis
+from fastapi_api.app.db.models import Task, TaskStatus
+from fastapi_api.app.utils.logger import logger
+
+FINAL_EVENTS = ("done", "error", "cancelled")
+
+
+async def stream_task_events(task_id: str,
+                             db: AsyncSession) -> AsyncIterator[Dict[str, dict]]:
+    """
+    Отдаёт события задачи из её Redis Stream: start — воркер начал обработку,
+    token — очередной фрагмент текста, done — итоговый результат,
+    error — ошибка обработки, cancelled — задача отменена.
+    Если задача уже завершена, сразу отдаёт итоговое событие из БД.
+    """
+    result = await db.execute(
+        select(Task.status, Task.result).filter_by(task_id=task_id)
+    )
+    row = result.first()
+    if not row:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,
+                            detail="Задача не найдена")
+    return _iter_events(task_id, row.status, row.result)
+
+
+async def _iter_events(task_id: str, task_status: TaskStatus,
+                       task_result: str) -> AsyncIterator[Dict[str, dict]]:
+    redis = get_redis()
+    key = f"{STREAM_KEY_PREFIX}{task_id}"
+    # Поток мог истечь по TTL — тогда итог берём из БД
+    if task_status == TaskStatus.CANCELLED and not await redis.exists(key):
+        yield {"event": "cancelled", "data": {}}
+        return
+    if task_status in (TaskStatus.COMPLETED, TaskStatus.FAILED) and not await redis.exists(key):
+        event = "done" if task_status == TaskStatus.COMPLETED else "error"
+        field = "result" if event == "done" else "error"
+        yield {"event": event, "data": {field: task_result}}
+        return
+    last_id = "0"
+    last_event_at = time.monotonic()
+    while time.monotonic() - last_event_at < STREAM_IDLE_TIMEOUT:
+        response = await redis.xread({key: last_id}, block=STREAM_BLOCK_MS)
+        if not response:
+            continue
+        last_event_at = time.monotonic()
+        for entry_id, fields in response[0][1]:
+            last_id = entry_id
+            event = fields["event"]
+            yield {"event": event, "data": json.loads(fields["data"])}
+            if event in FINAL_EVENTS:
+                return
+    logger.warning(f"Поток задачи {task_id} закрыт по таймауту ожидания")
+    yield {"event": "error", "data": {"error": "Превышено время ожидания ответа"}}
+
+
+def format_sse(event: Dict[str, dict]) -> str:
+    """Форматирует событие в формат Server-Sent Events."""
+    data = json.dumps(event["data"], ensure_ascii=False)
+    return f"event: {event['event']}\ndata: {data}\n\n"
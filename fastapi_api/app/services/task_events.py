@@ -0,0 +1,89 @@
+"""Ожидание завершения задач по событиям из Redis Pub/Sub"""
+import asyncio
+import json
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, Optional, Set
+
+from fastapi_api.app.core.config import TASK_EVENTS_CHANNEL
+from fastapi_api.app.core.redis_client import get_redis
+from fastapi_api.app.utils.logger import logger
+
+
+class TaskEventListener:
+    """
+    Одна подписка на канал завершения задач на процесс API.
+    Запросы регистрируют ожидающие Future по task_id; при получении события
+    все ожидающие этой задачи получают его одновременно.
+    """
+
+    def __init__(self, channel: str = TASK_EVENTS_CHANNEL):
+        self.channel = channel
+        self._waiters: Dict[str, Set[asyncio.Future]] = {}
+        self._listener: Optional[asyncio.Task] = None
+
+    async def start(self) -> None:
+        """Запускает фоновое чтение канала."""
+        if self._listener is None:
+            self._listener = asyncio.create_task(self._listen())
+
+    async def stop(self) -> None:
+        """Останавливает чтение канала и отменяет ожидания."""
+        if self._listener is not None:
+            self._listener.cancel()
+            try:
+                await self._listener
+            except asyncio.CancelledError:
+                pass
+            self._listener = None
+        for futures in self._waiters.values():
+            for future in futures:
+                future.cancel()
+        self._waiters.clear()
+
+    @asynccontextmanager
+    async def waiter(self, task_id: str) -> AsyncIterator[asyncio.Future]:
+        """
+        Регистрирует ожидание события задачи task_id. Регистрация выполняется
+        до проверки статуса в БД, чтобы не пропустить событие между ними.
+        """
+        future = asyncio.get_running_loop().create_future()
+        self._waiters.setdefault(task_id, set()).add(future)
+        try:
+            yield future
+        finally:
+            futures = self._waiters.get(task_id)
+            if futures is not None:
+                futures.discard(future)
+                if not futures:
+                    del self._waiters[task_id]
+
+    @property
+    def waiting(self) -> int:
+        """Количество ожидающих запросов."""
+        return sum(len(futures) for futures in self._waiters.values())
+
+    def _dispatch(self, payload: str) -> None:
+        event = json.loads(payload)
+        for future in self._waiters.pop(event["task_id"], ()):
+            if not future.done():
+                future.set_result(event)
+
+    async def _listen(self) -> None:
+        while True:
+            pubsub = get_redis().pubsub(ignore_subscribe_messages=True)
+            try:
+                await pubsub.subscribe(self.channel)
+                logger.info(f"Подписка на канал {self.channel} установлена")
+                async for message in pubsub.listen():
+                    if message["type"] == "message":
+                        self._dispatch(message["data"])
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Ошибка подписки на канал {self.channel}: {e}")
+                await asyncio.sleep(1)
+            finally:
+                await pubsub.aclose()
+
+
+task_events = TaskEventListener()
@@ -1,19 +1,30 @@
 """Сервис для управления задачами"""
+import asyncio
+import json
+from datetime import datetime
+
+from sqlalchemy import update
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 from fastapi import HTTPException, status
 
-from fastapi_api.app.db.models import Task
+from fastapi_api.app.core.config import CANCEL_TTL, STREAM_KEY_PREFIX, STREAM_TTL, TASK_EVENTS_CHANNEL
+from fastapi_api.app.core.redis_client import get_redis
+from fastapi_api.app.db.models import Task, TaskStatus
 from fastapi_api.app.schemas.tasks import TaskStatusResponse
+from fastapi_api.app.services.task_events import task_events
+from fastapi_api.app.utils.cancellation import cancel_key
 from fastapi_api.app.utils.helpers import service_wrapper
+from fastapi_api.app.utils.logger import logger
 
+FINAL_STATUSES = (TaskStatus.COMPLETED, TaskStatus.FAILED, TaskStatus.CANCELLED)
 
-@service_wrapper
-async def get_task_status_service(task_id: str,
-                                  db: AsyncSession) -> TaskStatusResponse:
-    """Получает статус задачи по её task_id."""
-    result = await db.execute(select(Task).filter_by(task_id=task_id))
-    task = result.scalars().first()
+
+async def _fetch_status(task_id: str, db: AsyncSession) -> TaskStatusResponse:
+    result = await db.execute(
+        select(Task.task_id, Task.status, Task.result).filter_by(task_id=task_id)
+    )
+    task = result.first()
     if not task:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,
                             detail="Задача не найдена")
@@ -22,3 +33,65 @@ async def get_task_status_service(task_id: str,
         status=task.status,
         result=task.result
     )
+
+
+@service_wrapper
+async def get_task_status_service(task_id: str, db: AsyncSession,
+                                  wait: float = 0) -> TaskStatusResponse:
+    """
+    Получает статус задачи по её task_id.
+    Если wait > 0 и задача ещё не завершена, ждёт события о её завершении
+    не дольше wait секунд (long-poll).
+    """
+    if wait <= 0:
+        return await _fetch_status(task_id, db)
+    async with task_events.waiter(task_id) as completed:
+        task_status = await _fetch_status(task_id, db)
+        if task_status.status in FINAL_STATUSES:
+            return task_status
+        # Соединение с БД не должно удерживаться на время ожидания
+        await db.close()
+        try:
+            event = await asyncio.wait_for(completed, timeout=wait)
+        except asyncio.TimeoutError:
+            return await _fetch_status(task_id, db)
+    return TaskStatusResponse(
+        task_id=task_id,
+        status=TaskStatus(event["status"]),
+        result=event["result"]
+    )
+
+
+@service_wrapper
+async def cancel_task_service(task_id: str, db: AsyncSession) -> TaskStatusResponse:
+    """
+    Отменяет ещё не завершённую задачу: помечает её CANCELLED и ставит флаг
+    отмены, по которому воркер не начнёт обработку или остановит генерацию
+    на ближайшем шаге. Ожидающие статуса и поток задачи получают событие
+    отмены сразу. Завершённую задачу отменить нельзя (409).
+    """
+    cancelled = await db.execute(
+        update(Task)
+        .where(Task.task_id == task_id, Task.status.in_((TaskStatus.PENDING, TaskStatus.PROCESSING)))
+        .values(status=TaskStatus.CANCELLED, updated_at=datetime.now())
+        .returning(Task.task_id)
+    )
+    if cancelled.first() is None:
+        await db.rollback()
+        current = await _fetch_status(task_id, db)
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT,
+                            detail=f"Задача уже завершена со статусом {current.status.value}")
+    await db.commit()
+    try:
+        stream = f"{STREAM_KEY_PREFIX}{task_id}"
+        pipe = get_redis().pipeline(transaction=False)
+        pipe.set(cancel_key(task_id), 1, ex=CANCEL_TTL)
+        pipe.publish(TASK_EVENTS_CHANNEL, json.dumps(
+            {"task_id": task_id, "status": TaskStatus.CANCELLED.value, "result": None}))
+        pipe.xadd(stream, {"event": "cancelled", "data": "{}"})
+        pipe.expire(stream, STREAM_TTL)
+        await pipe.execute()
+    except Exception as e:
+        # Статус в БД уже CANCELLED: воркер не сохранит результат, но может потратить время на генерацию
+        logger.warning(f"Не удалось передать отмену задачи {task_id} воркеру: {e}")
+    return TaskStatusResponse(task_id=task_id, status=TaskStatus.CANCELLED)
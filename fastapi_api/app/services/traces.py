@@ -0,0 +1,64 @@
+"""Сервис трассировки задач чата: выгрузка спанов API и просмотр трассы"""
+import json
+import random
+from collections import defaultdict
+
+from fastapi import HTTPException, status
+
+from fastapi_api.app.core.config import (TRACE_SAMPLE_RATE, TRACE_EXPORTER, TRACE_FILE, TRACE_TTL,
+                                         TRACE_MAX_SPANS)
+from fastapi_api.app.core.redis_client import get_redis
+from fastapi_api.app.schemas.traces import SpanResponse, TraceResponse
+from fastapi_api.app.utils.helpers import service_wrapper
+from fastapi_api.app.utils.logger import logger
+from fastapi_api.app.utils.tracing import Trace, task_trace_key, trace_key, write_spans_file
+
+
+def should_trace() -> bool:
+    """Решает, трассировать ли очередной запрос (доля TRACE_SAMPLE_RATE)."""
+    return TRACE_SAMPLE_RATE > 0 and random.random() < TRACE_SAMPLE_RATE
+
+
+async def export_trace(trace: Trace, task_id: str) -> None:
+    """Выгружает спаны API одним пакетом и связывает трассу с задачей task_id."""
+    try:
+        if TRACE_EXPORTER == "file":
+            write_spans_file(TRACE_FILE, trace)
+            return
+        key = trace_key(trace.trace_id)
+        pipe = get_redis().pipeline(transaction=False)
+        pipe.rpush(key, *trace.encoded_spans())
+        pipe.ltrim(key, -TRACE_MAX_SPANS, -1)
+        pipe.expire(key, TRACE_TTL)
+        pipe.set(task_trace_key(task_id), trace.trace_id, ex=TRACE_TTL)
+        await pipe.execute()
+    except Exception as e:
+        # Трасса — отладочные данные: их потеря не должна влиять на запрос
+        logger.warning(f"Не удалось выгрузить трассу задачи {task_id}: {e}")
+
+
+@service_wrapper
+async def get_task_trace_service(task_id: str) -> TraceResponse:
+    """
+    Возвращает трассу задачи: этапы API и воркера в порядке начала
+    и суммарное время по каждому этапу.
+    """
+    redis = get_redis()
+    trace_id = await redis.get(task_trace_key(task_id))
+    rows = [json.loads(row) for row in await redis.lrange(trace_key(trace_id), 0, -1)] if trace_id else []
+    if not rows:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,
+                            detail="Трасса задачи не найдена")
+    rows.sort(key=lambda row: row["start"])
+    started = rows[0]["start"]
+    finished = max(row["start"] + row["duration_ms"] / 1000 for row in rows)
+    stages = defaultdict(float)
+    for row in rows:
+        stages[row["name"]] += row["duration_ms"]
+    return TraceResponse(
+        trace_id=trace_id,
+        task_id=task_id,
+        total_ms=round((finished - started) * 1000, 3),
+        stages={name: round(value, 3) for name, value in stages.items()},
+        spans=[SpanResponse(offset_ms=round((row["start"] - started) * 1000, 3), **row) for row in rows]
+    )
@@ -0,0 +1,203 @@
+"""Двухуровневый кэш пользователей: в памяти процесса и в Redis"""
+import asyncio
+import json
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple, Union
+
+from fastapi_api.app.core.config import (USER_CACHE_ENABLED, USER_CACHE_PREFIX, USER_CACHE_TTL,
+                                         USER_CACHE_LOCAL_TTL, USER_CACHE_LOCAL_SIZE,
+                                         USER_CACHE_CHANNEL)
+from fastapi_api.app.core.redis_client import get_redis
+from fastapi_api.app.schemas.users import UserResponse
+from fastapi_api.app.utils.helpers import service_wrapper
+from fastapi_api.app.utils.logger import logger
+
+# Пользователь ищется по id или по telegram_id
+KINDS = ("id", "telegram_id")
+# Версия кэша в Redis: увеличивается каждой инвалидацией в любой реплике
+VERSION_KEY = f"{USER_CACHE_PREFIX}version"
+# Поколение чтения: (поколение процесса, версия в Redis или None, если она неизвестна)
+Generation = Tuple[int, Optional[str]]
+
+# KEYS: ключ версии, затем ключи записей; ARGV: версия при чтении, запись, TTL
+# Записывает пользователя, только если версия не изменилась (compare-and-set)
+STORE_SCRIPT = """
+if (redis.call('GET', KEYS[1]) or '0') ~= ARGV[1] then
+    return 0
+end
+for i = 2, #KEYS do
+    redis.call('SET', KEYS[i], ARGV[2], 'EX', ARGV[3])
+end
+return 1
+"""
+
+
+def _key(kind: str, value: Union[int, str]) -> str:
+    return f"{kind}:{value}"
+
+
+class UserCache:
+    """
+    Read-through кэш пользователей. Первый уровень — LRU в памяти процесса
+    с коротким TTL, второй — Redis. Сервисы пользователей инвалидируют записи
+    явно, а инвалидации рассылаются через Pub/Sub во все реплики API.
+    Поколение защищает от записи в кэш данных, прочитанных из БД до
+    инвалидации: для памяти процесса — счётчик процесса, для Redis — общая
+    версия VERSION_KEY, с которой запись в Redis сверяется атомарно.
+    """
+
+    def __init__(self, channel: str = USER_CACHE_CHANNEL):
+        self.channel = channel
+        self.generation = 0
+        self._local: "OrderedDict[str, Tuple[float, UserResponse]]" = OrderedDict()
+        self._stats: Dict[str, int] = {"local_hits": 0, "redis_hits": 0, "misses": 0,
+                                       "invalidations": 0}
+        self._listener: Optional[asyncio.Task] = None
+        self._store_script = None
+
+    async def start(self) -> None:
+        """Запускает приём инвалидаций от других реплик."""
+        if USER_CACHE_ENABLED and self._listener is None:
+            self._listener = asyncio.create_task(self._listen())
+
+    async def stop(self) -> None:
+        """Останавливает приём инвалидаций и очищает локальный уровень."""
+        if self._listener is not None:
+            self._listener.cancel()
+            try:
+                await self._listener
+            except asyncio.CancelledError:
+                pass
+            self._listener = None
+        self._local.clear()
+
+    async def get(self, kind: str,
+                  value: Union[int, str]) -> Tuple[Optional[UserResponse], Generation]:
+        """
+        Ищет пользователя в памяти процесса, затем в Redis. Вместе с
+        результатом возвращает поколение, которое при промахе нужно
+        передать в store после чтения из БД.
+        """
+        generation: Generation = (self.generation, None)
+        if not USER_CACHE_ENABLED:
+            return None, generation
+        key = _key(kind, value)
+        entry = self._local.get(key)
+        if entry is not None:
+            if entry[0] > time.monotonic():
+                self._local.move_to_end(key)
+                self._stats["local_hits"] += 1
+                return entry[1], generation
+            del self._local[key]
+        try:
+            # Версия читается тем же запросом, что и запись, — до чтения из БД
+            cached, version = await get_redis().mget(f"{USER_CACHE_PREFIX}{key}", VERSION_KEY)
+            generation = (generation[0], version or "0")
+        except Exception as e:
+            logger.warning(f"Не удалось прочитать пользователя из кэша: {e}")
+            cached = None
+        if cached is None:
+            self._stats["misses"] += 1
+            return None, generation
+        self._stats["redis_hits"] += 1
+        user = UserResponse.model_validate_json(cached)
+        if generation[0] == self.generation:
+            self._store_local(user)
+        return user, generation
+
+    async def store(self, user: UserResponse, generation: Generation) -> None:
+        """
+        Сохраняет пользователя на обоих уровнях под id и telegram_id, если с
+        момента чтения из БД (поколение generation) не было инвалидаций.
+        Инвалидации других реплик проверяются по версии в Redis атомарно с
+        записью; если версия при чтении неизвестна, Redis не обновляется.
+        """
+        local, version = generation
+        if not USER_CACHE_ENABLED or local != self.generation:
+            return
+        self._store_local(user)
+        if version is None:
+            return
+        try:
+            if self._store_script is None:
+                self._store_script = get_redis().register_script(STORE_SCRIPT)
+            keys = [f"{USER_CACHE_PREFIX}{_key(kind, getattr(user, kind))}" for kind in KINDS]
+            await self._store_script(keys=[VERSION_KEY, *keys],
+                                     args=[version, user.model_dump_json(), USER_CACHE_TTL])
+        except Exception as e:
+            logger.warning(f"Не удалось сохранить пользователя {user.id} в кэш: {e}")
+
+    async def invalidate(self, user_id: int, *telegram_ids: str) -> None:
+        """Удаляет записи пользователя из Redis и из памяти всех реплик API."""
+        if not USER_CACHE_ENABLED:
+            return
+        keys = [_key("id", user_id)] + [_key("telegram_id", value) for value in telegram_ids]
+        self._drop(keys)
+        try:
+            redis = get_redis()
+            pipe = redis.pipeline(transaction=False)
+            # Версия растёт раньше удаления: чтения, начатые до инвалидации, не запишут старые данные
+            pipe.incr(VERSION_KEY)
+            pipe.delete(*(f"{USER_CACHE_PREFIX}{key}" for key in keys))
+            pipe.publish(self.channel, json.dumps(keys))
+            await pipe.execute()
+        except Exception as e:
+            # Запись в Redis истечёт через USER_CACHE_TTL, в репликах — через USER_CACHE_LOCAL_TTL
+            logger.warning(f"Не удалось инвалидировать кэш пользователя {user_id}: {e}")
+
+    def stats(self) -> Dict[str, float]:
+        """Счётчики попаданий по уровням для текущего процесса."""
+        stats: Dict[str, float] = dict(self._stats)
+        total = stats["local_hits"] + stats["redis_hits"] + stats["misses"]
+        stats["local_entries"] = len(self._local)
+        stats["local_hit_ratio"] = stats["local_hits"] / total if total else 0.0
+        stats["hit_ratio"] = (stats["local_hits"] + stats["redis_hits"]) / total if total else 0.0
+        return stats
+
+    def _store_local(self, user: UserResponse) -> None:
+        expires_at = time.monotonic() + USER_CACHE_LOCAL_TTL
+        for kind in KINDS:
+            key = _key(kind, getattr(user, kind))
+            self._local[key] = (expires_at, user)
+            self._local.move_to_end(key)
+        while len(self._local) > USER_CACHE_LOCAL_SIZE:
+            self._local.popitem(last=False)
+
+    def _drop(self, keys) -> None:
+        self.generation += 1
+        self._stats["invalidations"] += 1
+        for key in keys:
+            entry = self._local.pop(key, None)
+            if entry is not None:
+                # Запись под вторым ключом того же пользователя тоже устарела
+                for kind in KINDS:
+                    self._local.pop(_key(kind, getattr(entry[1], kind)), None)
+
+    async def _listen(self) -> None:
+        while True:
+            pubsub = get_redis().pubsub(ignore_subscribe_messages=True)
+            try:
+                await pubsub.subscribe(self.channel)
+                logger.info(f"Подписка на канал {self.channel} установлена")
+                async for message in pubsub.listen():
+                    if message["type"] == "message":
+                        self._drop(json.loads(message["data"]))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Ошибка подписки на канал {self.channel}: {e}")
+                # Пропущенные инвалидации: локальный уровень больше не надёжен
+                self._local.clear()
+                await asyncio.sleep(1)
+            finally:
+                await pubsub.aclose()
+
+
+user_cache = UserCache()
+
+
+@service_wrapper
+async def get_user_cache_stats() -> Dict[str, float]:
+    """Возвращает счётчики кэша пользователей текущей реплики API."""
+    return user_cache.stats()
@@ -1,13 +1,18 @@
 """Сервис для работы с пользователями"""
-from typing import List, Optional
+from typing import AsyncIterator, Optional
 
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 from fastapi import HTTPException, status
 
+from fastapi_api.app.core.config import USERS_PAGE_SIZE
 from fastapi_api.app.db.models import User
-from fastapi_api.app.schemas.users import UserCreate, UserResponse
-from fastapi_api.app.utils.helpers import service_wrapper
+from fastapi_api.app.schemas.users import UserCreate, UserPage, UserResponse
+from fastapi_api.app.services.user_cache import user_cache
+from fastapi_api.app.utils.helpers import service_wrapper, encode_cursor, decode_cursor
+
+USER_COLUMNS = (User.id, User.telegram_id, User.username, User.created_at)
+EXPORT_CHUNK_SIZE = 1000
 
 
 @service_wrapper
@@ -25,6 +30,7 @@ async def create_user_service(user_data: UserCreate,
     db.add(user)
     await db.commit()
     await db.refresh(user)
+    await user_cache.invalidate(user.id, user.telegram_id)
     return UserResponse(
         id=user.id,
         telegram_id=user.telegram_id,
@@ -36,35 +42,45 @@ async def create_user_service(user_data: UserCreate,
 @service_wrapper
 async def get_user_by_id_service(user_id: int,
                                  db: AsyncSession) -> Optional[UserResponse]:
-    """Получает пользователя по его id."""
+    """Получает пользователя по его id (через кэш пользователей)."""
+    cached, generation = await user_cache.get("id", user_id)
+    if cached is not None:
+        return cached
     result = await db.execute(select(User).filter_by(id=user_id))
     user = result.scalars().first()
     if not user:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,
                             detail="Пользователь не найден")
-    return UserResponse(
+    response = UserResponse(
         id=user.id,
         telegram_id=user.telegram_id,
         username=user.username,
         created_at=user.created_at
     )
+    await user_cache.store(response, generation)
+    return response
 
 
 @service_wrapper
 async def get_user_by_telegram_id_service(telegram_id: str,
                                           db: AsyncSession) -> Optional[UserResponse]:
-    """Получает пользователя по его telegram_id."""
+    """Получает пользователя по его telegram_id (через кэш пользователей)."""
+    cached, generation = await user_cache.get("telegram_id", telegram_id)
+    if cached is not None:
+        return cached
     result = await db.execute(select(User).filter_by(telegram_id=telegram_id))
     user = result.scalars().first()
     if not user:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,
                             detail="Пользователь не найден")
-    return UserResponse(
+    response = UserResponse(
         id=user.id,
         telegram_id=user.telegram_id,
         username=user.username,
         created_at=user.created_at
     )
+    await user_cache.store(response, generation)
+    return response
 
 
 @service_wrapper
@@ -84,10 +100,12 @@ async def update_user_service(user_id: int, user_data: UserCreate,
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="Пользователь с таким telegram_id уже существует"
             )
+    old_telegram_id = user.telegram_id
     user.telegram_id = user_data.telegram_id
     user.username = user_data.username
     await db.commit()
     await db.refresh(user)
+    await user_cache.invalidate(user.id, old_telegram_id, user.telegram_id)
     return UserResponse(
         id=user.id,
         telegram_id=user.telegram_id,
@@ -104,21 +122,63 @@ async def delete_user_service(user_id: int, db: AsyncSession) -> None:
     if not user:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,
                             detail="Пользователь не найден")
+    telegram_id = user.telegram_id
     await db.delete(user)
     await db.commit()
+    await user_cache.invalidate(user_id, telegram_id)
 
 
 @service_wrapper
-async def get_all_users_service(db: AsyncSession) -> List[UserResponse]:
-    """Получает список всех пользователей."""
-    result = await db.execute(select(User).order_by(User.created_at))
-    users = result.scalars().all()
-    return [
-        UserResponse(
-            id=user.id,
-            telegram_id=user.telegram_id,
-            username=user.username,
-            created_at=user.created_at
+async def get_all_users_service(db: AsyncSession, after: Optional[str] = None,
+                                limit: int = USERS_PAGE_SIZE) -> UserPage:
+    """
+    Получает страницу списка пользователей в порядке регистрации: до limit
+    пользователей после курсора after. next_after указывает на следующую страницу.
+    """
+    query = select(*USER_COLUMNS)
+    if after:
+        try:
+            (user_id,) = decode_cursor(after)
+            query = query.where(User.id > int(user_id))
+        except (ValueError, TypeError):
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
+                                detail="Некорректный курсор")
+    rows = (await db.execute(query.order_by(User.id).limit(limit + 1))).all()
+    next_after = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_after = encode_cursor(rows[-1].id)
+    return UserPage(
+        items=[
+            UserResponse(
+                id=row.id,
+                telegram_id=row.telegram_id,
+                username=row.username,
+                created_at=row.created_at
+            )
+            for row in rows
+        ],
+        next_after=next_after
+    )
+
+
+async def stream_users(db: AsyncSession) -> AsyncIterator[str]:
+    """
+    Отдаёт всех пользователей в формате NDJSON (по объекту на строку), читая
+    таблицу серверным курсором, так что память не зависит от её размера.
+    """
+    result = await db.stream(
+        select(*USER_COLUMNS)
+        .order_by(User.id)
+        .execution_options(yield_per=EXPORT_CHUNK_SIZE)
+    )
+    async for rows in result.partitions():
+        yield "".join(
+            UserResponse(
+                id=row.id,
+                telegram_id=row.telegram_id,
+                username=row.username,
+                created_at=row.created_at
+            ).model_dump_json() + "\n"
+            for row in rows
         )
-        for user in users
-    ]
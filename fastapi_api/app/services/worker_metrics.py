@@ -0,0 +1,17 @@
+"""Сервис чтения метрик процессов воркера"""
+import json
+from typing import Any, Dict, List
+
+from fastapi_api.app.core.config import METRICS_KEY_PREFIX
+from fastapi_api.app.core.redis_client import get_redis
+from fastapi_api.app.utils.helpers import service_wrapper
+
+
+@service_wrapper
+async def get_worker_metrics() -> List[Dict[str, Any]]:
+    """Возвращает последние снимки метрик всех живых процессов воркера."""
+    redis = get_redis()
+    keys = sorted([key async for key in redis.scan_iter(match=f"{METRICS_KEY_PREFIX}*", count=100)])
+    if not keys:
+        return []
+    return [json.loads(value) for value in await redis.mget(keys) if value is not None]
@@ -0,0 +1,11 @@
+"""
+Флаг отмены задачи чата в Redis (используется API и воркером).
+
+API ставит флаг при DELETE /api/chat/{task_id}; воркер проверяет его перед
+началом обработки задачи и между шагами декодирования.
+"""
+from fastapi_api.app.core.config import CANCEL_KEY_PREFIX
+
+
+def cancel_key(task_id: str) -> str:
+    return f"{CANCEL_KEY_PREFIX}{task_id}"
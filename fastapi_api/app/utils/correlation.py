@@ -0,0 +1,43 @@
+"""
+Идентификатор корреляции (log_id) для логов API и воркера (используется обоими).
+
+log_id хранится в contextvar, поэтому у каждой задачи asyncio и каждого
+потока он свой и одновременные запросы не перетирают друг друга. API
+выдаёт его один раз на HTTP-запрос (или берёт из заголовка X-Request-ID),
+вложенные вызовы сервисов пишут в лог с тем же log_id. Воркер получает
+его из заголовка log_id задачи Celery или из JSON задачи планировщика.
+"""
+import logging
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator, Optional
+from uuid import uuid4
+
+REQUEST_ID_HEADER = "X-Request-ID"
+# Переданный клиентом id обрезается, чтобы не раздувать каждую строку лога
+MAX_LOG_ID_LENGTH = 64
+
+_log_id: ContextVar[Optional[str]] = ContextVar("log_id", default=None)
+
+
+def get_log_id() -> Optional[str]:
+    return _log_id.get()
+
+
+@contextmanager
+def bind_log_id(log_id: Optional[str] = None) -> Iterator[str]:
+    """Делает log_id текущим на время блока; без log_id создаёт новый."""
+    log_id = log_id[:MAX_LOG_ID_LENGTH] if log_id else str(uuid4())
+    token = _log_id.set(log_id)
+    try:
+        yield log_id
+    finally:
+        _log_id.reset(token)
+
+
+class LogIdFilter(logging.Filter):
+    """Добавляет в запись текущий log_id."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.log_id = _log_id.get() or "no-id"
+        return True
@@ -1,33 +1,47 @@
 """Утилиты для упрощения сервисов"""
+import base64
+import json
 from functools import wraps
-from uuid import uuid4
+from typing import Any, List
 
 from fastapi import HTTPException, status
 
-from fastapi_api.app.utils.logger import logger, log_id_filter
+from fastapi_api.app.utils.logger import logger
 
 
 def service_wrapper(func):
     """
     Декоратор для логирования и обработки ошибок в сервисах.
+    log_id не меняется: вложенные вызовы пишут в лог с log_id запроса.
     """
     @wraps(func)
     async def wrapper(*args, **kwargs):
-        log_id = str(uuid4())
-        log_id_filter.log_id = log_id
         try:
             result = await func(*args, **kwargs)
-            logger.info(f"Успешно выполнен {func.__name__}")
+            logger.debug("Успешно выполнен %s", func.__name__)
             return result
         except HTTPException as e:
-            logger.error(f"Ошибка в {func.__name__}: {e.detail}")
+            logger.error("Ошибка в %s: %s", func.__name__, e.detail)
             raise
         except Exception as e:
-            logger.error(f"Необработанная ошибка в {func.__name__}: {e}")
+            logger.error("Необработанная ошибка в %s: %s", func.__name__, e)
             raise HTTPException(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                 detail="Ошибка сервера"
             )
-        finally:
-            log_id_filter.log_id = None
     return wrapper
+
+
+def encode_cursor(*values: Any) -> str:
+    """Кодирует ключ последней записи страницы в непрозрачный курсор."""
+    payload = json.dumps(values, default=str, separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(cursor: str) -> List[Any]:
+    """Декодирует курсор, созданный encode_cursor."""
+    try:
+        return json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+    except (ValueError, UnicodeError):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
+                            detail="Некорректный курсор")
@@ -0,0 +1,160 @@
+"""
+Неблокирующий конвейер логирования (используется API и воркером).
+
+Вызывающий поток только фильтрует запись и кладёт её в очередь
+(QueueHandler); форматирование сообщения, сериализация в JSON и запись
+в файл выполняются фоновым потоком QueueListener. Поэтому сообщения
+передаются лениво: logger.debug("Промпт: %s", prompt) — строка собирается
+только для записей, которые действительно попадут в лог.
+
+Уровни задаются по модулям: LOG_LEVELS="ai_worker.worker.core=DEBUG,
+sqlalchemy.engine=WARNING" — имена модулей приложения сравниваются по
+префиксу, остальные считаются именами сторонних логгеров. Частые отладочные
+записи прореживаются: из каждых debug_sample записей одной строки кода в
+лог попадает одна.
+"""
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+# Атрибуты LogRecord, которые не считаются пользовательскими полями (extra=...)
+_RECORD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime", "log_id"}
+_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+
+def parse_levels(spec: str) -> Dict[str, int]:
+    """Разбирает строку вида "модуль=УРОВЕНЬ,модуль=УРОВЕНЬ"."""
+    levels = {}
+    for item in spec.split(","):
+        name, _, level = item.partition("=")
+        if name.strip() and level.strip():
+            levels[name.strip()] = logging.getLevelName(level.strip().upper())
+    return levels
+
+
+class JsonFormatter(logging.Formatter):
+    """Запись лога одной строкой JSON; поля из extra=... добавляются как есть."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        payload = {
+            "ts": datetime.fromtimestamp(record.created).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "log_id": getattr(record, "log_id", None) or "no-id",
+            "module": record.module,
+            "line": record.lineno,
+            "message": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRS and not key.startswith("_"):
+                payload[key] = value
+        if record.exc_info:
+            payload["exc"] = self.formatException(record.exc_info)
+        return json.dumps(payload, ensure_ascii=False, default=str)
+
+
+class ModuleLevelFilter(logging.Filter):
+    """
+    Порог уровня по модулю, из которого вызван логгер, и прореживание
+    DEBUG-записей. Порог модуля вычисляется один раз на файл.
+    """
+
+    def __init__(self, default_level: int, module_levels: Dict[str, int], debug_sample: int = 1):
+        super().__init__()
+        self.default_level = default_level
+        # Более длинный (конкретный) префикс важнее
+        self.module_levels = sorted(module_levels.items(), key=lambda item: -len(item[0]))
+        self.debug_sample = max(1, debug_sample)
+        self._thresholds: Dict[str, int] = {}
+        self._counters: Dict[Tuple[str, int], int] = {}
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        threshold = self._thresholds.get(record.pathname)
+        if threshold is None:
+            threshold = self._thresholds[record.pathname] = self._threshold(record.pathname)
+        if record.levelno < threshold:
+            return False
+        if record.levelno <= logging.DEBUG and self.debug_sample > 1:
+            site = (record.pathname, record.lineno)
+            count = self._counters.get(site, 0)
+            self._counters[site] = count + 1
+            return count % self.debug_sample == 0
+        return True
+
+    def _threshold(self, pathname: str) -> int:
+        module = os.path.splitext(os.path.relpath(pathname, _ROOT))[0].replace(os.sep, ".")
+        for prefix, level in self.module_levels:
+            if module == prefix or module.startswith(prefix + "."):
+                return level
+        return self.default_level
+
+
+class LazyQueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler без форматирования в вызывающем потоке: очередь живёт в том
+    же процессе, поэтому запись передаётся слушателю как есть.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+class LogPipeline:
+    """Очередь записей и фоновый поток, пишущий их в обработчики."""
+
+    def __init__(self, handlers: List[logging.Handler]):
+        self.handlers = handlers
+        self.queue_handler = LazyQueueHandler(queue.SimpleQueue())
+        self._listener: Optional[logging.handlers.QueueListener] = None
+        self.start()
+        atexit.register(self.stop)
+        # После fork (prefork-пул Celery) поток слушателя в дочернем процессе не существует
+        os.register_at_fork(after_in_child=self._restart_in_child)
+
+    def start(self) -> None:
+        self._listener = logging.handlers.QueueListener(self.queue_handler.queue, *self.handlers,
+                                                        respect_handler_level=True)
+        self._listener.start()
+
+    def stop(self) -> None:
+        """Дописывает накопленные записи и останавливает фоновый поток."""
+        if self._listener is not None:
+            self._listener.stop()
+            self._listener = None
+
+    def _restart_in_child(self) -> None:
+        self.queue_handler.queue = queue.SimpleQueue()
+        self.start()
+
+
+def configure(logger: logging.Logger, handlers: List[logging.Handler], level: str = "INFO",
+              levels: str = "", log_format: str = "json", debug_sample: int = 1,
+              text_format: str = "[%(log_id)s:%(asctime)s - %(levelname)s - %(message)s]") -> LogPipeline:
+    """
+    Подключает к logger конвейер: фильтр уровней по модулям, очередь и
+    фоновую запись в handlers в формате json или text. Уровни сторонних
+    логгеров из levels выставляются им напрямую.
+    """
+    default_level = logging.getLevelName(level.upper())
+    module_levels = parse_levels(levels)
+    app_levels = {}
+    for name, module_level in module_levels.items():
+        if name.split(".")[0] in ("ai_worker", "fastapi_api", "telegram_bot"):
+            app_levels[name] = module_level
+        else:
+            logging.getLogger(name).setLevel(module_level)
+    formatter = JsonFormatter() if log_format == "json" else logging.Formatter(text_format)
+    for handler in handlers:
+        handler.setFormatter(formatter)
+    pipeline = LogPipeline(handlers)
+    logger.handlers.clear()
+    logger.addHandler(pipeline.queue_handler)
+    # Логгер отсекает записи ниже самого низкого из порогов, фильтр — ниже порога модуля
+    logger.setLevel(min([default_level, *app_levels.values()]))
+    logger.addFilter(ModuleLevelFilter(default_level, app_levels, debug_sample))
+    logger.propagate = False
+    return pipeline
@@ -1,25 +1,16 @@
 import logging
 import logging.handlers
 import os
-from typing import Optional
 
-
-class LogIdFilter(logging.Filter):
-    def __init__(self):
-        super().__init__()
-        self.log_id: Optional[str] = None
-
-    def filter(self, record):
-        record.log_id = self.log_id or "no-id"
-        return True
+from fastapi_api.app.core.config import LOG_LEVEL, LOG_LEVELS, LOG_FORMAT, LOG_DEBUG_SAMPLE
+from fastapi_api.app.utils.correlation import LogIdFilter
+from fastapi_api.app.utils.log_pipeline import configure
 
 
 def setup_logger():
     logger = logging.getLogger("ai_assistant")
-    logger.setLevel(logging.INFO)
-    formatter = logging.Formatter("Log: [%(log_id)s:%(asctime)s - %(levelname)s - %(message)s]")
 
-    # Handler только для файла
+    # Handler только для файла; запись в него идёт из фонового потока
     os.makedirs("logs", exist_ok=True)
     file_handler = logging.handlers.RotatingFileHandler(
         "logs/info.log",
@@ -27,13 +18,13 @@ def setup_logger():
         backupCount=10,
         encoding="utf-8"
     )
-    file_handler.setFormatter(formatter)
+    configure(logger, [file_handler], level=LOG_LEVEL, levels=LOG_LEVELS,
+              log_format=LOG_FORMAT, debug_sample=LOG_DEBUG_SAMPLE,
+              text_format="Log: [%(log_id)s:%(asctime)s - %(levelname)s - %(message)s]")
 
-    # Фильтр для log_id
-    log_id_filter = LogIdFilter()
-    logger.addFilter(log_id_filter)
-    logger.addHandler(file_handler)
+    # Фильтр для log_id из contextvar (выполняется в вызывающем потоке, до очереди)
+    logger.addFilter(LogIdFilter())
 
-    return logger, log_id_filter
+    return logger
 
-logger, log_id_filter = setup_logger()
\ No newline at end of file
+logger = setup_logger()
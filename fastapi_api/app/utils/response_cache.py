@@ -0,0 +1,74 @@
+"""Общие функции кэша ответов модели (используются API и воркером)"""
+import base64
+import hashlib
+import json
+import math
+import re
+import struct
+import unicodedata
+import zlib
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+
+from fastapi_api.app.core.config import (RESPONSE_CACHE_PREFIX, RESPONSE_CACHE_MAX_PROMPT_CHARS,
+                                         RESPONSE_CACHE_MAX_TEMPERATURE)
+
+EMBEDDING_DIMS = 128
+
+ENTRY_PREFIX = f"{RESPONSE_CACHE_PREFIX}entry:"
+LRU_KEY = f"{RESPONSE_CACHE_PREFIX}lru"
+VECTORS_KEY = f"{RESPONSE_CACHE_PREFIX}vectors"
+STATS_KEY = f"{RESPONSE_CACHE_PREFIX}stats"
+
+_whitespace = re.compile(r"\s+")
+
+
+def normalize_prompt(prompt: str) -> str:
+    """Приводит промпт к каноническому виду: регистр, пробелы, крайняя пунктуация."""
+    text = unicodedata.normalize("NFKC", prompt).casefold()
+    return _whitespace.sub(" ", text).strip(" .,!?;:…")
+
+
+def is_cacheable(prompt: str, params: Dict[str, Any]) -> bool:
+    """
+    Решает, можно ли кэшировать ответ: промпт должен быть коротким, а генерация —
+    жадной или с семплированием при температуре не выше порога.
+    """
+    if len(prompt) > RESPONSE_CACHE_MAX_PROMPT_CHARS:
+        return False
+    if not params.get("do_sample"):
+        return True
+    return params.get("temperature", 1.0) <= RESPONSE_CACHE_MAX_TEMPERATURE
+
+
+def cache_key(prompt: str, model_name: str, params: Dict[str, Any]) -> str:
+    """Ключ записи: хэш нормализованного промпта, модели и параметров генерации."""
+    payload = json.dumps([normalize_prompt(prompt), model_name, params], sort_keys=True,
+                         ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def embed_prompt(prompt: str) -> List[float]:
+    """
+    Лёгкое векторное представление промпта: хэшированные символьные триграммы,
+    нормированные по L2. Не требует модели и одинаково во всех процессах.
+    """
+    text = f"  {normalize_prompt(prompt)}  "
+    vector = [0.0] * EMBEDDING_DIMS
+    for i in range(len(text) - 2):
+        vector[zlib.crc32(text[i:i + 3].encode("utf-8")) % EMBEDDING_DIMS] += 1.0
+    norm = math.sqrt(sum(value * value for value in vector)) or 1.0
+    return [value / norm for value in vector]
+
+
+def pack_vector(vector: List[float]) -> str:
+    """Компактно сериализует вектор для хранения в Redis."""
+    return base64.b64encode(struct.pack(f"{EMBEDDING_DIMS}f", *vector)).decode("ascii")
+
+
+def unpack_vectors(packed: Dict[str, str]) -> Tuple[List[str], np.ndarray]:
+    """Ключи и матрица векторов (строка на ключ), сериализованных pack_vector."""
+    keys = list(packed)
+    raw = b"".join(base64.b64decode(packed[key]) for key in keys)
+    return keys, np.frombuffer(raw, dtype=np.float32).reshape(len(keys), EMBEDDING_DIMS)
@@ -0,0 +1,129 @@
+"""
+Общие ключи и скрипты планировщика задач чата (используются API и воркером).
+
+Задачи лежат в Redis по полосам приоритета, внутри полосы — в очереди
+каждого пользователя. В Celery уходит только «тик» в очередь полосы; воркер,
+получив тик, забирает из полосы следующую задачу по алгоритму Deficit Round
+Robin, поэтому один пользователь не может занять всю очередь.
+
+Очереди пользователей хранятся в хэшах полосы (задачи по полям
+«пользователь:номер», номера головы и хвоста очереди), а не в отдельных
+ключах: скрипты получают все свои ключи через KEYS, и благодаря общему
+хэш-тегу {полоса} ключи полосы лежат в одном слоте Redis Cluster.
+"""
+from typing import List
+
+from fastapi_api.app.core.config import SCHEDULER_KEY_PREFIX
+
+# Полосы в порядке приоритета: воркер всегда сначала опрашивает первую
+LANES: List[str] = ["premium", "short", "default"]
+# Счётчики завершённых задач по секундам: по ним API оценивает пропускную способность
+# (общий хэш-тег: MGET окна не пересекает слоты Redis Cluster)
+COMPLETED_KEY_PREFIX = f"{SCHEDULER_KEY_PREFIX}{{completed}}:"
+COMPLETED_TTL = 600
+
+
+def lane_queue(lane: str) -> str:
+    """Имя очереди Celery полосы."""
+    return f"chat.{lane}"
+
+
+def lane_key(lane: str, name: str) -> str:
+    """
+    Ключ Redis полосы: active, deficit, credited, stats, waits, claimed,
+    tasks, heads или tails.
+    """
+    return f"{SCHEDULER_KEY_PREFIX}{{{lane}}}:{name}"
+
+
+def enqueue_keys(lane: str) -> List[str]:
+    """KEYS для ENQUEUE_SCRIPT."""
+    return [lane_key(lane, name) for name in ("tasks", "heads", "tails", "active", "stats")]
+
+
+def claim_keys(lane: str) -> List[str]:
+    """KEYS для CLAIM_SCRIPT."""
+    return [lane_key(lane, name) for name in ("active", "deficit", "credited", "stats", "waits",
+                                              "claimed", "tasks", "heads", "tails")]
+
+
+# KEYS: enqueue_keys — задачи, головы и хвосты очередей, кольцо активных пользователей,
+#       статистика полосы
+# ARGV: id пользователя, задача (JSON), стоимость задачи
+ENQUEUE_SCRIPT = """
+local time = redis.call('TIME')
+local now = tonumber(time[1]) * 1000 + math.floor(tonumber(time[2]) / 1000)
+local tail = redis.call('HINCRBY', KEYS[3], ARGV[1], 1)
+redis.call('HSET', KEYS[1], ARGV[1] .. ':' .. tail,
+           cjson.encode({enqueued_at = now, cost = tonumber(ARGV[3]), task = ARGV[2]}))
+-- Очередь была пуста: пользователь встаёт в конец круга
+if redis.call('HSETNX', KEYS[2], ARGV[1], tail) == 1 then
+    redis.call('RPUSH', KEYS[4], ARGV[1])
+end
+redis.call('HINCRBY', KEYS[5], 'enqueued', 1)
+return redis.call('HINCRBY', KEYS[5], 'depth', 1)
+"""
+
+# KEYS: claim_keys — кольцо активных пользователей, дефициты, пользователь, получивший
+#       квант на текущем круге, статистика полосы, последние ожидания, захваченные
+#       задачи, задачи, головы и хвосты очередей
+# ARGV: квант (больше 0), id тика, число хранимых ожиданий
+# Повторная доставка тика (воркер упал) возвращает ту же задачу.
+CLAIM_SCRIPT = """
+local claimed = redis.call('HGET', KEYS[6], ARGV[2])
+if claimed then
+    return claimed
+end
+local quantum = tonumber(ARGV[1])
+if not quantum or quantum <= 0 then
+    return redis.error_reply('quantum must be positive')
+end
+local function leave(user)
+    redis.call('LPOP', KEYS[1])
+    redis.call('HDEL', KEYS[2], user)
+    redis.call('HDEL', KEYS[8], user)
+    redis.call('HDEL', KEYS[9], user)
+    redis.call('DEL', KEYS[3])
+end
+while true do
+    local user = redis.call('LINDEX', KEYS[1], 0)
+    if not user then
+        return false
+    end
+    local head = tonumber(redis.call('HGET', KEYS[8], user))
+    local field = head and user .. ':' .. head
+    local raw = field and redis.call('HGET', KEYS[7], field)
+    if not raw then
+        leave(user)
+    else
+        local entry = cjson.decode(raw)
+        local deficit = tonumber(redis.call('HGET', KEYS[2], user) or '0')
+        if redis.call('GET', KEYS[3]) ~= user then
+            deficit = deficit + quantum
+            redis.call('SET', KEYS[3], user)
+        end
+        if deficit >= entry.cost then
+            redis.call('HDEL', KEYS[7], field)
+            if head >= tonumber(redis.call('HGET', KEYS[9], user)) then
+                leave(user)
+            else
+                redis.call('HSET', KEYS[8], user, head + 1)
+                redis.call('HSET', KEYS[2], user, deficit - entry.cost)
+            end
+            local time = redis.call('TIME')
+            local wait = tonumber(time[1]) * 1000 + math.floor(tonumber(time[2]) / 1000) - entry.enqueued_at
+            redis.call('HINCRBY', KEYS[4], 'depth', -1)
+            redis.call('HINCRBY', KEYS[4], 'claimed', 1)
+            redis.call('HINCRBY', KEYS[4], 'wait_ms_sum', wait)
+            redis.call('LPUSH', KEYS[5], wait)
+            redis.call('LTRIM', KEYS[5], 0, tonumber(ARGV[3]) - 1)
+            redis.call('HSET', KEYS[6], ARGV[2], entry.task)
+            return entry.task
+        end
+        -- Кванта не хватило: пользователь уходит в конец круга с накопленным дефицитом
+        redis.call('HSET', KEYS[2], user, deficit)
+        redis.call('DEL', KEYS[3])
+        redis.call('LMOVE', KEYS[1], KEYS[1], 'LEFT', 'RIGHT')
+    end
+end
+"""
@@ -0,0 +1,131 @@
+"""
+Трассировка задачи чата по этапам в API и воркере (используется обоими).
+
+API открывает трассу на запрос POST /api/chat и передаёт её контекст
+воркеру: в заголовке trace задачи Celery (очередь fifo) или в JSON задачи
+планировщика (полосы fair, где тик не привязан к задаче). Каждый процесс
+копит завершённые спаны своей части трассы в памяти и выгружает их одним
+пакетом в конце: в Redis (список трассы с ограниченной длиной и TTL, его
+читает /api/debug/traces/{task_id}) или в JSONL-файл.
+"""
+import json
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import asdict, dataclass, field
+from typing import Any, Dict, Iterator, List, Optional
+from uuid import uuid4
+
+from fastapi_api.app.core.config import TRACE_KEY_PREFIX
+
+# Ключ со списком спанов трассы и ключ с id трассы задачи
+TASK_TRACE_KEY_PREFIX = f"{TRACE_KEY_PREFIX}task:"
+
+
+def trace_key(trace_id: str) -> str:
+    return f"{TRACE_KEY_PREFIX}{trace_id}"
+
+
+def task_trace_key(task_id: str) -> str:
+    return f"{TASK_TRACE_KEY_PREFIX}{task_id}"
+
+
+def new_id() -> str:
+    return uuid4().hex[:16]
+
+
+@dataclass
+class Span:
+    """Завершённый этап: время начала (unix, секунды) и длительность, мс."""
+    name: str
+    service: str
+    span_id: str
+    parent_id: Optional[str]
+    start: float
+    duration_ms: float
+    attrs: Dict[str, Any] = field(default_factory=dict)
+
+
+@dataclass
+class Trace:
+    """Часть трассы, записанная текущим процессом."""
+    trace_id: str
+    service: str
+    parent_id: Optional[str] = None
+    spans: List[Span] = field(default_factory=list)
+
+    def context(self, **extra: Any) -> Dict[str, Any]:
+        """Контекст для передачи трассы следующему процессу."""
+        return {"trace_id": self.trace_id, "parent_id": _current_span.get() or self.parent_id,
+                **extra}
+
+    def encoded_spans(self) -> List[str]:
+        return [json.dumps({"trace_id": self.trace_id, **asdict(span)}, ensure_ascii=False,
+                           default=str)
+                for span in self.spans]
+
+
+_current_trace: ContextVar[Optional[Trace]] = ContextVar("current_trace", default=None)
+_current_span: ContextVar[Optional[str]] = ContextVar("current_span", default=None)
+
+
+def current_trace() -> Optional[Trace]:
+    return _current_trace.get()
+
+
+@contextmanager
+def start_trace(service: str, context: Optional[Dict[str, Any]] = None) -> Iterator[Trace]:
+    """
+    Делает трассу текущей на время блока: новую, если context не передан,
+    иначе продолжение трассы из context (её спаны станут дочерними parent_id).
+    """
+    trace = Trace(trace_id=context["trace_id"] if context else uuid4().hex, service=service,
+                  parent_id=context.get("parent_id") if context else None)
+    trace_token = _current_trace.set(trace)
+    span_token = _current_span.set(None)
+    try:
+        yield trace
+    finally:
+        _current_span.reset(span_token)
+        _current_trace.reset(trace_token)
+
+
+@contextmanager
+def span(name: str, **attrs: Any) -> Iterator[Dict[str, Any]]:
+    """
+    Замеряет этап name текущей трассы. Блок получает словарь атрибутов спана
+    и может дополнить его. Без текущей трассы ничего не записывает.
+    """
+    trace = _current_trace.get()
+    if trace is None:
+        yield attrs
+        return
+    span_id = new_id()
+    parent_id = _current_span.get() or trace.parent_id
+    token = _current_span.set(span_id)
+    start = time.time()
+    started = time.perf_counter()
+    try:
+        yield attrs
+    except BaseException as e:
+        attrs["error"] = type(e).__name__
+        raise
+    finally:
+        _current_span.reset(token)
+        trace.spans.append(Span(name, trace.service, span_id, parent_id, start,
+                                round((time.perf_counter() - started) * 1000, 3), attrs))
+
+
+def record_span(name: str, start: float, end: float, **attrs: Any) -> None:
+    """Записывает этап с заранее известными границами (например, ожидание в очереди)."""
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.spans.append(Span(name, trace.service, new_id(), _current_span.get() or trace.parent_id,
+                                start, round(max(0.0, end - start) * 1000, 3), attrs))
+
+
+def write_spans_file(path: str, trace: Trace) -> None:
+    """Дописывает спаны трассы в JSONL-файл (по строке на спан)."""
+    with open(path, "a", encoding="utf-8") as file:
+        for line in trace.encoded_spans():
+            file.write(line + "\n")
@@ -0,0 +1,75 @@
+"""
+Бенчмарк задержки POST /api/chat.
+
+Запросы выполняются в процессе через ASGI-транспорт httpx, поэтому замер
+включает только обработку в API и обращения к PostgreSQL из DATABASE_URL.
+С флагом --no-broker отправка задачи в Celery отключается, чтобы измерять
+только работу с БД. Запуск из корня репозитория:
+    python -m fastapi_api.benchmarks.chat_latency --requests 500 --no-broker
+"""
+import argparse
+import asyncio
+import statistics
+import time
+from typing import List
+
+import httpx
+from sqlalchemy import select
+
+from fastapi_api.app.db.database import async_session_maker, async_engine
+from fastapi_api.app.db.models import User
+from fastapi_api.app.main import app
+from fastapi_api.app.worker.main import celery_app
+
+
+async def ensure_user() -> int:
+    """Возвращает id пользователя для бенчмарка, создавая его при необходимости."""
+    async with async_session_maker() as db:
+        user = (await db.execute(select(User).filter_by(telegram_id="benchmark"))).scalars().first()
+        if user is None:
+            user = User(telegram_id="benchmark", username="benchmark")
+            db.add(user)
+            await db.commit()
+        return user.id
+
+
+async def run(total: int, concurrency: int) -> List[float]:
+    user_id = await ensure_user()
+    latencies: List[float] = []
+    semaphore = asyncio.Semaphore(concurrency)
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://benchmark") as client:
+        async def one(index: int) -> None:
+            async with semaphore:
+                started = time.perf_counter()
+                # Уникальный текст, чтобы не попадать в кэш ответов
+                response = await client.post("/api/chat", json={
+                    "user_id": user_id, "message": f"benchmark message {index} {time.time()}"
+                })
+                latencies.append((time.perf_counter() - started) * 1000)
+                response.raise_for_status()
+
+        await asyncio.gather(*(one(index) for index in range(total)))
+    await async_engine.dispose()
+    return sorted(latencies)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=1)
+    parser.add_argument("--no-broker", action="store_true",
+                        help="не отправлять задачи в Celery")
+    args = parser.parse_args()
+
+    if args.no_broker:
+        celery_app.send_task = lambda *task_args, **task_kwargs: None
+    latencies = asyncio.run(run(args.requests, args.concurrency))
+    print(f"POST /api/chat, {args.requests} запросов, параллельность {args.concurrency}")
+    print(f"p50: {statistics.median(latencies):.2f} ms")
+    print(f"p95: {latencies[int(len(latencies) * 0.95) - 1]:.2f} ms")
+    print(f"p99: {latencies[int(len(latencies) * 0.99) - 1]:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
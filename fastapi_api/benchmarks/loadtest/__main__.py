@@ -0,0 +1,98 @@
+"""
+Нагрузочный прогон конвейера чата: POST /api/chat → очередь → воркер → статус.
+
+Сообщения из JSONL-файла (поле --field) отправляются в открытом цикле
+(--rate запросов в секунду независимо от скорости обработки) или в
+закрытом (--concurrency клиентов, каждый ждёт завершения своей задачи).
+Каждая задача отслеживается через GET /api/status/{task_id}; отчёт содержит
+p50/p95/p99 этапов enqueue, queue_wait, inference и total и пишется в JSON
+(--output), а с --baseline выводится сравнение с прошлым прогоном.
+С --local API, воркер с заглушкой модели, Redis и PostgreSQL поднимаются
+локально (см. stack.py). Запуск из корня репозитория:
+    python -m fastapi_api.benchmarks.loadtest --local --concurrency 8 --requests 200
+    python -m fastapi_api.benchmarks.loadtest --url http://localhost:8000 \\
+        --redis-url redis://localhost:6379/0 --rate 5 --workload chat.jsonl --output run.json
+"""
+import argparse
+import asyncio
+import sys
+import time
+
+from fastapi_api.benchmarks.loadtest.report import (build_report, format_report, load_report,
+                                                    write_report)
+from fastapi_api.benchmarks.loadtest.runner import LoadRunner
+from fastapi_api.benchmarks.loadtest.stack import LocalStack
+from fastapi_api.benchmarks.loadtest.workload import load_workload
+
+
+async def run(args, base_url: str, redis_url: str) -> dict:
+    records = load_workload(args.workload, args.field)
+    total = args.requests or len(records)
+    async with LoadRunner(base_url, redis_url, timeout=args.timeout, unique=args.unique) as runner:
+        await runner.ensure_users(args.users)
+        started = time.monotonic()
+        if args.rate:
+            samples = await runner.open_loop(records, total, args.rate, args.max_in_flight,
+                                             poisson=not args.uniform)
+        else:
+            samples = await runner.closed_loop(records, total, args.concurrency)
+        duration = time.monotonic() - started
+    config = {
+        "mode": "open" if args.rate else "closed",
+        "rate": args.rate,
+        "concurrency": None if args.rate else args.concurrency,
+        "requests": total,
+        "users": args.users,
+        "workload": args.workload,
+        "local": args.local,
+    }
+    return build_report(samples, duration, config, include_samples=args.samples)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://localhost:8000", help="адрес API")
+    parser.add_argument("--redis-url", help="Redis для замера queue_wait и inference по потокам задач")
+    parser.add_argument("--database-url", help="PostgreSQL для --local вместо временного кластера")
+    parser.add_argument("--local", action="store_true",
+                        help="поднять API, воркер с заглушкой модели, Redis и PostgreSQL локально")
+    parser.add_argument("--workload", help="JSONL-файл с сообщениями (по умолчанию встроенные промпты)")
+    parser.add_argument("--field", default="message")
+    parser.add_argument("--requests", type=int, default=0,
+                        help="число запросов (по умолчанию — по одному на строку нагрузки)")
+    parser.add_argument("--users", type=int, default=10,
+                        help="пользователей, между которыми распределяются сообщения без user_id")
+    parser.add_argument("--concurrency", type=int, default=4, help="клиентов в закрытом цикле")
+    parser.add_argument("--rate", type=float, default=0,
+                        help="запросов в секунду в открытом цикле (0 — закрытый цикл)")
+    parser.add_argument("--uniform", action="store_true",
+                        help="равные интервалы вместо пуассоновского потока")
+    parser.add_argument("--max-in-flight", type=int, default=0,
+                        help="предел незавершённых запросов в открытом цикле (0 — без предела)")
+    parser.add_argument("--unique", action="store_true",
+                        help="добавлять к сообщениям метку, чтобы не попадать в кэш ответов")
+    parser.add_argument("--timeout", type=float, default=300, help="ожидание одной задачи, секунды")
+    parser.add_argument("--output", help="куда записать отчёт в JSON")
+    parser.add_argument("--samples", action="store_true", help="включить в отчёт замеры каждого запроса")
+    parser.add_argument("--baseline", help="отчёт прошлого прогона для сравнения")
+    args = parser.parse_args()
+
+    stack = None
+    base_url, redis_url = args.url, args.redis_url
+    if args.local:
+        stack = LocalStack(args.redis_url, args.database_url)
+        base_url = stack.start()
+        redis_url = stack.redis_url
+        print(f"Локальный стенд: {base_url}, логи в {stack.workdir}", file=sys.stderr)
+    try:
+        report = asyncio.run(run(args, base_url, redis_url))
+    finally:
+        if stack is not None:
+            stack.stop()
+    print(format_report(report, load_report(args.baseline) if args.baseline else None))
+    if args.output:
+        write_report(report, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""Сводка прогона: перцентили по этапам, JSON для сравнения между прогонами"""
+import json
+from collections import Counter
+from dataclasses import asdict
+from typing import Dict, List, Optional
+
+from fastapi_api.benchmarks.loadtest.runner import Sample
+
+STAGES = ("enqueue", "queue_wait", "inference", "total")
+PERCENTILES = (50, 95, 99)
+
+
+def percentile(values: List[float], q: float) -> float:
+    """Перцентиль q (0–100) отсортированного списка, с линейной интерполяцией."""
+    position = (len(values) - 1) * q / 100
+    lower = int(position)
+    upper = min(lower + 1, len(values) - 1)
+    return values[lower] + (values[upper] - values[lower]) * (position - lower)
+
+
+def stage_stats(samples: List[Sample], stage: str) -> Optional[Dict[str, float]]:
+    """Перцентили, среднее и максимум этапа stage, мс (None, если замеров нет)."""
+    values = sorted(getattr(sample, stage) * 1000 for sample in samples
+                    if getattr(sample, stage) is not None)
+    if not values:
+        return None
+    stats = {f"p{q}": round(percentile(values, q), 2) for q in PERCENTILES}
+    stats["mean"] = round(sum(values) / len(values), 2)
+    stats["max"] = round(values[-1], 2)
+    stats["count"] = len(values)
+    return stats
+
+
+def build_report(samples: List[Sample], duration: float, config: dict,
+                 include_samples: bool = False) -> dict:
+    """
+    Собирает отчёт прогона. Этапы считаются по задачам, дошедшим до воркера
+    (completed и failed); enqueue — по всем принятым API запросам.
+    """
+    outcomes = Counter(sample.outcome for sample in samples)
+    processed = [sample for sample in samples if sample.outcome in ("completed", "failed")]
+    latency = {stage: stage_stats(processed, stage) for stage in STAGES}
+    latency["enqueue"] = stage_stats([sample for sample in samples if sample.outcome != "error"],
+                                     "enqueue")
+    report = {
+        "config": config,
+        "duration_s": round(duration, 3),
+        "requests": len(samples),
+        "outcomes": dict(outcomes),
+        "throughput_rps": round(len(processed) / duration, 3) if duration else 0.0,
+        "latency_ms": latency,
+    }
+    if include_samples:
+        report["samples"] = [asdict(sample) for sample in samples]
+    return report
+
+
+def write_report(report: dict, path: str) -> None:
+    with open(path, "w", encoding="utf-8") as file:
+        json.dump(report, file, ensure_ascii=False, indent=2)
+
+
+def load_report(path: str) -> dict:
+    with open(path, "r", encoding="utf-8") as file:
+        return json.load(file)
+
+
+def format_report(report: dict, baseline: Optional[dict] = None) -> str:
+    """
+    Таблица перцентилей по этапам. С baseline рядом с каждым значением
+    выводится изменение относительно прошлого прогона, %.
+    """
+    outcomes = ", ".join(f"{name}: {count}" for name, count in sorted(report["outcomes"].items()))
+    lines = [
+        f"{report['requests']} запросов за {report['duration_s']:.1f} с, "
+        f"{report['throughput_rps']:.2f} задач/с ({outcomes})",
+        f"{'stage, ms':>12}" + "".join(f"{f'p{q}':>18}" for q in PERCENTILES),
+    ]
+    for stage in STAGES:
+        stats = report["latency_ms"].get(stage)
+        if stats is None:
+            lines.append(f"{stage:>12}" + f"{'—':>18}" * len(PERCENTILES))
+            continue
+        old = (baseline or {}).get("latency_ms", {}).get(stage) or {}
+        cells = []
+        for q in PERCENTILES:
+            value = stats[f"p{q}"]
+            cell = f"{value:.1f}"
+            if old.get(f"p{q}"):
+                cell += f" ({(value / old[f'p{q}'] - 1) * 100:+.0f}%)"
+            cells.append(f"{cell:>18}")
+        lines.append(f"{stage:>12}" + "".join(cells))
+    return "\n".join(lines)
@@ -0,0 +1,194 @@
+"""Прогон нагрузки против POST /api/chat в открытом и закрытом цикле"""
+import asyncio
+import random
+import time
+from dataclasses import dataclass
+from typing import List, Optional
+from uuid import uuid4
+
+import httpx
+from redis import asyncio as aioredis
+
+from fastapi_api.app.core.config import STREAM_KEY_PREFIX
+from fastapi_api.benchmarks.loadtest.workload import Record
+
+FINAL_STATUSES = ("completed", "failed", "cancelled")
+USER_PREFIX = "loadtest-"
+
+
+@dataclass
+class Sample:
+    """
+    Результат одного запроса. outcome: completed, failed, cached (ответ из
+    кэша без воркера), rejected (429), error или timeout. Длительности этапов
+    в секундах: enqueue — POST /api/chat, queue_wait — от ответа POST до
+    начала обработки воркером, inference — обработка воркером, total — от
+    отправки POST до получения итогового статуса клиентом.
+    """
+    outcome: str
+    http_status: Optional[int] = None
+    task_id: Optional[str] = None
+    enqueue: Optional[float] = None
+    queue_wait: Optional[float] = None
+    inference: Optional[float] = None
+    total: Optional[float] = None
+
+
+class LoadRunner:
+    """
+    Отправляет сообщения в POST /api/chat и отслеживает каждую задачу через
+    GET /api/status/{task_id} с long-poll. Если доступен Redis, время начала
+    и конца обработки берётся из идентификаторов событий start и done потока
+    задачи (часы Redis приводятся к локальным по команде TIME).
+    """
+
+    def __init__(self, base_url: str, redis_url: Optional[str] = None,
+                 timeout: float = 300, poll_wait: float = 30, unique: bool = False):
+        self.base_url = base_url
+        self.redis_url = redis_url
+        self.timeout = timeout
+        self.poll_wait = poll_wait
+        self.unique = unique
+        self.users: List[int] = []
+        self.clock_offset = 0.0
+        self._client: Optional[httpx.AsyncClient] = None
+        self._redis = None
+
+    async def __aenter__(self) -> "LoadRunner":
+        limits = httpx.Limits(max_connections=None, max_keepalive_connections=100)
+        self._client = httpx.AsyncClient(base_url=self.base_url, limits=limits,
+                                         timeout=self.poll_wait + 30)
+        if self.redis_url:
+            self._redis = aioredis.from_url(self.redis_url, decode_responses=True)
+            before = time.time()
+            seconds, microseconds = await self._redis.time()
+            self.clock_offset = seconds + microseconds / 1e6 - (before + time.time()) / 2
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self._client.aclose()
+        if self._redis is not None:
+            await self._redis.aclose()
+
+    async def ensure_users(self, count: int) -> List[int]:
+        """Создаёт (или находит) count пользователей нагрузки и возвращает их id."""
+        self.users = []
+        for index in range(count):
+            telegram_id = f"{USER_PREFIX}{index}"
+            response = await self._client.post("/api/users/", json={
+                "telegram_id": telegram_id, "username": telegram_id
+            })
+            if response.status_code == 400:
+                response = await self._client.get(f"/api/users/telegram/{telegram_id}")
+            response.raise_for_status()
+            self.users.append(response.json()["id"])
+        return self.users
+
+    async def send(self, index: int, record: Record) -> Sample:
+        """Отправляет одно сообщение и ждёт завершения его задачи."""
+        user_id = record.user_id if record.user_id is not None else self.users[index % len(self.users)]
+        message = f"{record.message} [{uuid4().hex[:8]}]" if self.unique else record.message
+        started = time.time()
+        try:
+            response = await self._client.post("/api/chat", json={"user_id": user_id,
+                                                                   "message": message})
+        except httpx.HTTPError:
+            return Sample("error")
+        enqueued = time.time()
+        sample = Sample("error", response.status_code, enqueue=enqueued - started)
+        if response.status_code == 429:
+            sample.outcome = "rejected"
+            return sample
+        if response.status_code != 200:
+            return sample
+        task = response.json()
+        sample.task_id = task["task_id"]
+        if task["status"] == "completed":
+            sample.outcome = "cached"
+            sample.total = sample.enqueue
+            return sample
+
+        deadline = started + self.timeout
+        task_status = task["status"]
+        while task_status not in FINAL_STATUSES:
+            wait = min(self.poll_wait, deadline - time.time())
+            if wait <= 0:
+                sample.outcome = "timeout"
+                return sample
+            try:
+                response = await self._client.get(f"/api/status/{sample.task_id}",
+                                                  params={"wait": round(wait, 3)})
+                response.raise_for_status()
+            except httpx.HTTPError:
+                return sample
+            task_status = response.json()["status"]
+        sample.total = time.time() - started
+        sample.outcome = task_status
+        await self._stage_times(sample, enqueued)
+        return sample
+
+    async def _stage_times(self, sample: Sample, enqueued: float) -> None:
+        if self._redis is None:
+            return
+        key = f"{STREAM_KEY_PREFIX}{sample.task_id}"
+        first = await self._redis.xrange(key, count=1)
+        last = await self._redis.xrevrange(key, count=1)
+        if not first or first[0][1].get("event") != "start":
+            return
+        start = self._event_time(first[0][0])
+        finish = self._event_time(last[0][0])
+        sample.queue_wait = max(0.0, start - enqueued)
+        sample.inference = finish - start
+
+    def _event_time(self, entry_id: str) -> float:
+        return int(entry_id.split("-")[0]) / 1000 - self.clock_offset
+
+    async def closed_loop(self, records: List[Record], total: int,
+                          concurrency: int) -> List[Sample]:
+        """
+        Закрытый цикл: concurrency клиентов, каждый отправляет следующее
+        сообщение только после завершения предыдущей задачи.
+        """
+        samples: List[Sample] = []
+        counter = iter(range(total))
+
+        async def client() -> None:
+            for index in counter:
+                samples.append(await self.send(index, records[index % len(records)]))
+
+        await asyncio.gather(*(client() for _ in range(concurrency)))
+        return samples
+
+    async def open_loop(self, records: List[Record], total: int, rate: float,
+                        max_in_flight: int = 0, poisson: bool = True) -> List[Sample]:
+        """
+        Открытый цикл: сообщения поступают с частотой rate в секунду независимо
+        от скорости обработки (пуассоновский поток или равные интервалы).
+        Если max_in_flight > 0, запросы сверх этого числа незавершённых
+        не отправляются и учитываются как error.
+        """
+        tasks = []
+        in_flight = 0
+
+        async def tracked(index: int) -> Sample:
+            nonlocal in_flight
+            in_flight += 1
+            try:
+                return await self.send(index, records[index % len(records)])
+            finally:
+                in_flight -= 1
+
+        async def dropped() -> Sample:
+            return Sample("error")
+
+        next_at = time.monotonic()
+        for index in range(total):
+            delay = next_at - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            if max_in_flight and in_flight >= max_in_flight:
+                tasks.append(asyncio.create_task(dropped()))
+            else:
+                tasks.append(asyncio.create_task(tracked(index)))
+            next_at += random.expovariate(rate) if poisson else 1 / rate
+        return list(await asyncio.gather(*tasks))
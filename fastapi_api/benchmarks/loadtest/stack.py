@@ -0,0 +1,159 @@
+"""
+Локальный стенд для прогона без внешних сервисов.
+
+Временные Redis (redis-server из PATH или из пакета redislite) и PostgreSQL
+(пакет pgserver) запускаются без записи на диск за пределами рабочего
+каталога; оба пакета нужны только для стенда и ставятся отдельно:
+pip install redislite pgserver. API (uvicorn) и воркер Celery
+запускаются подпроцессами; воркер по умолчанию использует заглушку модели
+(MODEL_BACKEND=stub), поэтому веса и сеть не нужны. Переменные окружения
+прогона передаются API и воркеру, так что настройки (CHAT_SCHEDULING,
+STUB_TOKEN_MS, BATCH_MAX_SIZE и т. д.) задаются как обычно.
+"""
+import asyncio
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List, Optional
+
+import httpx
+import redis
+
+from fastapi_api.app.core.config import METRICS_KEY_PREFIX
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+# Значения по умолчанию для стенда; заданные в окружении переменные важнее
+STACK_DEFAULTS = {
+    "MODEL_BACKEND": "stub",
+    "RATE_LIMIT_PER_MINUTE": "0",
+    "WORKER_POOL": "threads",
+    "WORKER_CONCURRENCY": "4",
+}
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def create_schema(database_url: str) -> None:
+    """Создаёт таблицы приложения, если их ещё нет."""
+    from sqlalchemy.ext.asyncio import create_async_engine
+    from fastapi_api.app.db.models import Base
+
+    engine = create_async_engine(database_url)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    await engine.dispose()
+
+
+class LocalStack:
+    """
+    Поднимает Redis, PostgreSQL, API и воркер. Уже работающие Redis и
+    PostgreSQL можно передать через redis_url и database_url — тогда
+    соответствующая замена не запускается.
+    """
+
+    def __init__(self, redis_url: Optional[str] = None, database_url: Optional[str] = None,
+                 workdir: Optional[str] = None):
+        self.redis_url = redis_url
+        self.database_url = database_url
+        self.workdir = workdir or tempfile.mkdtemp(prefix="loadtest-")
+        self.base_url = ""
+        self._postgres = None
+        self._processes: List[subprocess.Popen] = []
+
+    def start(self) -> str:
+        """Запускает стенд и возвращает адрес API."""
+        if self.redis_url is None:
+            self.redis_url = self._start_redis()
+        if self.database_url is None:
+            self.database_url = self._start_postgres()
+        asyncio.run(create_schema(self.database_url))
+        env = {**STACK_DEFAULTS, **os.environ,
+               "REDIS_URL": self.redis_url, "DATABASE_URL": self.database_url,
+               "PYTHONPATH": os.pathsep.join(filter(None, [ROOT, os.environ.get("PYTHONPATH")]))}
+        port = free_port()
+        self._spawn("api", [sys.executable, "-m", "uvicorn", "fastapi_api.app.main:app",
+                            "--port", str(port), "--log-level", "warning"], env)
+        self._spawn("worker", [sys.executable, "-m", "celery", "-A",
+                               "ai_worker.worker.tasks.ai_tasks:celery_app", "worker",
+                               "--loglevel", "warning"], env)
+        self.base_url = f"http://127.0.0.1:{port}"
+        self._wait_ready()
+        return self.base_url
+
+    def stop(self) -> None:
+        # По одному в обратном порядке: воркер и API завершаются, пока Redis ещё работает
+        for process in reversed(self._processes):
+            process.terminate()
+            try:
+                process.wait(timeout=30)
+            except subprocess.TimeoutExpired:
+                process.kill()
+        self._processes = []
+        if self._postgres is not None:
+            self._postgres.cleanup()
+            self._postgres = None
+
+    def _start_redis(self) -> str:
+        executable = shutil.which("redis-server")
+        if executable is None:
+            try:
+                import redislite
+            except ImportError:
+                raise RuntimeError("Для локального Redis нужен redis-server в PATH или пакет redislite")
+            executable = redislite.__redis_executable__
+        port = free_port()
+        self._spawn("redis", [executable, "--port", str(port), "--bind", "127.0.0.1",
+                              "--save", "", "--appendonly", "no"], {})
+        url = f"redis://127.0.0.1:{port}/0"
+        client = redis.Redis.from_url(url)
+        for _ in range(100):
+            try:
+                client.ping()
+                break
+            except redis.ConnectionError:
+                time.sleep(0.1)
+        client.close()
+        return url
+
+    def _start_postgres(self) -> str:
+        try:
+            import pgserver
+        except ImportError:
+            raise RuntimeError("Для локального PostgreSQL нужен пакет pgserver")
+        self._postgres = pgserver.get_server(os.path.join(self.workdir, "pgdata"),
+                                             cleanup_mode="delete")
+        return self._postgres.get_uri().replace("postgresql://", "postgresql+asyncpg://", 1)
+
+    def _spawn(self, name: str, command: List[str], env: Dict[str, str]) -> None:
+        log = open(os.path.join(self.workdir, f"{name}.log"), "ab")
+        self._processes.append(subprocess.Popen(command, env=env, cwd=self.workdir,
+                                                stdout=log, stderr=subprocess.STDOUT))
+
+    def _wait_ready(self, timeout: float = 120) -> None:
+        """Ждёт ответа API и первой публикации метрик воркером."""
+        client = redis.Redis.from_url(self.redis_url)
+        deadline = time.monotonic() + timeout
+        api_ready = worker_ready = False
+        try:
+            while not (api_ready and worker_ready):
+                if time.monotonic() > deadline:
+                    raise RuntimeError(f"Стенд не запустился за {timeout} с, логи: {self.workdir}")
+                for process in self._processes:
+                    if process.poll() is not None:
+                        raise RuntimeError(f"Процесс стенда завершился, логи: {self.workdir}")
+                try:
+                    api_ready = api_ready or httpx.get(f"{self.base_url}/").status_code == 200
+                except httpx.HTTPError:
+                    pass
+                worker_ready = worker_ready or any(client.scan_iter(f"{METRICS_KEY_PREFIX}*"))
+                time.sleep(0.5)
+        finally:
+            client.close()
@@ -0,0 +1,43 @@
+"""Нагрузка для прогона: сообщения чата из JSONL-файла"""
+import json
+from dataclasses import dataclass
+from typing import List, Optional
+
+PROMPTS = [
+    "Hello, how are you?",
+    "Tell me a short story about a robot.",
+    "What is the capital of France?",
+    "Explain recursion in one sentence.",
+]
+
+
+@dataclass
+class Record:
+    """Одно сообщение нагрузки и, если задан в файле, его пользователь."""
+    message: str
+    user_id: Optional[int] = None
+
+
+def load_workload(path: Optional[str], field: str = "message",
+                  user_field: str = "user_id") -> List[Record]:
+    """
+    Читает нагрузку из JSONL-файла: текст сообщения берётся из поля field,
+    пользователь — из поля user_field (если его нет, пользователя назначает
+    прогон). Строки без поля field пропускаются. Без файла возвращает
+    несколько встроенных промптов.
+    """
+    if path is None:
+        return [Record(prompt) for prompt in PROMPTS]
+    records = []
+    with open(path, "r", encoding="utf-8") as file:
+        for line in file:
+            if not line.strip():
+                continue
+            row = json.loads(line)
+            message = row.get(field)
+            if message:
+                user_id = row.get(user_field)
+                records.append(Record(str(message), int(user_id) if user_id is not None else None))
+    if not records:
+        raise ValueError(f"В файле {path} нет строк с полем {field}")
+    return records
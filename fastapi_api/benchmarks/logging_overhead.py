@@ -0,0 +1,82 @@
+"""
+Бенчмарк задержки вызова логгера в потоке запроса.
+
+Сравнивает прежнюю схему (RotatingFileHandler пишет в файл прямо в
+вызывающем потоке, сообщение собирается f-строкой) с конвейером
+log_pipeline (очередь, форматирование JSON и запись в фоновом потоке,
+ленивые аргументы) и с отброшенной по уровню DEBUG-записью, которой
+логируется полный промпт. Для каждого режима выводятся p50/p99 и среднее
+время одного вызова в наносекундах. Запуск из корня репозитория:
+    python -m fastapi_api.benchmarks.logging_overhead --calls 20000 --message-size 2000
+"""
+import argparse
+import logging
+import logging.handlers
+import os
+import tempfile
+import time
+from typing import Callable, Dict, List
+
+from fastapi_api.app.utils.log_pipeline import configure
+
+
+def percentile(values: List[int], q: float) -> int:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * q))]
+
+
+def measure(call: Callable[[int], None], calls: int) -> Dict[str, float]:
+    """Время каждого вызова в вызывающем потоке, нс."""
+    timings = []
+    for index in range(calls):
+        started = time.perf_counter_ns()
+        call(index)
+        timings.append(time.perf_counter_ns() - started)
+    return {"p50": percentile(timings, 0.5), "p99": percentile(timings, 0.99),
+            "mean": sum(timings) / len(timings)}
+
+
+def sync_logger(path: str) -> logging.Logger:
+    """Прежняя настройка: обработчик файла вызывается в потоке запроса."""
+    logger = logging.getLogger("benchmark.sync")
+    handler = logging.handlers.RotatingFileHandler(path, maxBytes=500 * 1024 * 1024, encoding="utf-8")
+    handler.setFormatter(logging.Formatter("[%(asctime)s - %(levelname)s - %(message)s]"))
+    logger.handlers = [handler]
+    logger.setLevel(logging.DEBUG)
+    logger.propagate = False
+    return logger
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=20000)
+    parser.add_argument("--message-size", type=int, default=2000, help="длина логируемого промпта, символов")
+    args = parser.parse_args()
+
+    prompt = ("Расскажи подробно о погоде. " * (args.message_size // 28 + 1))[:args.message_size]
+    with tempfile.TemporaryDirectory() as workdir:
+        sync = sync_logger(os.path.join(workdir, "sync.log"))
+
+        queued = logging.getLogger("benchmark.pipeline")
+        handler = logging.handlers.RotatingFileHandler(os.path.join(workdir, "pipeline.log"),
+                                                       maxBytes=500 * 1024 * 1024, encoding="utf-8")
+        pipeline = configure(queued, [handler], level="INFO")
+
+        results = {
+            "sync f-string INFO": measure(
+                lambda i: sync.info(f"Токенизация входных данных {i}: {prompt}"), args.calls),
+            "pipeline lazy INFO": measure(
+                lambda i: queued.info("Токенизация входных данных %d: %s", i, prompt), args.calls),
+            "pipeline DEBUG (filtered)": measure(
+                lambda i: queued.debug("Токенизация входных данных %d: %s", i, prompt), args.calls),
+        }
+        # Остаток очереди дописывается вне замеров
+        pipeline.stop()
+
+    print(f"{'режим':<28} {'p50, нс':>10} {'p99, нс':>10} {'среднее, нс':>12}")
+    for name, stats in results.items():
+        print(f"{name:<28} {stats['p50']:>10} {stats['p99']:>10} {stats['mean']:>12.0f}")
+
+
+if __name__ == "__main__":
+    main()
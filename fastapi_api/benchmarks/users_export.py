@@ -0,0 +1,105 @@
+"""
+Бенчмарк пикового RSS при выгрузке списка пользователей в зависимости от числа строк.
+
+Сравнивает прежнюю схему (вся таблица в память, список UserResponse, один
+JSON) с потоковой выгрузкой NDJSON через серверный курсор. Каждый замер
+идёт в отдельном процессе, чтобы пиковый RSS не накапливался. Тестовые
+пользователи (telegram_id с префиксом benchmark-) создаются в PostgreSQL
+из DATABASE_URL при необходимости. Запуск из корня репозитория:
+    python -m fastapi_api.benchmarks.users_export --rows 1000,10000,100000 --cleanup
+"""
+import argparse
+import asyncio
+import multiprocessing
+import resource
+import time
+from typing import Dict
+
+from sqlalchemy import delete, func, insert, select
+
+PREFIX = "benchmark-"
+
+
+async def seed(rows: int) -> None:
+    """Добавляет тестовых пользователей, пока их не станет rows."""
+    from fastapi_api.app.db.database import async_engine, async_session_maker
+    from fastapi_api.app.db.models import User
+
+    async with async_session_maker() as db:
+        existing = (await db.execute(
+            select(func.count()).select_from(User).where(User.telegram_id.startswith(PREFIX))
+        )).scalar_one()
+        for start in range(existing, rows, 10000):
+            await db.execute(insert(User), [
+                {"telegram_id": f"{PREFIX}{index}", "username": f"user {index}"}
+                for index in range(start, min(rows, start + 10000))
+            ])
+        await db.commit()
+    await async_engine.dispose()
+
+
+async def cleanup() -> None:
+    from fastapi_api.app.db.database import async_engine, async_session_maker
+    from fastapi_api.app.db.models import User
+
+    async with async_session_maker() as db:
+        await db.execute(delete(User).where(User.telegram_id.startswith(PREFIX)))
+        await db.commit()
+    await async_engine.dispose()
+
+
+def measure(mode: str, rows: int) -> Dict[str, float]:
+    """Выгружает rows пользователей в режиме mode (выполняется в дочернем процессе)."""
+    from fastapi_api.app.db.database import async_engine, async_session_maker
+    from fastapi_api.app.db.models import User
+    from fastapi_api.app.schemas.users import UserResponse
+    from fastapi_api.app.services.users import stream_users
+
+    async def run() -> int:
+        written = 0
+        async with async_session_maker() as db:
+            if mode == "full":
+                users = (await db.execute(select(User).order_by(User.id).limit(rows))).scalars().all()
+                payload = "[" + ",".join(
+                    UserResponse(id=user.id, telegram_id=user.telegram_id, username=user.username,
+                                 created_at=user.created_at).model_dump_json()
+                    for user in users
+                ) + "]"
+                written = len(payload)
+            else:
+                async for chunk in stream_users(db):
+                    written += len(chunk)
+        await async_engine.dispose()
+        return written
+
+    baseline = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    started = time.perf_counter()
+    written = asyncio.run(run())
+    return {
+        "seconds": time.perf_counter() - started,
+        "peak_rss_mb": (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - baseline) / 1024,
+        "bytes": written,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", default="1000,10000,100000")
+    parser.add_argument("--cleanup", action="store_true", help="удалить тестовых пользователей после замера")
+    args = parser.parse_args()
+
+    context = multiprocessing.get_context("spawn")
+    print(f"{'rows':>8} {'mode':>7} {'time, s':>8} {'peak RSS, MB':>13} {'MB out':>8}")
+    for rows in (int(value) for value in args.rows.split(",")):
+        asyncio.run(seed(rows))
+        for mode in ("full", "stream"):
+            with context.Pool(1) as pool:
+                row = pool.apply(measure, (mode, rows))
+            print(f"{rows:>8} {mode:>7} {row['seconds']:>8.2f} {row['peak_rss_mb']:>13.1f} "
+                  f"{row['bytes'] / 2 ** 20:>8.1f}")
+    if args.cleanup:
+        asyncio.run(cleanup())
+
+
+if __name__ == "__main__":
+    main()
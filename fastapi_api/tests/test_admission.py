@@ -0,0 +1,132 @@
+"""Контроль допуска: ведро токенов пользователя, оценка ожидания и счётчики"""
+import time
+
+import fakeredis.aioredis
+import pytest
+from fastapi import HTTPException
+
+from fastapi_api.app.schemas.chat import ChatRequest
+from fastapi_api.app.services import admission, chat
+from fastapi_api.app.utils.scheduler import COMPLETED_KEY_PREFIX
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+def redis(monkeypatch):
+    client = fakeredis.aioredis.FakeRedis(decode_responses=True)
+    monkeypatch.setattr(admission, "get_redis", lambda: client)
+    monkeypatch.setattr(admission, "_token_bucket_script", None)
+    monkeypatch.setattr(admission, "CHAT_SCHEDULING", "fifo")
+    return client
+
+
+@pytest.fixture
+def rate_limit(monkeypatch):
+    monkeypatch.setattr(admission, "RATE_LIMIT_PER_MINUTE", 6)
+    monkeypatch.setattr(admission, "RATE_LIMIT_BURST", 2)
+
+
+async def counters(redis):
+    return await redis.hgetall(admission.ADMISSION_STATS_KEY)
+
+
+async def test_burst_then_429_with_retry_after(redis, rate_limit):
+    await admission.check_rate_limit(1)
+    await admission.check_rate_limit(1)
+
+    with pytest.raises(HTTPException) as error:
+        await admission.check_rate_limit(1)
+
+    assert error.value.status_code == 429
+    # 6 запросов в минуту: следующий токен появится примерно через 10 секунд
+    assert 9 <= int(error.value.headers["Retry-After"]) <= 10
+    assert (await counters(redis))["rate_limited"] == "1"
+
+
+async def test_buckets_are_per_user(redis, rate_limit):
+    for _ in range(2):
+        await admission.check_rate_limit(1)
+
+    await admission.check_rate_limit(2)
+
+
+async def test_rate_limit_disabled(redis, monkeypatch):
+    monkeypatch.setattr(admission, "RATE_LIMIT_PER_MINUTE", 0)
+
+    for _ in range(100):
+        await admission.check_rate_limit(1)
+
+    assert await redis.keys("*") == []
+
+
+async def test_rate_limit_fails_open_without_redis(monkeypatch, rate_limit):
+    def unavailable():
+        raise ConnectionError("redis down")
+
+    monkeypatch.setattr(admission, "get_redis", unavailable)
+    monkeypatch.setattr(admission, "_token_bucket_script", None)
+
+    await admission.check_rate_limit(1)
+
+
+async def test_wait_uses_recent_throughput(redis, monkeypatch):
+    monkeypatch.setattr(admission, "ADMISSION_WINDOW", 10)
+    await redis.rpush(admission.DEFAULT_QUEUE, *range(20))
+    await redis.set(f"{COMPLETED_KEY_PREFIX}{int(time.time()) - 1}", 40)
+
+    # 40 задач за 10 секунд — 4 в секунду, 20 задач в очереди — 5 секунд ожидания
+    assert await admission.estimate_wait(None) == pytest.approx(5.0)
+
+
+async def test_wait_without_history_uses_task_estimate(redis, monkeypatch):
+    monkeypatch.setattr(admission, "ADMISSION_TASK_SECONDS", 2.0)
+    await redis.rpush(admission.DEFAULT_QUEUE, *range(3))
+
+    assert await admission.estimate_wait(None) == pytest.approx(6.0)
+
+
+async def test_admit_counts_admitted(redis):
+    assert await admission.admit_task(1, "hi") == 0.0
+    assert (await counters(redis))["admitted"] == "1"
+
+
+async def test_admit_sheds_when_wait_exceeds_limit(redis, monkeypatch):
+    monkeypatch.setattr(admission, "ADMISSION_MAX_WAIT", 4.0)
+    monkeypatch.setattr(admission, "ADMISSION_TASK_SECONDS", 1.0)
+    await redis.rpush(admission.DEFAULT_QUEUE, *range(10))
+
+    with pytest.raises(HTTPException) as error:
+        await admission.admit_task(1, "hi")
+
+    assert error.value.status_code == 429
+    assert error.value.headers["Retry-After"] == "6"
+    assert (await counters(redis)) == {"shed": "1"}
+
+
+async def test_counter_failure_does_not_reject_admitted_task(redis, monkeypatch):
+    async def unavailable(*args, **kwargs):
+        raise ConnectionError("redis down")
+
+    monkeypatch.setattr(redis, "hincrby", unavailable)
+
+    assert await admission.admit_task(1, "hi") == 0.0
+
+
+async def test_unknown_user_gets_404_from_the_insert(redis, pg_session_maker, monkeypatch):
+    calls = []
+
+    async def record(*args):
+        calls.append(args)
+
+    monkeypatch.setattr(chat, "check_rate_limit", record)
+    monkeypatch.setattr(chat, "lookup_response", lambda message: pytest.fail("кэш не нужен"))
+    monkeypatch.setattr(chat, "RESPONSE_CACHE_WITH_HISTORY", False)
+
+    async with pg_session_maker() as db:
+        with pytest.raises(HTTPException) as error:
+            await chat.create_chat_service(ChatRequest(user_id=404, message="hi"), db)
+
+    assert error.value.status_code == 404
+    # Лимит проверяется только по id, пользователь — самой вставкой задачи
+    assert calls == [(404,)]
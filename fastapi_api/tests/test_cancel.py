@@ -0,0 +1,82 @@
+"""Отмена задачи через API: переходы статусов и сигнал воркеру"""
+import fakeredis.aioredis
+import pytest
+from fastapi import HTTPException
+
+from fastapi_api.app.core.config import STREAM_KEY_PREFIX
+from fastapi_api.app.db.models import Task, TaskStatus, User
+from fastapi_api.app.services import tasks
+from fastapi_api.app.utils.cancellation import cancel_key
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+def redis(monkeypatch):
+    client = fakeredis.aioredis.FakeRedis(decode_responses=True)
+    monkeypatch.setattr(tasks, "get_redis", lambda: client)
+    return client
+
+
+@pytest.fixture
+async def db(session_maker):
+    async with session_maker() as session:
+        session.add(User(id=1, telegram_id="1", username="user"))
+        for status in TaskStatus:
+            session.add(Task(task_id=status.value, user_id=1, input_data="hi", status=status))
+        await session.commit()
+        yield session
+
+
+async def status_of(db, task_id: str) -> TaskStatus:
+    db.expire_all()
+    return (await tasks._fetch_status(task_id, db)).status
+
+
+@pytest.mark.parametrize("status", [TaskStatus.PENDING, TaskStatus.PROCESSING])
+async def test_unfinished_task_is_cancelled(db, redis, status):
+    response = await tasks.cancel_task_service(status.value, db)
+
+    assert response.status == TaskStatus.CANCELLED
+    assert await status_of(db, status.value) == TaskStatus.CANCELLED
+    assert await redis.exists(cancel_key(status.value))
+    events = await redis.xrange(f"{STREAM_KEY_PREFIX}{status.value}")
+    assert [fields["event"] for _, fields in events] == ["cancelled"]
+
+
+@pytest.mark.parametrize("status", [TaskStatus.COMPLETED, TaskStatus.FAILED, TaskStatus.CANCELLED])
+async def test_finished_task_cannot_be_cancelled(db, redis, status):
+    with pytest.raises(HTTPException) as error:
+        await tasks.cancel_task_service(status.value, db)
+
+    assert error.value.status_code == 409
+    assert await status_of(db, status.value) == status
+    assert not await redis.exists(cancel_key(status.value))
+
+
+async def test_second_cancel_conflicts(db, redis):
+    await tasks.cancel_task_service("pending", db)
+
+    with pytest.raises(HTTPException) as error:
+        await tasks.cancel_task_service("pending", db)
+
+    assert error.value.status_code == 409
+
+
+async def test_unknown_task(db, redis):
+    with pytest.raises(HTTPException) as error:
+        await tasks.cancel_task_service("missing", db)
+
+    assert error.value.status_code == 404
+
+
+async def test_cancel_is_recorded_without_redis(db, monkeypatch):
+    def unavailable():
+        raise ConnectionError("redis down")
+
+    monkeypatch.setattr(tasks, "get_redis", unavailable)
+
+    response = await tasks.cancel_task_service("pending", db)
+
+    assert response.status == TaskStatus.CANCELLED
+    assert await status_of(db, "pending") == TaskStatus.CANCELLED
@@ -0,0 +1,84 @@
+"""Создание задачи чата одной вставкой с CTE на PostgreSQL"""
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import func, select
+
+from fastapi_api.app.db.models import Message, SenderType, Task, TaskStatus, User
+from fastapi_api.app.schemas.chat import ChatRequest
+from fastapi_api.app.services import chat
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+def sent(monkeypatch):
+    """Задачи, отправленные в Celery; Redis и кэш ответов не нужны."""
+    tasks = []
+
+    async def allow(*args):
+        return 0.0
+
+    monkeypatch.setattr(chat, "check_rate_limit", allow)
+    monkeypatch.setattr(chat, "admit_task", allow)
+    monkeypatch.setattr(chat, "CHAT_SCHEDULING", "fifo")
+    monkeypatch.setattr(chat, "RESPONSE_CACHE_WITH_HISTORY", True)
+    monkeypatch.setattr(chat.celery_app, "send_task", lambda name, args, **kwargs: tasks.append(args))
+    return tasks
+
+
+@pytest.fixture
+async def db(pg_session_maker):
+    async with pg_session_maker() as session:
+        session.add(User(id=1, telegram_id="1"))
+        await session.commit()
+        yield session
+
+
+def cache(monkeypatch, answer):
+    async def lookup(message):
+        return "key", answer
+
+    monkeypatch.setattr(chat, "lookup_response", lookup)
+
+
+async def rows(db, task_id):
+    task = await db.scalar(select(Task).where(Task.task_id == task_id))
+    messages = (await db.execute(select(Message.sender, Message.content, Message.user_id)
+                                 .where(Message.task_id == task.id).order_by(Message.id))).all()
+    return task, messages
+
+
+async def test_new_message_creates_pending_task(db, sent, monkeypatch):
+    cache(monkeypatch, None)
+
+    response = await chat.create_chat_service(ChatRequest(user_id=1, message="hi"), db)
+
+    task, messages = await rows(db, response.task_id)
+    assert (task.user_id, task.input_data, task.status, task.result) == (1, "hi", TaskStatus.PENDING, None)
+    assert messages == [(SenderType.USER, "hi", 1)]
+    assert sent == [[response.task_id, "hi"]]
+
+
+async def test_cache_hit_stores_answer_without_worker(db, sent, monkeypatch):
+    cache(monkeypatch, "hello")
+
+    response = await chat.create_chat_service(ChatRequest(user_id=1, message="hi"), db)
+
+    task, messages = await rows(db, response.task_id)
+    assert response.status == task.status == TaskStatus.COMPLETED
+    assert task.result == "hello"
+    assert messages == [(SenderType.USER, "hi", 1), (SenderType.ASSISTANT, "hello", 1)]
+    assert sent == []
+
+
+@pytest.mark.parametrize("answer", [None, "hello"])
+async def test_unknown_user_creates_nothing(db, sent, monkeypatch, answer):
+    cache(monkeypatch, answer)
+
+    with pytest.raises(HTTPException) as error:
+        await chat.create_chat_service(ChatRequest(user_id=2, message="hi"), db)
+
+    assert error.value.status_code == 404
+    assert await db.scalar(select(func.count()).select_from(Task)) == 0
+    assert await db.scalar(select(func.count()).select_from(Message)) == 0
+    assert sent == []
@@ -0,0 +1,81 @@
+"""Постраничная выдача по ключу: курсоры и обход страниц"""
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi import HTTPException
+
+from fastapi_api.app.db.models import Message, SenderType, User
+from fastapi_api.app.services.messages import get_user_messages_service
+from fastapi_api.app.services.users import get_all_users_service
+from fastapi_api.app.utils.helpers import decode_cursor, encode_cursor
+
+pytestmark = pytest.mark.anyio
+
+
+def test_cursor_round_trip():
+    cursor = encode_cursor("2026-01-01T12:00:00", 42)
+
+    assert decode_cursor(cursor) == ["2026-01-01T12:00:00", 42]
+    assert set(cursor) <= set("ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789-_=")
+
+
+@pytest.mark.parametrize("cursor", ["not base64!", encode_cursor("x")[:-2] + "@@"])
+def test_malformed_cursor_is_400(cursor):
+    with pytest.raises(HTTPException) as error:
+        decode_cursor(cursor)
+
+    assert error.value.status_code == 400
+
+
+async def test_message_pages_cover_history_once(session_maker):
+    start = datetime(2026, 1, 1, 12, 0)
+    async with session_maker() as db:
+        db.add_all([User(id=1, telegram_id="1"), User(id=2, telegram_id="2")])
+        # Пары сообщений с одинаковым временем: порядок внутри пары задаёт id
+        for index in range(7):
+            db.add(Message(user_id=1, sender=SenderType.USER, content=f"m{index}",
+                           created_at=start + timedelta(seconds=index // 2)))
+        db.add(Message(user_id=2, sender=SenderType.USER, content="other", created_at=start))
+        await db.commit()
+
+        pages, before = [], None
+        while True:
+            page = await get_user_messages_service(1, db, before=before, limit=3)
+            pages.append([item.content for item in page.items])
+            before = page.next_before
+            if before is None:
+                break
+
+    assert pages == [["m4", "m5", "m6"], ["m1", "m2", "m3"], ["m0"]]
+
+
+async def test_bad_message_cursor_is_400(session_maker):
+    async with session_maker() as db:
+        with pytest.raises(HTTPException) as error:
+            await get_user_messages_service(1, db, before=encode_cursor("yesterday", "x"))
+
+    assert error.value.status_code == 400
+
+
+async def test_user_pages_follow_registration_order(session_maker):
+    async with session_maker() as db:
+        db.add_all([User(id=user_id, telegram_id=str(user_id)) for user_id in (5, 1, 3, 2, 4)])
+        await db.commit()
+
+        pages, after = [], None
+        while True:
+            page = await get_all_users_service(db, after=after, limit=2)
+            pages.append([item.id for item in page.items])
+            after = page.next_after
+            if after is None:
+                break
+
+    assert pages == [[1, 2], [3, 4], [5]]
+
+
+async def test_bad_user_cursor_is_400(session_maker):
+    async with session_maker() as db:
+        with pytest.raises(HTTPException) as error:
+            await get_all_users_service(db, after=encode_cursor("first"))
+
+    assert error.value.status_code == 400
@@ -0,0 +1,60 @@
+"""Кэш ответов модели: точный и семантический уровни"""
+import fakeredis.aioredis
+import pytest
+
+from fastapi_api.app.core.config import GENERATION_PARAMS, MODEL_NAME
+from fastapi_api.app.services import response_cache
+from fastapi_api.app.utils.response_cache import (ENTRY_PREFIX, VECTORS_KEY, cache_key, embed_prompt,
+                                                  pack_vector)
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+def redis(monkeypatch):
+    client = fakeredis.aioredis.FakeRedis(decode_responses=True)
+    monkeypatch.setattr(response_cache, "get_redis", lambda: client)
+    monkeypatch.setattr(response_cache, "RESPONSE_CACHE_ENABLED", True)
+    monkeypatch.setattr(response_cache, "RESPONSE_CACHE_SEMANTIC", True)
+    monkeypatch.setattr(response_cache, "_vectors_loaded_at", 0.0)
+    return client
+
+
+async def store(redis, prompt: str, answer: str) -> str:
+    key = cache_key(prompt, MODEL_NAME, GENERATION_PARAMS)
+    await redis.set(f"{ENTRY_PREFIX}{key}", answer)
+    await redis.hset(VECTORS_KEY, key, pack_vector(embed_prompt(prompt)))
+    return key
+
+
+async def test_exact_hit_ignores_case_and_punctuation(redis):
+    key = await store(redis, "Hello there", "Hi!")
+
+    assert await response_cache.lookup_response("hello   THERE!") == (key, "Hi!")
+
+
+async def test_similar_prompt_hits_semantic_tier(redis):
+    await store(redis, "what are your opening hours", "9 to 5")
+    await store(redis, "how do I reset my password", "Use the link")
+
+    key, answer = await response_cache.lookup_response("what are your opening hours today")
+
+    assert key == cache_key("what are your opening hours today", MODEL_NAME, GENERATION_PARAMS)
+    assert answer == "9 to 5"
+    assert await redis.hget(response_cache.STATS_KEY, "semantic_hits") == "1"
+
+
+async def test_unrelated_prompt_misses(redis):
+    await store(redis, "what are your opening hours", "9 to 5")
+
+    assert (await response_cache.lookup_response("tell me a joke about cats"))[1] is None
+    assert await redis.hget(response_cache.STATS_KEY, "misses") == "1"
+
+
+async def test_vectors_are_reloaded_only_after_refresh_interval(redis):
+    await store(redis, "what are your opening hours", "9 to 5")
+    await response_cache.lookup_response("what are your opening hours today")
+    await store(redis, "how do I reset my password", "Use the link")
+
+    # Снимок ещё свежий: новая запись станет видна после SEMANTIC_REFRESH
+    assert (await response_cache.lookup_response("how do I reset my password please"))[1] is None
@@ -0,0 +1,136 @@
+"""Скрипты справедливого планировщика: DRR между пользователями внутри полосы"""
+import json
+
+import fakeredis
+import redis
+import pytest
+
+from fastapi_api.app.services.scheduler import choose_lane
+from fastapi_api.app.utils.scheduler import CLAIM_SCRIPT, ENQUEUE_SCRIPT, claim_keys, enqueue_keys, lane_key
+
+LANE = "default"
+
+
+class Lane:
+    """Полоса планировщика поверх fakeredis с теми же ключами, что у API и воркера."""
+
+    def __init__(self, quantum: int = 1):
+        self.redis = fakeredis.FakeRedis(decode_responses=True)
+        self.quantum = quantum
+        self._enqueue = self.redis.register_script(ENQUEUE_SCRIPT)
+        self._claim = self.redis.register_script(CLAIM_SCRIPT)
+
+    def enqueue(self, user_id: int, task_id: str, cost: int = 1) -> int:
+        return self._enqueue(keys=enqueue_keys(LANE), args=[user_id, json.dumps({"task_id": task_id}), cost])
+
+    def claim(self, tick_id: str):
+        task = self._claim(keys=claim_keys(LANE), args=[self.quantum, tick_id, 10])
+        return json.loads(task)["task_id"] if task else None
+
+    def drain(self):
+        """Забирает задачи по одной, снимая закрепление после каждой, как воркер."""
+        claimed = []
+        for _ in range(100):
+            task_id = self.claim("tick")
+            if task_id is None:
+                return claimed
+            self.release("tick")
+            claimed.append(task_id)
+        raise AssertionError("полоса не опустела")
+
+    def release(self, tick_id: str) -> None:
+        self.redis.hdel(lane_key(LANE, "claimed"), tick_id)
+
+    def stats(self):
+        return self.redis.hgetall(lane_key(LANE, "stats"))
+
+
+@pytest.fixture
+def lane():
+    return Lane()
+
+
+def test_users_alternate_regardless_of_queue_length(lane):
+    for index in range(3):
+        lane.enqueue(1, f"a{index}")
+    lane.enqueue(2, "b0")
+    lane.enqueue(3, "c0")
+
+    assert lane.drain() == ["a0", "b0", "c0", "a1", "a2"]
+
+
+def test_expensive_task_waits_for_accumulated_deficit(lane):
+    lane.enqueue(1, "long", cost=3)
+    for index in range(3):
+        lane.enqueue(2, f"short{index}")
+
+    claimed = lane.drain()
+
+    assert sorted(claimed) == ["long", "short0", "short1", "short2"]
+    # За три круга дешёвые задачи второго пользователя идут раньше дорогой
+    assert claimed.index("long") == 2
+
+
+def test_redelivered_tick_gets_the_same_task(lane):
+    lane.enqueue(1, "a0")
+    lane.enqueue(1, "a1")
+
+    assert lane.claim("tick") == "a0"
+    assert lane.claim("tick") == "a0"
+    assert lane.stats()["depth"] == "1"
+    lane.release("tick")
+    assert lane.claim("tick") == "a1"
+
+
+def test_empty_lane_claims_nothing(lane):
+    assert lane.claim("tick") is None
+
+
+def test_depth_and_counters(lane):
+    assert lane.enqueue(1, "a0") == 1
+    assert lane.enqueue(2, "b0") == 2
+    lane.claim("tick")
+
+    stats = lane.stats()
+    assert (stats["enqueued"], stats["claimed"], stats["depth"]) == ("2", "1", "1")
+    assert lane.redis.llen(lane_key(LANE, "waits")) == 1
+
+
+def test_user_rejoins_ring_after_queue_drains(lane):
+    lane.enqueue(1, "a0")
+    assert lane.drain() == ["a0"]
+    assert lane.redis.llen(lane_key(LANE, "active")) == 0
+
+    lane.enqueue(1, "a1")
+    assert lane.drain() == ["a1"]
+    # Очередь опустела: в хэшах полосы не остаётся следов пользователя
+    assert all(not lane.redis.exists(lane_key(LANE, name)) for name in ("tasks", "heads", "tails"))
+
+
+def test_scripts_touch_only_declared_keys():
+    lane = Lane()
+    declared = set(enqueue_keys(LANE)) | set(claim_keys(LANE))
+    for user_id in (1, 2, 2, 3):
+        lane.enqueue(user_id, f"t{user_id}", cost=2)
+    lane.drain()
+
+    assert set(lane.redis.keys("*")) <= declared
+    # Все ключи полосы в одном слоте Redis Cluster
+    assert {key.split("}")[0] for key in declared} == {lane_key(LANE, "").split("}")[0]}
+
+
+def test_non_positive_quantum_is_rejected():
+    lane = Lane(quantum=0)
+    lane.enqueue(1, "a0")
+
+    with pytest.raises(redis.ResponseError, match="quantum"):
+        lane.claim("tick")
+
+
+def test_choose_lane(monkeypatch):
+    monkeypatch.setattr("fastapi_api.app.services.scheduler.PREMIUM_USER_IDS", {7})
+    monkeypatch.setattr("fastapi_api.app.services.scheduler.SHORT_PROMPT_CHARS", 10)
+
+    assert choose_lane(7, "x" * 100) == "premium"
+    assert choose_lane(1, "hi") == "short"
+    assert choose_lane(1, "x" * 100) == "default"
@@ -0,0 +1,67 @@
+"""Кэш пользователей: запись по поколению и гонка с инвалидацией"""
+from datetime import datetime
+
+import fakeredis.aioredis
+import pytest
+
+from fastapi_api.app.core.config import USER_CACHE_PREFIX
+from fastapi_api.app.schemas.users import UserResponse
+from fastapi_api.app.services import user_cache
+from fastapi_api.app.services.user_cache import VERSION_KEY, UserCache
+
+pytestmark = pytest.mark.anyio
+
+USER = UserResponse(id=1, telegram_id="100", created_at=datetime(2026, 1, 1))
+
+
+@pytest.fixture
+def redis(monkeypatch):
+    client = fakeredis.aioredis.FakeRedis(decode_responses=True)
+    monkeypatch.setattr(user_cache, "get_redis", lambda: client)
+    monkeypatch.setattr(user_cache, "USER_CACHE_ENABLED", True)
+    return client
+
+
+async def test_stored_user_is_shared_between_replicas(redis):
+    first, second = UserCache(), UserCache()
+
+    user, generation = await first.get("id", 1)
+    await first.store(USER, generation)
+
+    assert user is None
+    assert await second.get("telegram_id", "100") == (USER, (0, "0"))
+    assert second.stats()["redis_hits"] == 1
+
+
+async def test_read_before_local_invalidation_is_not_stored(redis):
+    cache = UserCache()
+
+    _, generation = await cache.get("id", 1)
+    await cache.invalidate(1, "100")
+    await cache.store(USER, generation)
+
+    assert cache.stats()["local_entries"] == 0
+    assert await redis.get(f"{USER_CACHE_PREFIX}id:1") is None
+
+
+async def test_invalidation_from_other_replica_wins_race(redis):
+    reader, writer = UserCache(), UserCache()
+
+    # reader прочитал пользователя из БД до того, как writer его изменил
+    _, generation = await reader.get("id", 1)
+    await writer.invalidate(1, "100")
+    await reader.store(USER, generation)
+
+    assert await redis.get(VERSION_KEY) == "1"
+    assert await redis.get(f"{USER_CACHE_PREFIX}id:1") is None
+    assert await redis.get(f"{USER_CACHE_PREFIX}telegram_id:100") is None
+    assert (await writer.get("id", 1))[0] is None
+
+
+async def test_unknown_version_updates_only_local_level(redis):
+    cache = UserCache()
+
+    await cache.store(USER, (cache.generation, None))
+
+    assert (await cache.get("id", 1))[0] == USER
+    assert await redis.get(f"{USER_CACHE_PREFIX}id:1") is None